@@ -0,0 +1,254 @@
+import os
+import csv
+import glob
+import json
+import time
+import logging
+import argparse
+
+import numpy as np
+
+import config
+from batch_engine import BatchGameEngine
+from game_data_writer import COLUMNAR_FIELDNAMES, ColumnarGameStore
+
+# Get the root logger configured in llm_player
+logger = logging.getLogger()
+
+# Indexed columns: the int columns of the game CSV plus the model, stored as an id into meta["models"]
+ANALYTICS_COLUMNS = COLUMNAR_FIELDNAMES + ['Model_Id']
+UNKNOWN_MODEL = "unknown" # CSVs written before LLM_Model existed
+
+
+class GameAnalytics:
+    """Incrementally built, memory-mapped index over every game_data_*.csv, with vectorized queries.
+
+    ingest() appends only files that are new or changed (by mtime and size) to a
+    ColumnarGameStore. The manifest of indexed files is an append-only JSONL file
+    next to the store, one line per committed batch, so an ingest costs O(new files)
+    rather than rewriting every file ever indexed. A file that changed after being
+    indexed is re-read and its old games are masked out of every query.
+    """
+    MANIFEST_FILE = "_manifest.jsonl"
+
+    def __init__(self, directory=None):
+        self.store = ColumnarGameStore(directory or config.ANALYTICS_INDEX_DIRECTORY, columns=ANALYTICS_COLUMNS)
+        self.manifest_path = os.path.join(self.store.directory, self.MANIFEST_FILE)
+        meta = self.store.schema.get("meta") or {}
+        self.files = {} # path -> {"signature": [mtime_ns, size], "games": [game indices]}
+        self.models = meta.get("models", [])
+        self.superseded = []
+        if "files" in meta and not os.path.exists(self.manifest_path):
+            # Index built when the manifest lived in the schema: carry it over once
+            self._append_manifest(meta["files"], meta.get("superseded", []), self.store.schema["games"])
+        self._load_manifest()
+        self.engine = BatchGameEngine()
+        self._columns = None
+
+    def _append_manifest(self, files, superseded, games_end):
+        """Appends one batch's entries. Written before the data: load trusts it once the store has games_end games."""
+        line = json.dumps({"games_end": games_end, "files": files, "superseded": superseded})
+        with open(self.manifest_path, 'a') as f:
+            f.write(line + "\n")
+
+    def _load_manifest(self):
+        """Replays the manifest, cutting off batches whose data never got committed (or a torn last line)."""
+        if not os.path.exists(self.manifest_path):
+            return
+        committed_bytes = 0
+        with open(self.manifest_path, 'rb') as f:
+            for line in f:
+                try:
+                    batch = json.loads(line)
+                except ValueError:
+                    break
+                if not line.endswith(b"\n") or batch["games_end"] > self.store.schema["games"]:
+                    break
+                self.files.update(batch["files"])
+                self.superseded.extend(batch["superseded"])
+                committed_bytes += len(line)
+            else:
+                return
+        logger.warning(f"Analytics manifest: dropping entries after byte {committed_bytes} (not committed to the store)")
+        with open(self.manifest_path, 'r+b') as f:
+            f.truncate(committed_bytes)
+
+    def ingest(self, pattern=None, batch_size=500):
+        """Indexes new or changed CSVs matching pattern; returns {"indexed", "skipped", "rows", "seconds"}."""
+        started_at = time.monotonic()
+        stats = {"indexed": 0, "skipped": 0, "rows": 0}
+        batch = []
+        for path in sorted(glob.glob(pattern or config.GAME_DATA_CSV_GLOB)):
+            key = os.path.abspath(path)
+            stat = os.stat(path)
+            signature = [stat.st_mtime_ns, stat.st_size]
+            entry = self.files.get(key)
+            if entry is not None and entry["signature"] == signature:
+                stats["skipped"] += 1
+                continue
+            rows = self._read_csv(path)
+            batch.append((key, signature, rows))
+            stats["indexed"] += 1
+            stats["rows"] += len(rows)
+            if len(batch) >= batch_size:
+                self._commit(batch)
+                batch = []
+        if batch:
+            self._commit(batch)
+        self._columns = None
+        stats["seconds"] = time.monotonic() - started_at
+        logger.info(f"Analytics ingest: {stats['indexed']} files indexed ({stats['rows']} rounds), "
+                    f"{stats['skipped']} unchanged files skipped in {stats['seconds']:.2f}s")
+        return stats
+
+    def _read_csv(self, path):
+        """Returns the file's rounds as dicts of ints over ANALYTICS_COLUMNS (missing columns read as 0)."""
+        rows = []
+        with open(path, newline='') as f:
+            for record in csv.DictReader(f):
+                model = record.get('LLM_Model') or UNKNOWN_MODEL
+                if model not in self.models:
+                    self.models.append(model)
+                row = {column: int(record.get(column) or 0) for column in COLUMNAR_FIELDNAMES}
+                row['Model_Id'] = self.models.index(model)
+                rows.append(row)
+        return rows
+
+    def _commit(self, batch):
+        # Header-only CSVs (aborted games) are remembered so they're skipped, but add no games
+        first_game = self.store.schema["games"]
+        games = []
+        files = {}
+        superseded = []
+        for key, signature, rows in batch:
+            if key in self.files:
+                superseded.extend(self.files[key]["games"]) # Rewritten since indexed (e.g. a game that was still running)
+            indices = []
+            if rows:
+                indices = [first_game + len(games)]
+                games.append(rows)
+            files[key] = {"signature": signature, "games": indices}
+        self._append_manifest(files, superseded, first_game + len(games))
+        # Model ids are committed with the data that refers to them
+        self.store.append_games(games, meta={"models": self.models})
+        self.files.update(files)
+        self.superseded.extend(superseded)
+
+    def columns(self):
+        """Returns {column: array} over all live rows; memory-mapped unless superseded games must be dropped."""
+        if self._columns is None:
+            columns = self.store.load(mmap=True)
+            if self.superseded:
+                live = ~np.isin(columns['Game_Index'], self.superseded)
+                columns = {name: values[live] for name, values in columns.items()}
+            self._columns = columns
+        return self._columns
+
+    def _select(self, model=None):
+        columns = self.columns()
+        if model is None:
+            return columns
+        model_id = self.models.index(model) if model in self.models else -1
+        mask = columns['Model_Id'] == model_id
+        return {name: values[mask] for name, values in columns.items()}
+
+    @staticmethod
+    def _next_round_pairs(columns):
+        """Mask over rows 0..n-2 that are followed by the next round of the same game."""
+        games, rounds = columns['Game_Index'], columns['Round']
+        return (games[1:] == games[:-1]) & (rounds[1:] == rounds[:-1] + 1)
+
+    def transition_matrix(self, source='Human_Choice', target='LLM_Choice', model=None, normalize=True):
+        """Counts (or row-normalized rates) of `target` in round r+1 given `source` in round r.
+
+        Rows and columns follow config.CHOICES. The default answers "what does the
+        LLM play after the human played X".
+        """
+        columns = self._select(model)
+        pairs = self._next_round_pairs(columns)
+        from_idx = self.engine.to_indices(columns[source][:-1][pairs])
+        to_idx = self.engine.to_indices(columns[target][1:][pairs])
+        n = len(self.engine.choices)
+        counts = np.bincount(from_idx * n + to_idx, minlength=n * n).reshape(n, n)
+        if not normalize:
+            return counts
+        totals = counts.sum(axis=1, keepdims=True)
+        return np.divide(counts, totals, out=np.zeros(counts.shape), where=totals > 0)
+
+    def bonus_rates(self, model=None):
+        """Bonus and fallback rates per round, plus how the LLM reacts to the human's bonus."""
+        columns = self._select(model)
+        rounds = len(columns['Round'])
+        if rounds == 0:
+            return {"games": 0, "rounds": 0}
+        human_bonus = columns['Human_Bonus'] > 0
+        llm_bonus = columns['LLM_Bonus'] > 0
+        pairs = self._next_round_pairs(columns)
+        after_human_bonus = human_bonus[:-1][pairs]
+        # Undercut: the LLM plays one below the human's previous choice, winning the bonus if the human repeats
+        undercut_next = (columns['LLM_Choice'][1:] == columns['Human_Choice'][:-1] - 1)[pairs]
+        llm_bonus_next = llm_bonus[1:][pairs]
+        return {
+            "games": int(len(np.unique(columns['Game_Index']))),
+            "rounds": rounds,
+            "human_bonus_rate": float(human_bonus.mean()),
+            "llm_bonus_rate": float(llm_bonus.mean()),
+            "llm_fallback_rate": float((columns['LLM_Fallback'] > 0).mean()),
+            "llm_undercut_rate": float(undercut_next.mean()) if len(undercut_next) else 0.0,
+            "llm_undercut_after_human_bonus": float(undercut_next[after_human_bonus].mean()) if after_human_bonus.any() else 0.0,
+            "llm_bonus_after_human_bonus": float(llm_bonus_next[after_human_bonus].mean()) if after_human_bonus.any() else 0.0,
+        }
+
+    def score_gaps(self, model=None):
+        """Final LLM minus human score for every game."""
+        columns = self._select(model)
+        games = columns['Game_Index']
+        last_round = np.ones(len(games), dtype=bool)
+        last_round[:-1] = games[1:] != games[:-1]
+        return (columns['LLM_Total_Score'][last_round] - columns['Human_Total_Score'][last_round]).astype(np.int64)
+
+    def score_gap_distribution(self, model=None, bins=20):
+        """Histogram, percentiles and win/tie rates of the final score gap (LLM - human)."""
+        gaps = self.score_gaps(model)
+        if len(gaps) == 0:
+            return {"games": 0}
+        counts, edges = np.histogram(gaps, bins=bins)
+        return {
+            "games": int(len(gaps)),
+            "mean": float(gaps.mean()),
+            "percentiles": {str(p): float(v) for p, v in zip((5, 25, 50, 75, 95), np.percentile(gaps, (5, 25, 50, 75, 95)))},
+            "llm_win_rate": float((gaps > 0).mean()),
+            "tie_rate": float((gaps == 0).mean()),
+            "histogram": {"counts": counts.tolist(), "edges": edges.tolist()},
+        }
+
+    def summary(self, model=None):
+        """All queries for one model, or for every model when model is None."""
+        models = [model] if model is not None else self.models
+        return {name: {
+            "bonus_rates": self.bonus_rates(name),
+            "score_gap": self.score_gap_distribution(name),
+            "transitions_human_to_llm": self.transition_matrix(model=name).round(4).tolist(),
+        } for name in models}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index game_data_*.csv logs and report per-model statistics.")
+    parser.add_argument("--pattern", default=None, help=f"CSV glob (default: {config.GAME_DATA_CSV_GLOB})")
+    parser.add_argument("--index-dir", default=None, help=f"Index directory (default: {config.ANALYTICS_INDEX_DIRECTORY})")
+    parser.add_argument("--model", default=None, help="Only report this model")
+    parser.add_argument("--no-ingest", dest="ingest", action="store_false", help="Query the existing index as is")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    analytics = GameAnalytics(args.index_dir)
+    if args.ingest:
+        analytics.ingest(args.pattern)
+    started_at = time.monotonic()
+    report = analytics.summary(args.model)
+    logger.info(f"Queries over {len(analytics.columns()['Round'])} rounds took {time.monotonic() - started_at:.3f}s")
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
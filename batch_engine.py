@@ -0,0 +1,83 @@
+import numpy as np
+import config
+
+# Vectorized scoring for simulations and strategy sweeps. The payoff matrices are
+# indexed [human_index, llm_index] over config.CHOICES and reproduce
+# GameManager.play_round exactly: base score = own choice, plus BONUS_POINTS to
+# whoever chose exactly one less than the opponent.
+
+
+def build_payoff_matrices(choices=None, bonus_points=None):
+    """Returns (human_payoff, llm_payoff), each |CHOICES| x |CHOICES| int64, indexed [human, llm]."""
+    choices = np.asarray(config.CHOICES if choices is None else choices, dtype=np.int64)
+    bonus_points = config.BONUS_POINTS if bonus_points is None else bonus_points
+    human = choices[:, None]
+    llm = choices[None, :]
+    human_bonus = np.where(human == llm - 1, bonus_points, 0)
+    # play_round checks the human bonus first; the two conditions can't both hold anyway
+    llm_bonus = np.where((llm == human - 1) & (human_bonus == 0), bonus_points, 0)
+    human_payoff = np.broadcast_to(human, human_bonus.shape) + human_bonus
+    llm_payoff = np.broadcast_to(llm, llm_bonus.shape) + llm_bonus
+    return human_payoff.astype(np.int64), llm_payoff.astype(np.int64)
+
+
+class BatchGameEngine:
+    """Scores arrays of (human, llm) choice pairs in one pass using precomputed payoff matrices."""
+
+    def __init__(self, choices=None, bonus_points=None):
+        self.choices = np.asarray(config.CHOICES if choices is None else choices, dtype=np.int64)
+        self.human_payoff, self.llm_payoff = build_payoff_matrices(self.choices, bonus_points)
+        # Lookup table from choice value to matrix index; -1 marks values outside CHOICES
+        self._offset = int(self.choices.min())
+        self._index = np.full(int(self.choices.max()) - self._offset + 1, -1, dtype=np.int64)
+        self._index[self.choices - self._offset] = np.arange(len(self.choices))
+
+    def to_indices(self, values):
+        """Maps choice values to payoff-matrix indices, rejecting anything not in CHOICES."""
+        values = np.asarray(values, dtype=np.int64)
+        shifted = values - self._offset
+        in_range = (shifted >= 0) & (shifted < len(self._index))
+        indices = np.where(in_range, self._index[np.clip(shifted, 0, len(self._index) - 1)], -1)
+        if (indices < 0).any():
+            bad = np.unique(values[indices < 0])
+            raise ValueError(f"Choices {bad.tolist()} are not in {self.choices.tolist()}")
+        return indices
+
+    def score_rounds(self, human_choices, llm_choices):
+        """Returns (human_scores, llm_scores) per round for arrays of any matching shape."""
+        human_idx = self.to_indices(human_choices)
+        llm_idx = self.to_indices(llm_choices)
+        return self.human_payoff[human_idx, llm_idx], self.llm_payoff[human_idx, llm_idx]
+
+    def score_games(self, human_choices, llm_choices):
+        """Scores whole games laid out as (n_games, n_rounds) arrays.
+
+        Returns a dict with per-round scores, cumulative totals after each round
+        (the Human_Total_Score/LLM_Total_Score columns of the game CSV) and final totals.
+        """
+        human_scores, llm_scores = self.score_rounds(np.atleast_2d(human_choices), np.atleast_2d(llm_choices))
+        human_totals = np.cumsum(human_scores, axis=-1)
+        llm_totals = np.cumsum(llm_scores, axis=-1)
+        return {
+            "human_round_scores": human_scores,
+            "llm_round_scores": llm_scores,
+            "human_totals": human_totals,
+            "llm_totals": llm_totals,
+            "human_final": human_totals[..., -1],
+            "llm_final": llm_totals[..., -1],
+        }
+
+    def expected_payoffs(self, human_strategy, llm_strategy):
+        """Expected per-round (human, llm) scores when both sides play mixed strategies over CHOICES."""
+        human_strategy = np.asarray(human_strategy, dtype=np.float64)
+        llm_strategy = np.asarray(llm_strategy, dtype=np.float64)
+        return (float(human_strategy @ self.human_payoff @ llm_strategy),
+                float(human_strategy @ self.llm_payoff @ llm_strategy))
+
+    def simulate_mixed(self, human_strategy, llm_strategy, n_games, n_rounds=config.NUM_ROUNDS, seed=None):
+        """Monte Carlo baseline: samples i.i.d. mixed-strategy games and scores them in one pass."""
+        rng = np.random.default_rng(seed)
+        shape = (n_games, n_rounds)
+        human_choices = self.choices[rng.choice(len(self.choices), size=shape, p=human_strategy)]
+        llm_choices = self.choices[rng.choice(len(self.choices), size=shape, p=llm_strategy)]
+        return self.score_games(human_choices, llm_choices)
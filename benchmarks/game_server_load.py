@@ -0,0 +1,169 @@
+"""Load test for game_server.py: many simulated humans playing full games at once.
+
+By default the game server and stub_server.py both run in this process, so
+the whole test is offline. Each simulated human keeps one keep-alive
+connection, thinks for --think-time seconds per round, and records how long
+each choice took to come back. Results are printed as JSON.
+
+    python benchmarks/game_server_load.py --sessions 300 --latency lognormal:0.4:0.5 --think-time 1
+    python benchmarks/game_server_load.py --url http://127.0.0.1:8080 --sessions 50
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import tempfile
+import tracemalloc
+from urllib.parse import urlsplit
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import config
+
+
+class HTTPConnection:
+    """Minimal keep-alive JSON client on asyncio streams."""
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+
+    async def request(self, method, path, payload=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        body = json.dumps(payload).encode() if payload is not None else b""
+        self.writer.write(f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Type: application/json\r\n"
+                          f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while (line := await self.reader.readline()) not in (b"\r\n", b""):
+            name, _, value = line.decode().partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        return status, json.loads(await self.reader.readexactly(length))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+async def play_session(host, port, think_time, rng, latencies, outcomes):
+    connection = HTTPConnection(host, port)
+    try:
+        status, state = await connection.request("POST", "/sessions")
+        if status != 201:
+            outcomes["refused"] += 1
+            return
+        while not state["game_over"]:
+            await asyncio.sleep(rng.uniform(0.5, 1.5) * think_time)
+            started_at = time.monotonic()
+            status, reply = await connection.request("POST", f"/sessions/{state['session_id']}/choice",
+                                                     {"choice": rng.choice(state["choices"])})
+            if status != 200:
+                outcomes["errors"] += 1
+                return
+            latencies.append(time.monotonic() - started_at)
+            state = reply["state"]
+        outcomes["completed"] += 1
+    finally:
+        connection.close()
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    if not ordered:
+        return {"samples": 0}
+    pick = lambda q: ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000
+    return {"samples": len(ordered), "p50_ms": pick(0.5), "p90_ms": pick(0.9), "p99_ms": pick(0.99), "max_ms": ordered[-1] * 1000}
+
+
+async def run_load(args):
+    latencies = []
+    outcomes = {"completed": 0, "refused": 0, "errors": 0}
+    rng = random.Random(args.seed)
+    server = stub = None
+    if args.url:
+        parts = urlsplit(args.url)
+        host, port = parts.hostname, parts.port or 80
+    else:
+        from stub_server import StubLLMServer
+        from game_server import GameServer
+        stub = StubLLMServer(("127.0.0.1", 0), policy="undercut", latency=args.latency, seed=args.seed).start_in_thread()
+        config.LLM_BASE_URL = stub.base_url
+        if args.rate_limit:
+            config.LLM_RATE_LIMITS[config.LLM_MODEL] = (args.rate_limit, max(1, int(args.rate_limit)))
+        if args.max_in_flight:
+            config.LLM_MAX_IN_FLIGHT = args.max_in_flight
+        server = GameServer("127.0.0.1", 0, csv_filename=os.path.join("logs", "game_server_load.csv"))
+        await server.start()
+        host, port = server.host, server.port
+
+    started_at = time.monotonic()
+    tracemalloc_before = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+    sessions = [asyncio.create_task(play_session(host, port, args.think_time, random.Random(rng.random()), latencies, outcomes))
+                for _ in range(args.sessions)]
+    peak_sessions = 0
+    while not all(task.done() for task in sessions):
+        await asyncio.sleep(0.05)
+        if server is not None:
+            peak_sessions = max(peak_sessions, len(server.sessions))
+    for task in sessions:
+        task.result() # Surface client-side exceptions
+    elapsed = time.monotonic() - started_at
+
+    report = {"sessions": args.sessions, "latency": None if args.url else args.latency, "think_time_s": args.think_time,
+              "seconds": elapsed, "rounds_per_sec": len(latencies) / elapsed, "outcomes": outcomes,
+              "choice_latency": percentiles(latencies)}
+    if server is not None:
+        report["server"] = server.get_stats()
+        report["peak_sessions"] = peak_sessions
+        if tracemalloc_before is not None:
+            report["traced_bytes_per_session_peak"] = (tracemalloc.get_traced_memory()[1] - tracemalloc_before) / max(1, peak_sessions)
+        await server.close()
+        stub.shutdown()
+        stub.server_close()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run many simulated humans against game_server.py.")
+    parser.add_argument("--url", default=None, help="Test a running server instead of an in-process one")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--latency", default="lognormal:0.4:0.5", help="Stub server latency (see stub_server.py)")
+    parser.add_argument("--rate-limit", type=float, default=None, help="Requests/sec to the stub (default: the configured limit)")
+    parser.add_argument("--max-in-flight", type=int, default=None, help=f"LLM calls on the wire at once (default: {config.LLM_MAX_IN_FLIGHT})")
+    parser.add_argument("--think-time", type=float, default=1.0, help="Mean seconds a human takes per round")
+    parser.add_argument("--trace-memory", action="store_true", help="Estimate per-session memory with tracemalloc (slow)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    os.environ.setdefault("LLM_API_KEY", "benchmark") # Only the stub server is called
+    config.load_environment()
+    if args.trace_memory:
+        tracemalloc.start()
+    with tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir) # Logs and the server CSV land in the temp dir
+        try:
+            if not args.url:
+                import interaction_log
+                from llm_player import setup_logging
+                setup_logging()
+                logging.getLogger().setLevel(logging.ERROR)
+                logging.getLogger("InteractionLogger").setLevel(logging.ERROR)
+            report = asyncio.run(run_load(args))
+        finally:
+            if not args.url:
+                interaction_log.stop_listener()
+                logging.shutdown()
+            os.chdir(cwd)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Cold-start cost of importing the game's modules, measured with `python -X importtime`.
+
+Each module is imported in a fresh interpreter whose working directory is an
+empty temp dir, so the report also shows whether the import touched the disk
+(a logs/ directory, a truncated interaction log) or pulled in openai/pygame.
+
+    python benchmarks/import_time.py                 # headless worker modules
+    python benchmarks/import_time.py main_pygame --top 15 --json
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# What a tournament worker process imports before its first game
+HEADLESS_MODULES = ["config", "game_manager", "llm_player", "ensemble_player", "tournament"]
+HEAVY_PACKAGES = ("openai", "pygame", "httpx", "numpy", "dotenv")
+
+
+def measure(module, repeats=5):
+    """Imports module in fresh interpreters; returns the best run's timings and side effects."""
+    best = None
+    for _ in range(repeats):
+        with tempfile.TemporaryDirectory() as workdir:
+            env = dict(os.environ, PYTHONPATH=REPO_ROOT, PYTHONDONTWRITEBYTECODE="1")
+            result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                                    cwd=workdir, env=env, capture_output=True, text=True)
+            if result.returncode != 0:
+                raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+            created = sorted(os.listdir(workdir))
+
+        # Lines look like "import time:  self [us] | cumulative | imported package"
+        imports = {}
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "imported package" in line:
+                continue
+            self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+            imports[name.strip()] = (int(self_us), int(cumulative_us))
+        total_us = imports.get(module, (0, 0))[1]
+        if best is None or total_us < best["total_ms"] * 1000:
+            best = {
+                "module": module,
+                "total_ms": total_us / 1000,
+                "modules_imported": len(imports),
+                "heavy_packages": sorted({name.split(".")[0] for name in imports} & set(HEAVY_PACKAGES)),
+                "files_created": created,
+                "imports": imports,
+            }
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start import time and import side effects.")
+    parser.add_argument("modules", nargs="*", default=HEADLESS_MODULES)
+    parser.add_argument("--repeats", type=int, default=5, help="Fresh interpreters per module; the fastest run is kept")
+    parser.add_argument("--top", type=int, default=5, help="Slowest imports (self time) to list per module")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args()
+
+    results = [measure(module, args.repeats) for module in args.modules]
+    for result in results:
+        slowest = sorted(result.pop("imports").items(), key=lambda item: item[1][0], reverse=True)[:args.top]
+        result["slowest_imports_ms"] = {name: self_us / 1000 for name, (self_us, _) in slowest}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for result in results:
+        print(f"{result['module']:<16} {result['total_ms']:8.1f} ms  {result['modules_imported']:4d} modules  "
+              f"heavy: {', '.join(result['heavy_packages']) or '-'}  "
+              f"files created: {', '.join(result['files_created']) or 'none'}")
+        for name, ms in result["slowest_imports_ms"].items():
+            print(f"    {ms:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,415 @@
+"""Micro and end-to-end benchmarks, written to JSON so runs can be compared across commits.
+
+Everything runs in an empty temp working directory, so game CSVs and
+interaction logs never touch the repo's logs/. Log records below
+--log-level are dropped, so the timings measure the code rather than console I/O.
+
+    python benchmarks/suite.py --output bench.json
+    python benchmarks/suite.py --only parse_choice format_prompt --compare bench.json
+    python benchmarks/suite.py --only end_to_end --latency lognormal:0.05:0.5 --games 4
+
+Benchmarks:
+    play_round      GameManager.play_round, including the buffered CSV writer and its flush at game end
+    format_prompt   LLMPlayer._format_round_prompt and the memory strategies' message build at rounds 1/10/60/500
+    parse_choice    LLMPlayer._parse_choice over real-looking and adversarial replies (plus --corpus)
+    frame_time      main_pygame draw functions and Renderer frames under SDL's dummy video driver
+    end_to_end      Rounds/sec of full headless games against stub_server.py, sync and async
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import platform
+import datetime
+import tempfile
+import subprocess
+import statistics
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import config
+
+BENCHMARKS = ("play_round", "format_prompt", "parse_choice", "frame_time", "end_to_end")
+PROMPT_ROUNDS = (1, 10, 60, 500)
+
+# Replies shaped like what models actually send, per response mode
+REAL_REPLIES = {
+    "bare_number": "3",
+    "bare_number_padded": " 4\n",
+    "choice_line": "I expect the opponent to repeat 4, so undercutting wins the bonus.\nMy choice is: 3",
+    "choice_line_bold": "Reasoning: they have alternated between 2 and 3.\n\n**My choice is: 2**",
+    "choice_line_long": ("Looking at the history, the opponent chose 5, 4, 4 and 3. " * 12) + "\nMy choice is: 2",
+    "last_line": "The opponent keeps undercutting me, so I'll play low.\nI pick 1",
+}
+# Replies that push the parser onto its fallbacks or stress its regexes
+ADVERSARIAL_REPLIES = {
+    "empty": "",
+    "whitespace": " \n\t \n",
+    "out_of_range": "My choice is: 9",
+    "huge_number": "My choice is: " + "9" * 400,
+    "spelled_out": "My choice is: three",
+    "fullwidth_digit": "My choice is: ３",
+    "repeated_marker": "My choice is: My choice is: My choice is: 2",
+    "many_numbers": " ".join(str(i % 7) for i in range(2000)),
+    "no_digits_100kb": "undercut " * 11000,
+    "digits_no_newline_100kb": "1234567890" * 10000,
+}
+
+
+def _stats(samples, per_call=1):
+    """Summary of timing samples (seconds for `per_call` calls each), in microseconds per call."""
+    per_call_us = sorted(sample / per_call * 1e6 for sample in samples)
+    return {
+        "runs": len(per_call_us),
+        "mean_us": statistics.fmean(per_call_us),
+        "p50_us": per_call_us[len(per_call_us) // 2],
+        "p95_us": per_call_us[min(len(per_call_us) - 1, int(len(per_call_us) * 0.95))],
+        "min_us": per_call_us[0],
+    }
+
+
+def _timeit(fn, number, repeat):
+    """Times `repeat` batches of `number` calls to fn."""
+    samples = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append(time.perf_counter() - started_at)
+    return _stats(samples, number)
+
+
+def _game_state(history, round_num):
+    return {"game_id": "bench", "round": round_num, "history": history, # history is a read-only view
+            "human_score": history.total("human"), "llm_score": history.total("llm")}
+
+
+def _random_history(rounds, rng):
+    """A RoundHistory of `rounds` rounds with the real scoring rule."""
+    from round_history import RoundHistory
+    history = RoundHistory()
+    for round_num in range(1, rounds + 1):
+        human_choice, llm_choice = rng.choice(config.CHOICES), rng.choice(config.CHOICES)
+        human_change = human_choice + (config.BONUS_POINTS if human_choice == llm_choice - 1 else 0)
+        llm_change = llm_choice + (config.BONUS_POINTS if llm_choice == human_choice - 1 else 0)
+        history.append((round_num, human_choice, llm_choice, human_change, llm_change))
+    return history
+
+
+def bench_play_round(args):
+    from game_manager import GameManager
+    rng = random.Random(args.seed)
+    games = max(1, args.iterations // 100)
+    round_samples, close_samples = [], []
+    started_at = time.perf_counter()
+    for game in range(games):
+        game_manager = GameManager(game_id=f"bench{game}")
+        while not game_manager.is_game_over():
+            human_choice, llm_choice = rng.choice(config.CHOICES), rng.choice(config.CHOICES)
+            round_started_at = time.perf_counter()
+            game_manager.play_round(human_choice, llm_choice)
+            round_samples.append(time.perf_counter() - round_started_at)
+        close_started_at = time.perf_counter()
+        game_manager.close() # Already flushed by the last round; measures the no-op path
+        close_samples.append(time.perf_counter() - close_started_at)
+    elapsed = time.perf_counter() - started_at
+    return {
+        "games": games,
+        "rounds_per_game": config.NUM_ROUNDS,
+        "play_round": _stats(round_samples),
+        "close": _stats(close_samples),
+        "games_per_sec": games / elapsed, # Includes GameManager setup (opening the CSV)
+    }
+
+
+def _bench_player(memory_strategy="full", response_mode="decision"):
+    from llm_player import LLMPlayer
+    return LLMPlayer(seed=0, memory_strategy=memory_strategy, response_mode=response_mode)
+
+
+def _replay_conversation(player, history, upto_round):
+    """Fills the player's conversation as if it had played rounds 1..upto_round-1."""
+    player.first_round = True
+    for round_num in range(1, upto_round):
+        player.round_starts.append(len(player.conversation_history))
+        player.conversation_history.append(
+            {"role": "user", "content": player._format_round_prompt(_game_state(history[:round_num - 1], round_num))})
+        player.conversation_history.append({"role": "assistant", "content": str(history[round_num - 1][2])})
+
+
+def bench_format_prompt(args):
+    rng = random.Random(args.seed)
+    history = _random_history(max(PROMPT_ROUNDS), rng)
+    number = max(1, args.iterations // 10)
+    results = {}
+    player = _bench_player()
+    for round_num in PROMPT_ROUNDS:
+        game_state = _game_state(history[:round_num - 1], round_num)
+
+        def format_prompt():
+            player.first_round = round_num == 1
+            player._format_round_prompt(game_state)
+        results[f"format_round_prompt@{round_num}"] = _timeit(format_prompt, number, args.repeat)
+
+    # Building the request grows with the conversation for "full"; window and digest should stay flat
+    for memory_strategy in ("full", "window", "digest"):
+        for round_num in PROMPT_ROUNDS:
+            player = _bench_player(memory_strategy)
+            _replay_conversation(player, history, round_num)
+            game_state = _game_state(history[:round_num - 1], round_num)
+            player.round_starts.append(len(player.conversation_history))
+            player.conversation_history.append({"role": "user", "content": player._format_round_prompt(game_state)})
+            stats = _timeit(lambda: player._build_messages(game_state), number, args.repeat)
+            messages = player._build_messages(game_state)
+            stats["messages"] = len(messages)
+            stats["prompt_chars"] = sum(len(message["content"]) for message in messages)
+            results[f"build_messages[{memory_strategy}]@{round_num}"] = stats
+    return results
+
+
+def _load_corpus(path):
+    """Replies from an interactions.jsonl (the "response" of each record) or a plain text file, one per line."""
+    replies = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if path.endswith(".jsonl"):
+                response = json.loads(line).get("response")
+                if response is not None:
+                    replies.append(response)
+            elif line.strip():
+                replies.append(line.rstrip("\n"))
+    return replies
+
+
+def bench_parse_choice(args):
+    corpus = {f"real:{name}": reply for name, reply in REAL_REPLIES.items()}
+    corpus.update({f"adversarial:{name}": reply for name, reply in ADVERSARIAL_REPLIES.items()})
+    player = _bench_player(response_mode="analysis")
+    number = max(1, args.iterations // 10)
+    results = {}
+    for name, reply in corpus.items():
+        player.parse_stats.clear()
+        stats = _timeit(lambda: player._parse_choice(reply), number, args.repeat)
+        stats["parse_path"] = next(iter(player.parse_stats))
+        stats["chars"] = len(reply)
+        results[name] = stats
+    if args.corpus:
+        replies = _load_corpus(args.corpus)
+        player.parse_stats.clear()
+        started_at = time.perf_counter()
+        for reply in replies:
+            player._parse_choice(reply)
+        elapsed = time.perf_counter() - started_at
+        results["corpus"] = {"path": args.corpus, "replies": len(replies),
+                             "mean_us": elapsed / len(replies) * 1e6 if replies else 0.0,
+                             "parse_paths": dict(player.parse_stats)}
+    return results
+
+
+def bench_frame_time(args):
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    import pygame
+    import main_pygame as ui
+    ui.init_pygame()
+    ui.text_cache.clear()
+    surface = ui.screen
+    number = max(1, args.iterations // 20)
+    history = _random_history(3, random.Random(args.seed))
+    results = {}
+
+    draws = {
+        "draw_header": lambda: ui.draw_header(surface, 42, 57, config.LLM_MODEL, 7),
+        "draw_status": lambda: ui.draw_status(surface, "Your Turn! Choose a number."),
+        "draw_history": lambda: ui.draw_history(surface, history),
+    }
+    for name, draw in draws.items():
+        ui.text_cache.clear()
+        started_at = time.perf_counter()
+        draw()
+        cold_us = (time.perf_counter() - started_at) * 1e6 # First draw renders every glyph run
+        results[name] = _timeit(draw, number, args.repeat)
+        results[name]["cold_us"] = cold_us
+
+    # Text that changes every frame (the waiting timer) always misses the cache
+    counter = iter(range(10 ** 9))
+    results["draw_status_changing_text"] = _timeit(
+        lambda: ui.draw_status(surface, f"LLM is thinking... {next(counter) / 10:.1f}s"), number, args.repeat)
+
+    buttons = []
+    for i, choice in enumerate(config.CHOICES):
+        buttons.append(ui.Button(config.PADDING + i * (config.BUTTON_WIDTH + config.PADDING), 300,
+                                 config.BUTTON_WIDTH, config.BUTTON_HEIGHT, text=str(choice)))
+    results["button_draw"] = _timeit(lambda: buttons[0].draw(surface), number, args.repeat)
+
+    header = ui.Widget(ui.header_area_rect(), ui.draw_header)
+    history_panel = ui.Widget(ui.history_area_rect(), lambda s, last_round: ui.draw_history(s, [last_round] if last_round else []))
+    status_bar = ui.Widget(ui.status_area_rect(), ui.draw_status)
+    renderer = ui.Renderer(surface, [header, *buttons, history_panel, status_bar])
+    header.update(42, 57, config.LLM_MODEL, 7)
+    history_panel.update(history[-1])
+    status_bar.update("Your Turn! Choose a number.")
+
+    def full_frame():
+        renderer.full_redraw = True
+        renderer.render()
+
+    def hover_frame():
+        buttons[0].set_hovered(not buttons[0].is_hovered)
+        renderer.render()
+
+    results["frame_full_redraw"] = _timeit(full_frame, number, args.repeat)
+    results["frame_hover_change"] = _timeit(hover_frame, number, args.repeat)
+    results["frame_idle"] = _timeit(renderer.render, number, args.repeat)
+    for stats in results.values():
+        stats["fps_at_mean"] = 1e6 / stats["mean_us"] if stats["mean_us"] else None
+    results["text_cache"] = ui.text_cache.get_stats()
+    pygame.quit()
+    return results
+
+
+def bench_end_to_end(args):
+    import tournament
+    from stub_server import StubLLMServer
+    server = StubLLMServer(("127.0.0.1", 0), policy="undercut", latency=args.latency, seed=args.seed).start_in_thread()
+    saved_base_url, config.LLM_BASE_URL = config.LLM_BASE_URL, server.base_url
+    saved_rate_limits = dict(config.LLM_RATE_LIMITS)
+    if args.rate_limit:
+        config.LLM_RATE_LIMITS[config.LLM_MODEL] = (args.rate_limit, max(1, int(args.rate_limit)))
+    jobs = [{"game_id": f"e2e{i:04d}", "policy": "random", "opponent": "llm", "seed": args.seed + i, "game_csv": True}
+            for i in range(args.games)]
+    results = {"latency": args.latency, "games": args.games, "rounds_per_game": config.NUM_ROUNDS,
+               "rate_limit": list(config.LLM_RATE_LIMITS.get(config.LLM_MODEL, config.LLM_DEFAULT_RATE_LIMIT))}
+    try:
+        started_at = time.perf_counter()
+        for job in jobs:
+            tournament.play_game(job)
+        elapsed = time.perf_counter() - started_at
+        results["sync"] = {"seconds": elapsed, "rounds_per_sec": args.games * config.NUM_ROUNDS / elapsed}
+
+        async def run_async():
+            return await asyncio.gather(*(tournament.play_game_async(job) for job in jobs))
+
+        started_at = time.perf_counter()
+        asyncio.run(run_async())
+        elapsed = time.perf_counter() - started_at
+        results["async"] = {"seconds": elapsed, "concurrent_games": args.games,
+                            "rounds_per_sec": args.games * config.NUM_ROUNDS / elapsed}
+        results["stub_requests"] = server.stats.get("requests")
+    finally:
+        config.LLM_BASE_URL = saved_base_url
+        config.LLM_RATE_LIMITS.clear()
+        config.LLM_RATE_LIMITS.update(saved_rate_limits)
+        server.shutdown()
+        server.server_close()
+    return results
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _flatten(results, prefix=""):
+    """{"bench/case/metric": value} for the metrics worth comparing: medians and throughputs (means and tails are noisy)."""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}/{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(_flatten(value, name))
+        elif isinstance(value, (int, float)) and (key == "p50_us" or key.endswith("_per_sec")):
+            flat[name] = value
+    return flat
+
+
+def compare(baseline, current, threshold=0.10):
+    """Prints every metric that moved by more than `threshold` against the baseline run."""
+    before, after = _flatten(baseline["results"]), _flatten(current["results"])
+    print(f"Compared with {baseline['meta'].get('git_revision')} ({baseline['meta'].get('timestamp')}):")
+    changed = 0
+    for name in sorted(before.keys() & after.keys()):
+        if not before[name]:
+            continue
+        change = after[name] / before[name] - 1
+        if abs(change) >= threshold:
+            # Time going up, or throughput going down, is a regression
+            worse = change > 0 if name.endswith("_us") else change < 0
+            print(f"  {'REGRESSION' if worse else 'improved  '} {change:+7.1%}  {name}: {before[name]:.2f} -> {after[name]:.2f}")
+            changed += 1
+    if not changed:
+        print(f"  no metric moved by {threshold:.0%} or more")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the benchmark suite and write the results as JSON.")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, default=list(BENCHMARKS))
+    parser.add_argument("--iterations", type=int, default=1000, help="Scale of the per-benchmark call counts")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed batches per case")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--corpus", default=None, help="Extra _parse_choice replies: an interactions.jsonl or a text file, one reply per line")
+    parser.add_argument("--latency", default="fixed:0.005", help="Stub server latency for end_to_end (see stub_server.py)")
+    parser.add_argument("--games", type=int, default=4, help="Games per end_to_end mode")
+    parser.add_argument("--rate-limit", type=float, default=None,
+                        help="Requests/sec the async client may send in end_to_end (default: the configured limit)")
+    parser.add_argument("--log-level", default="ERROR", help="Log level while benchmarking")
+    parser.add_argument("--output", default=None, help="Write the JSON results here (default: stdout)")
+    parser.add_argument("--compare", default=None, help="Baseline JSON from an earlier run to diff against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative change --compare reports")
+    args = parser.parse_args()
+    if args.corpus:
+        args.corpus = os.path.abspath(args.corpus)
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    os.environ.setdefault("LLM_API_KEY", "benchmark") # Only the stub server is ever called
+    config.load_environment()
+    import interaction_log
+    from llm_player import setup_logging, interaction_logger
+
+    report = {"meta": {
+        "git_revision": _git_revision(),
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "args": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+    }, "results": {}}
+
+    with tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir) # config paths are relative: logs/ lands in the temp dir
+        try:
+            setup_logging()
+            logging.getLogger().setLevel(args.log_level)
+            interaction_logger.setLevel(args.log_level)
+            for name in args.only:
+                started_at = time.perf_counter()
+                report["results"][name] = globals()[f"bench_{name}"](args)
+                print(f"{name}: {time.perf_counter() - started_at:.1f}s", file=sys.stderr)
+        finally:
+            interaction_log.stop_listener()
+            logging.shutdown()
+            os.chdir(cwd)
+
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if baseline is not None:
+        compare(baseline, report, args.threshold)
+
+
+if __name__ == "__main__":
+    main()
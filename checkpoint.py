@@ -0,0 +1,77 @@
+import os
+import time
+import pickle
+import logging
+import config
+
+# Get the root logger configured in llm_player
+logger = logging.getLogger()
+
+# Game checkpoints: after a round, the whole game (scores, history, CSV position,
+# the opponent's conversation and RNG state, the scripted human's RNG) is pickled
+# to one small file, replaced atomically. resume_game() rebuilds the game from it
+# so a crashed run continues at the next round without repeating any API call.
+# Checkpoints are only ever read back by this program: don't load untrusted files.
+
+CHECKPOINT_VERSION = 1
+
+
+def _player_classes():
+    # Imported here: llm_player pulls in the API client stack
+    from llm_player import LLMPlayer
+    from ensemble_player import EnsemblePlayer
+    from solver import SolverPlayer
+    return {"LLMPlayer": LLMPlayer, "EnsemblePlayer": EnsemblePlayer, "SolverPlayer": SolverPlayer}
+
+
+def save_checkpoint(path, game_manager, player, policy=None):
+    """Atomically replaces the checkpoint at `path` with the game's current state; returns its size in bytes."""
+    snapshot = {
+        "version": CHECKPOINT_VERSION,
+        "saved_at": time.time(),
+        "game": game_manager.snapshot(),
+        "player_type": type(player).__name__,
+        "player": player.snapshot(),
+        "policy": policy.snapshot() if policy is not None else None,
+    }
+    data = pickle.dumps(snapshot, protocol=pickle.HIGHEST_PROTOCOL)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp" # Same directory, so os.replace is an atomic rename
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        if config.CHECKPOINT_FSYNC:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(data)
+
+
+def load_checkpoint(path):
+    """Reads a checkpoint written by save_checkpoint()."""
+    with open(path, 'rb') as f:
+        snapshot = pickle.load(f)
+    if snapshot.get("version") != CHECKPOINT_VERSION:
+        raise ValueError(f"Checkpoint {path} has version {snapshot.get('version')}, expected {CHECKPOINT_VERSION}")
+    return snapshot
+
+
+def restore_game(snapshot, policy=None):
+    """Rebuilds (game_manager, player) from a loaded checkpoint; also restores `policy`'s state when given."""
+    from game_manager import GameManager
+    player_classes = _player_classes()
+    if snapshot["player_type"] not in player_classes:
+        raise ValueError(f"Unknown player type '{snapshot['player_type']}' in checkpoint")
+    player = player_classes[snapshot["player_type"]].from_snapshot(snapshot["player"])
+    game_manager = GameManager.from_snapshot(snapshot["game"])
+    if policy is not None and snapshot["policy"] is not None:
+        policy.restore_snapshot(snapshot["policy"])
+    return game_manager, player
+
+
+def resume_game(path, policy=None):
+    """Loads and restores the checkpoint at `path`; returns (game_manager, player)."""
+    started_at = time.perf_counter()
+    game_manager, player = restore_game(load_checkpoint(path), policy)
+    logger.info(f"Resumed game {game_manager.game_id} at round {game_manager.round} from {path} "
+                f"in {(time.perf_counter() - started_at) * 1000:.1f} ms")
+    return game_manager, player
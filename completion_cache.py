@@ -0,0 +1,117 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import config
+
+# Get the root logger configured in llm_player
+logger = logging.getLogger()
+
+CACHE_MODES = ("record", "replay", "passthrough")
+
+_default_cache = None
+
+
+class CacheMissError(Exception):
+    """Raised in replay mode when a request has no recorded completion."""
+
+
+class CompletionCache:
+    """Content-addressed store of LLM completions in SQLite with size-bounded LRU eviction.
+
+    Modes:
+    - record: serve recorded completions, call the API on a miss and record the answer
+    - replay: serve recorded completions only; a miss raises CacheMissError (offline reruns)
+    - passthrough: always call the API, never read or write the cache
+    """
+
+    def __init__(self, path, mode="record", max_bytes=None):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode '{mode}'. Available: {', '.join(CACHE_MODES)}")
+        self.path = path
+        self.mode = mode
+        self.max_bytes = max_bytes or config.LLM_CACHE_MAX_BYTES
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock() # The LLMWorker thread and the main thread may share a cache
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL") # Lets tournament worker processes share the file
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS completions (
+            key TEXT PRIMARY KEY,
+            response TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            last_used REAL NOT NULL)""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS completions_last_used ON completions (last_used)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+
+    @staticmethod
+    def make_key(request_kwargs):
+        """Hashes every argument that shapes the completion (model, temperature, max_tokens, messages, ...)."""
+        canonical = json.dumps(request_kwargs, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Returns the recorded response for key, or None. Raises CacheMissError on a replay-mode miss."""
+        if self.mode == "passthrough":
+            return None
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self._conn.execute("UPDATE completions SET last_used = ? WHERE key = ?", (time.time(), key))
+                self._conn.commit()
+                self.hits += 1
+                return row[0]
+            self.misses += 1
+        if self.mode == "replay":
+            raise CacheMissError(f"No recorded completion for request {key[:12]} in {self.path}")
+        return None
+
+    def put(self, key, response):
+        """Records a response (record mode only), evicting least recently used entries over max_bytes."""
+        if self.mode != "record":
+            return
+        size = len(response.encode('utf-8'))
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO completions (key, response, size, last_used) VALUES (?, ?, ?, ?)",
+                               (key, response, size, time.time()))
+            self._conn.commit()
+            self._total_bytes += size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Other processes may have written too, so re-read the true total before evicting
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+        evicted = 0
+        while self._total_bytes > self.max_bytes:
+            rows = self._conn.execute("SELECT key, size FROM completions ORDER BY last_used LIMIT 100").fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                self._conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+                self._total_bytes -= size
+                evicted += 1
+                if self._total_bytes <= self.max_bytes:
+                    break
+        self._conn.commit()
+        logger.info(f"Completion cache evicted {evicted} entries ({self._total_bytes} bytes remain).")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def get_completion_cache():
+    """Returns the process-wide cache configured by LLM_CACHE_MODE/LLM_CACHE_FILE, or None in passthrough mode."""
+    global _default_cache
+    if config.LLM_CACHE_MODE == "passthrough":
+        return None
+    if _default_cache is None:
+        os.makedirs(os.path.dirname(config.LLM_CACHE_FILE) or ".", exist_ok=True)
+        _default_cache = CompletionCache(config.LLM_CACHE_FILE, mode=config.LLM_CACHE_MODE)
+        logger.info(f"Completion cache opened: {config.LLM_CACHE_FILE} (mode: {config.LLM_CACHE_MODE})")
+    return _default_cache
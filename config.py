@@ -1,8 +1,8 @@
 import os
-from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
+# Importing config has no side effects: settings read from the environment see
+# os.environ as it is at import time. Entry points call load_environment() to
+# pull in the .env file, and ensure_log_directory() before writing logs.
 
 # --- Game Rules ---
 NUM_ROUNDS = 10
@@ -15,21 +15,83 @@ BONUS_POINTS = 10
 # LLM_API_KEY is loaded from .env
 LLM_API_KEY = os.getenv("LLM_API_KEY")
 OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+# Endpoint actually used; e.g. LLM_BASE_URL=http://127.0.0.1:8765/v1 for the offline stub_server.py
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", OPENROUTER_BASE_URL)
 # Default model - can be overridden if needed
 # Examples: "anthropic/claude-3-haiku-20240307", "openai/gpt-4o", "google/gemini-flash-1.5"
 LLM_MODEL = "openai/gpt-4.1" # Using a free/fast model for now
 LLM_TEMPERATURE = 0.7 # Controls randomness (0.0 = deterministic, 1.0 = more random)
+# Response format: "analysis" (1 sentence + "My choice is: N") or "decision" (the bare number, a few tokens at most)
+LLM_RESPONSE_MODE = "analysis"
+LLM_RESPONSE_MODES_BY_MODEL = {} # Per-model overrides, e.g. {"openai/gpt-4.1-mini": "decision"}
+LLM_DECISION_MAX_TOKENS = 3
+# Per-model token id of each choice's digit; when set, decision mode sends logit_bias restricted to them.
+# e.g. {"openai/gpt-4-turbo": {1: 16, 2: 17, 3: 18, 4: 19, 5: 20}} (cl100k_base digit tokens)
+LLM_DECISION_TOKEN_IDS = {}
+LLM_STREAMING = False # Stream completions and close the stream once "My choice is: N" has arrived
+# Prompt caching: requests only ever extend the previous round's messages, so providers can reuse it.
+# Models matching these prefixes also get explicit cache_control breakpoints (system prompt + newest message).
+LLM_CACHE_CONTROL_MODEL_PREFIXES = ("anthropic/",)
+
+# Per-round latency budget, retries and hedging
+LLM_ROUND_DEADLINE_S = 30.0 # Total time for the LLM's answer, retries included; then a marked random fallback
+LLM_MAX_RETRIES = 2 # Retries for timeouts, connection errors, 429s and 5xx
+LLM_RETRY_BACKOFF_BASE_S = 0.5
+LLM_RETRY_BACKOFF_CAP_S = 8.0
+LLM_HEDGE = False # Fire a second request if the first hasn't answered by the observed p95 latency
+LLM_HEDGE_MODEL = None # Model for the hedge request; None duplicates the primary model
+LLM_HEDGE_MIN_SAMPLES = 10 # Latency samples needed before the p95 is trusted
+LLM_HEDGE_DEFAULT_DELAY_S = 5.0 # Hedge delay until then
+
+# Ensemble opponent: the same round goes to every model concurrently, each with its own history.
+# Non-empty ENSEMBLE_MODELS makes the Pygame game play against the ensemble instead of LLM_MODEL.
+ENSEMBLE_MODELS = [] # e.g. ["openai/gpt-4.1", "anthropic/claude-3-haiku-20240307", "google/gemini-flash-1.5"]
+ENSEMBLE_POLICY = "majority" # "majority", "first_valid" or "primary"
+ENSEMBLE_PRIMARY = None # Model whose answer is used by "primary" and breaks majority ties; None = first model
+
+# Solver opponent (solver.py): analytical baseline over CHOICES and BONUS_POINTS, no API calls
+SOLVER_POLICY = "best_response" # "nash" (sample the mixed equilibrium) or "best_response" (to the human's frequencies)
+
+# Conversation memory: "full" (resend everything), "window" (last N rounds) or "digest" (window + summary of older rounds)
+LLM_MEMORY_STRATEGY = "full"
+LLM_MEMORY_WINDOW_ROUNDS = 10
+LLM_MEMORY_WINDOW_STRIDE = 1 # >1 drops old rounds this many at a time, keeping the prompt prefix cacheable in between
+
+# Async path (many concurrent games in one process)
+LLM_MAX_IN_FLIGHT = 32 # Max concurrent API calls across all players in the process
+LLM_MAX_CONNECTIONS = 64 # HTTP connection pool size of the shared AsyncOpenAI client
+LLM_DEFAULT_RATE_LIMIT = (5.0, 10) # (requests per second, burst) per model
+LLM_RATE_LIMITS = {} # Per-model overrides, e.g. {"openai/gpt-4.1": (10.0, 20)}
+
+# Completion cache: "record" (serve hits, record misses), "replay" (offline, misses are errors) or "passthrough"
+LLM_CACHE_MODE = os.getenv("LLM_CACHE_MODE", "passthrough")
+LLM_CACHE_MAX_BYTES = 256 * 1024 * 1024 # LRU eviction above this many bytes of stored responses
 
 # --- Logging & Data Output ---
 LOG_DIRECTORY = "logs"
 LOG_LEVEL = "DEBUG" # Changed back to DEBUG to see memory logs
 
-# Ensure log directory exists
-os.makedirs(LOG_DIRECTORY, exist_ok=True)
-
 LLM_INTERACTION_LOG_FILE = os.path.join(LOG_DIRECTORY, "llm_interactions.log")
+# Structured interaction log: one JSON object per API call, written by a background thread
+INTERACTION_JSONL_ENABLED = True
+INTERACTION_JSONL_FILE = os.path.join(LOG_DIRECTORY, "interactions.jsonl")
+INTERACTION_JSONL_MAX_BYTES = 50 * 1024 * 1024 # Rotate above this size
+INTERACTION_JSONL_BACKUPS = 5
+INTERACTION_JSONL_PER_GAME = False # Write each game's records to its own file instead
+INTERACTION_JSONL_PER_GAME_TEMPLATE = os.path.join(LOG_DIRECTORY, "interactions", "{game_id}.jsonl")
+LLM_CACHE_FILE = os.path.join(LOG_DIRECTORY, "completion_cache.sqlite3")
 # LLM_MEMORY_LOG_FILE_TEMPLATE = os.path.join(LOG_DIRECTORY, "llm_memory_{timestamp}.log") # Removed memory log file
 GAME_DATA_CSV_FILE_TEMPLATE = os.path.join(LOG_DIRECTORY, "game_data_{timestamp}.csv") # Use timestamp for unique files
+GAME_DATA_CSV_GLOB = os.path.join(LOG_DIRECTORY, "game_data_*.csv")
+ANALYTICS_INDEX_DIRECTORY = os.path.join(LOG_DIRECTORY, "analytics_index") # Columnar index built by analytics.py
+CSV_FLUSH_EVERY_ROUNDS = 10 # Buffered CSV rows are written in batches of this size (and always at game end)
+GAME_DATA_COLUMNAR_DIRECTORY = None # e.g. os.path.join(LOG_DIRECTORY, "game_data_columns") to also append games as binary columns
+CHECKPOINT_DIRECTORY = os.path.join(LOG_DIRECTORY, "checkpoints") # Default for tournament.py --checkpoint
+CHECKPOINT_FSYNC = False # fsync every checkpoint: survives power loss too, not just a crash, at a few ms per round
+# Metrics (metrics.py): latency/token histograms and parse-path counters by model and round, written at game end
+METRICS_EXPORT = True
+METRICS_PROMETHEUS_FILE = os.path.join(LOG_DIRECTORY, "metrics.prom") # Replaced on each export; None to skip
+METRICS_JSON_FILE_TEMPLATE = os.path.join(LOG_DIRECTORY, "metrics_{timestamp}.json")
 
 # Optional detailed game log (not currently used)
 # GAME_LOG_FILE = os.path.join(LOG_DIRECTORY, "game_log.txt")
@@ -62,6 +124,22 @@ BUTTON_HEIGHT = 50
 HISTORY_AREA_HEIGHT = 200
 STATUS_AREA_HEIGHT = 50
 
+# Rendering: the UI sleeps in pygame.event.wait and redraws only the widgets whose state changed
+UI_MAX_FPS = 60 # Cap on redraws per second during bursts of input (e.g. mouse motion)
+UI_IDLE_WAIT_MS = 1000 # Longest sleep between wake-ups while waiting for the human
+UI_BUSY_WAIT_MS = 100 # Wake-up interval while waiting for the LLM, to refresh the elapsed time in the status bar
+UI_TEXT_CACHE_SIZE = 256 # Rendered text surfaces kept for reuse (labels, scores, status lines)
+
+# --- Game Server (game_server.py: many browser sessions in one asyncio process) ---
+GAME_SERVER_HOST = "127.0.0.1"
+GAME_SERVER_PORT = 8080
+GAME_SERVER_MAX_SESSIONS = 1000 # New sessions are refused (503) beyond this
+GAME_SERVER_MAX_PENDING_TURNS = 256 # ...or while this many LLM turns are queued or on the wire
+GAME_SERVER_SESSION_IDLE_S = 600 # Sessions untouched this long are evicted
+GAME_SERVER_EVICT_INTERVAL_S = 30
+GAME_SERVER_KEEPALIVE_S = 30 # Idle HTTP connections are closed after this long
+GAME_SERVER_CSV_FILE_TEMPLATE = os.path.join(LOG_DIRECTORY, "game_server_{timestamp}.csv") # Every session's rounds, one file
+
 # --- (Optional) Pygame UI Settings (We'll use these later) ---
 # SCREEN_WIDTH = 800
 # SCREEN_HEIGHT = 600
@@ -72,4 +150,19 @@ STATUS_AREA_HEIGHT = 50
 #     "blue": (0, 0, 255),
 #     "red": (255, 0, 0),
 #     "gray": (200, 200, 200),
-# } 
\ No newline at end of file
+# }
+
+
+# --- Setup (called by entry points, never at import) ---
+
+def load_environment():
+    """Loads the .env file and re-reads the settings that come from the environment."""
+    from dotenv import load_dotenv
+    load_dotenv()
+    global LLM_API_KEY, LLM_BASE_URL, LLM_CACHE_MODE
+    LLM_API_KEY = os.getenv("LLM_API_KEY", LLM_API_KEY)
+    LLM_BASE_URL = os.getenv("LLM_BASE_URL", LLM_BASE_URL)
+    LLM_CACHE_MODE = os.getenv("LLM_CACHE_MODE", LLM_CACHE_MODE)
+
+def ensure_log_directory():
+    os.makedirs(LOG_DIRECTORY, exist_ok=True)
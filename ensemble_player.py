@@ -0,0 +1,211 @@
+import time
+import asyncio
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import config
+from llm_player import LLMPlayer
+
+# Get the root logger configured in llm_player
+logger = logging.getLogger()
+
+# How member answers become the ensemble's choice:
+# - majority: most common non-fallback choice (ties go to the primary, then to member order)
+# - first_valid: the first member to answer without a fallback
+# - primary: the primary member's choice; the others are only logged for comparison
+ENSEMBLE_POLICIES = ("majority", "first_valid", "primary")
+
+
+class EnsemblePlayer:
+    """Sends every round to several models concurrently and combines their answers.
+
+    Each member is a full LLMPlayer with its own conversation history. Members run
+    on their own single-thread executors, so a round takes about as long as the
+    slowest member needed by the policy, and a member that's still answering
+    finishes before its next round starts. Drop-in replacement for LLMPlayer.
+    """
+
+    def __init__(self, models=None, policy=None, primary=None, seed=None):
+        models = models or config.ENSEMBLE_MODELS
+        if not models:
+            raise ValueError("EnsemblePlayer needs at least one model (config.ENSEMBLE_MODELS).")
+        self.policy = policy or config.ENSEMBLE_POLICY
+        if self.policy not in ENSEMBLE_POLICIES:
+            raise ValueError(f"Unknown ensemble policy '{self.policy}'. Available: {', '.join(ENSEMBLE_POLICIES)}")
+
+        self.members = [LLMPlayer(seed=None if seed is None else seed + i, model=model)
+                        for i, model in enumerate(models)]
+        primary = primary or config.ENSEMBLE_PRIMARY or models[0]
+        if primary not in models:
+            raise ValueError(f"Primary model '{primary}' is not one of the ensemble models {models}")
+        self.primary_index = models.index(primary)
+        self.name = f"Ensemble ({', '.join(member.model.split('/')[-1] for member in self.members)})"
+
+        self._executors = [ThreadPoolExecutor(max_workers=1, thread_name_prefix="EnsembleMember") for _ in self.members]
+        self._in_flight = [] # Member futures of the latest round, incl. ones still running after we answered
+        self._member_locks = None # asyncio.Locks, one per member, created on first async call
+        self._stragglers = set() # Async member tasks still running after the ensemble answered
+        self.last_decision = None
+        self.member_log = [] # Per round: the ensemble's choice and every member's (choice, parse path, latency)
+        logger.info(f"EnsemblePlayer initialized: {self.name}, policy: {self.policy}, primary: {primary}")
+
+    @property
+    def primary(self):
+        return self.members[self.primary_index]
+
+    def turn_marker(self):
+        self._drain()
+        return [member.turn_marker() for member in self.members]
+
+    def rollback_to(self, marker):
+        self._drain() # Let stragglers finish before trimming their histories
+        for member, member_marker in zip(self.members, marker):
+            member.rollback_to(member_marker)
+
+    def snapshot(self):
+        """Every member's snapshot, for checkpoint.py. Waits for sync members still answering.
+
+        Async callers should await drain_async() first, or a straggler's turn may be half recorded.
+        """
+        self._drain()
+        return {
+            "models": [member.model for member in self.members],
+            "policy": self.policy,
+            "primary": self.primary.model,
+            "members": [member.snapshot() for member in self.members],
+            "member_log": self.member_log,
+        }
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """Builds an ensemble whose members continue their snapshotted conversations."""
+        ensemble = cls(models=snapshot["models"], policy=snapshot["policy"], primary=snapshot["primary"])
+        ensemble.members = [LLMPlayer.from_snapshot(member) for member in snapshot["members"]]
+        ensemble.member_log = list(snapshot["member_log"])
+        return ensemble
+
+    def _drain(self):
+        wait(self._in_flight)
+
+    async def drain_async(self):
+        """Waits for async members still answering, so their answers are logged before the loop closes."""
+        while self._stragglers:
+            await asyncio.wait(self._stragglers)
+            self._stragglers = {task for task in self._stragglers if not task.done()}
+
+    def _ask_member(self, member, game_state):
+        started_at = time.monotonic()
+        choice = member.get_llm_choice(game_state)
+        return choice, dict(member.last_decision), time.monotonic() - started_at
+
+    async def _ask_member_async(self, index, game_state):
+        async with self._member_locks[index]:
+            member = self.members[index]
+            started_at = time.monotonic()
+            choice = await member.get_llm_choice_async(game_state)
+            return choice, dict(member.last_decision), time.monotonic() - started_at
+
+    def get_llm_choice(self, game_state):
+        """Gets every member's choice concurrently and combines them according to the policy."""
+        futures = {executor.submit(self._ask_member, member, game_state): index
+                   for index, (executor, member) in enumerate(zip(self._executors, self.members))}
+        self._in_flight = list(futures)
+        results = {}
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[futures[future]] = future.result()
+            if self._decided(results):
+                break
+
+        round_entry = self._record_round(game_state['round'], results)
+        for future in pending:
+            # Members still answering are logged for comparison when they finish
+            future.add_done_callback(lambda f, index=futures[future]: self._log_straggler(round_entry, index, f))
+        return self.last_decision['choice']
+
+    async def get_llm_choice_async(self, game_state):
+        """Async get_llm_choice; stragglers keep running as tasks and are logged when they finish."""
+        if self._member_locks is None:
+            self._member_locks = [asyncio.Lock() for _ in self.members]
+        tasks = {asyncio.ensure_future(self._ask_member_async(index, game_state)): index
+                 for index in range(len(self.members))}
+        results = {}
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                results[tasks[task]] = task.result()
+            if self._decided(results):
+                break
+
+        round_entry = self._record_round(game_state['round'], results)
+        self._stragglers = {task for task in self._stragglers if not task.done()} | pending
+        for task in pending:
+            task.add_done_callback(lambda t, index=tasks[task]: self._log_straggler(round_entry, index, t))
+        return self.last_decision['choice']
+
+    def _decided(self, results):
+        """True once the policy can answer from the results so far."""
+        if self.policy == "primary":
+            return self.primary_index in results
+        if self.policy == "first_valid":
+            return any(not decision['fallback'] for _, decision, _ in results.values())
+        return len(results) == len(self.members)
+
+    def _combine(self, results):
+        """Returns (choice, index of the member whose decision is reported) for the policy."""
+        primary_result = results.get(self.primary_index)
+        valid = {index: result for index, result in results.items() if not result[1]['fallback']}
+        if self.policy == "primary" or not valid:
+            if primary_result is not None:
+                return primary_result[0], self.primary_index
+            index = min(results)
+            return results[index][0], index
+        if self.policy == "first_valid":
+            index = next(iter(valid)) # Results are inserted in completion order
+            return valid[index][0], index
+
+        counts = Counter(choice for choice, _, _ in valid.values())
+        best = max(counts.values())
+        tied = [index for index, (choice, _, _) in sorted(valid.items()) if counts[choice] == best]
+        index = self.primary_index if self.primary_index in tied else tied[0]
+        return valid[index][0], index
+
+    def _record_round(self, round_num, results):
+        choice, index = self._combine(results)
+        decision = results[index][1]
+        self.last_decision = {
+            "round": round_num,
+            "model": self.name, # Analytics group ensemble games under the ensemble, not the member
+            "choice": choice,
+            "parse_path": decision['parse_path'],
+            "fallback": decision['fallback'] if self.policy != "majority" else all(r[1]['fallback'] for r in results.values()),
+            "attempts": decision['attempts'],
+            "source": self.members[index].model,
+            "member_choices": {self.members[i].model: result[0] for i, result in results.items()},
+        }
+        round_entry = {"round": round_num, "choice": choice, "members": {}}
+        self.member_log.append(round_entry)
+        for member_index, result in results.items():
+            self._log_member(round_entry, member_index, result)
+        logger.info(f"Ensemble round {round_num} ({self.policy}): chose {choice} from "
+                    f"{self.members[index].model}; members so far {self.last_decision['member_choices']}")
+        return round_entry
+
+    def _log_straggler(self, round_entry, index, future):
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            logger.error(f"Ensemble round {round_entry['round']}: {self.members[index].model} failed: {future.exception()}")
+            return
+        self._log_member(round_entry, index, future.result())
+
+    def _log_member(self, round_entry, index, result):
+        choice, decision, latency = result
+        model = self.members[index].model
+        round_entry["members"][model] = (choice, decision['parse_path'], latency)
+        logger.info(f"Ensemble round {round_entry['round']}: {model} chose {choice} "
+                    f"({decision['parse_path']}, {latency:.2f}s)")
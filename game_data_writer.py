@@ -0,0 +1,238 @@
+import os
+import csv
+import json
+import atexit
+import logging
+import contextlib
+import config
+
+try:
+    import fcntl # POSIX only: lets writers of one columnar store lock each other out
+except ImportError:
+    fcntl = None
+
+# Get the root logger configured in llm_player
+logger = logging.getLogger()
+
+# Single definition of the per-round game data schema (CSV header and columnar store)
+GAME_DATA_FIELDNAMES = ['Round', 'Human_Choice', 'LLM_Choice',
+                        'Human_Base_Score', 'LLM_Base_Score',
+                        'Human_Bonus', 'LLM_Bonus',
+                        'Human_Round_Score', 'LLM_Round_Score',
+                        'Human_Total_Score', 'LLM_Total_Score',
+                        'LLM_Parse_Path', 'LLM_Fallback', 'LLM_Model']
+# Text columns can't go in the int32 columnar store
+TEXT_FIELDNAMES = ('LLM_Parse_Path', 'LLM_Model')
+COLUMNAR_FIELDNAMES = [name for name in GAME_DATA_FIELDNAMES if name not in TEXT_FIELDNAMES]
+
+
+class GameDataWriter:
+    """Keeps one game's CSV open for the whole game and writes rows in batches.
+
+    Rows are buffered and flushed every `flush_every` rounds, on close() (game end),
+    and at interpreter exit, so a crash loses at most what the process couldn't
+    flush. With a ColumnarGameStore the whole game is appended to it on close().
+    """
+
+    def __init__(self, filename, flush_every=None, columnar_store=None, keep_rows=False, append=False):
+        self.filename = filename
+        self.flush_every = flush_every or config.CSV_FLUSH_EVERY_ROUNDS
+        self.columnar_store = columnar_store
+        self.keep_rows = keep_rows or columnar_store is not None
+        self.game_rows = [] # Whole-game copy, kept for columnar output / callers that asked for it
+        self._buffer = []
+        self.rows_written = 0 # Rows that have reached the file (header excluded)
+        self._file = None
+        self._writer = None
+
+        if filename:
+            try:
+                os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+                # append=True continues an existing file (see from_snapshot)
+                self._file = open(filename, 'a' if append else 'w', newline='')
+                self._writer = csv.DictWriter(self._file, fieldnames=GAME_DATA_FIELDNAMES)
+                if self._file.tell() == 0:
+                    self._writer.writeheader()
+                logger.info(f"CSV game data log initialized: {filename}")
+            except IOError as e:
+                logger.error(f"Failed to create CSV log file {filename}: {e}")
+                self.filename = None # Disable CSV logging if creation failed
+                self._file = None
+        atexit.register(self.close)
+
+    def write_row(self, row):
+        """Queues one round's row; the file is written every `flush_every` rows."""
+        if self.keep_rows:
+            self.game_rows.append(row)
+        if self._writer is None:
+            return
+        self._buffer.append(row)
+        if len(self._buffer) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        """Writes buffered rows to the CSV and flushes the OS-level file buffer."""
+        if self._writer is None or not self._buffer:
+            return
+        try:
+            self._writer.writerows(self._buffer)
+            self._file.flush()
+            self.rows_written += len(self._buffer)
+        except IOError as e:
+            logger.error(f"Failed to write to CSV log file {self.filename}: {e}")
+        self._buffer.clear()
+
+    def close(self):
+        """Flushes and closes the CSV, then appends the game to the columnar store if configured."""
+        atexit.unregister(self.close)
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._writer = None
+        if self.columnar_store is not None and self.game_rows:
+            self.columnar_store.append_game(self.game_rows)
+            self.columnar_store = None # Append once, even if close() is called again
+
+    def snapshot(self):
+        """Where this writer stands, for checkpoint.py: rows already in the file and rows still buffered."""
+        return {
+            "filename": self.filename,
+            "flush_every": self.flush_every,
+            "keep_rows": self.keep_rows,
+            "columnar_directory": self.columnar_store.directory if self.columnar_store is not None else None,
+            "rows_written": self.rows_written,
+            "buffer": list(self._buffer),
+            "game_rows": list(self.game_rows),
+        }
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """Reopens a checkpointed game's CSV where the snapshot left it.
+
+        Rows flushed after the snapshot was taken are cut off, since the resumed
+        game plays those rounds again; rows that were still buffered are queued again.
+        """
+        filename = snapshot["filename"]
+        if filename:
+            _truncate_csv(filename, snapshot["rows_written"])
+        columnar_store = ColumnarGameStore(snapshot["columnar_directory"]) if snapshot["columnar_directory"] else None
+        writer = cls(filename, flush_every=snapshot["flush_every"], columnar_store=columnar_store,
+                     keep_rows=snapshot["keep_rows"], append=True)
+        writer.rows_written = snapshot["rows_written"]
+        writer.game_rows = list(snapshot["game_rows"])
+        if writer._writer is not None:
+            writer._buffer = list(snapshot["buffer"])
+        return writer
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ColumnarGameStore:
+    """Append-only binary store with one raw int32 file per column, readable as NumPy memmaps.
+
+    Whole games are appended at once. `_schema.json` is rewritten atomically after the
+    column data, so readers only ever see complete games. Appends hold an exclusive
+    lock on `_append.lock` and start from the schema on disk, so several games or
+    processes can share one directory.
+    """
+    SCHEMA_FILE = "_schema.json"
+    LOCK_FILE = "_append.lock"
+    DTYPE = "<i4"
+
+    def __init__(self, directory, columns=None):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.schema_path = os.path.join(directory, self.SCHEMA_FILE)
+        self.lock_path = os.path.join(directory, self.LOCK_FILE)
+        # Game_Index ties rows back to the game they came from
+        self.schema = {"dtype": self.DTYPE, "columns": ['Game_Index'] + list(columns or COLUMNAR_FIELDNAMES),
+                       "rows": 0, "games": 0}
+        self._read_schema()
+
+    def _read_schema(self):
+        if os.path.exists(self.schema_path):
+            with open(self.schema_path) as f:
+                self.schema = json.load(f)
+
+    @contextlib.contextmanager
+    def _append_lock(self):
+        with open(self.lock_path, 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX) # Released when the file is closed
+            yield
+
+    def _column_path(self, column):
+        return os.path.join(self.directory, f"{column}.bin")
+
+    def append_game(self, rows):
+        """Appends all rows of one game as a single write per column."""
+        return self.append_games([rows])[0]
+
+    def append_games(self, games, meta=None):
+        """Appends several games (lists of rows) with one write per column; returns their game indices.
+
+        `meta`, when given, replaces schema["meta"] in the same atomic schema update,
+        so bookkeeping about what was appended can never disagree with the data.
+        """
+        with self._append_lock():
+            self._read_schema() # Other stores on this directory may have appended since
+            return self._append_games(games, meta)
+
+    def _append_games(self, games, meta):
+        import numpy as np # Optional dependency, only needed for columnar output
+        first_game = self.schema["games"]
+        lengths = [len(rows) for rows in games]
+        all_rows = [row for rows in games for row in rows]
+        committed_bytes = self.schema["rows"] * np.dtype(self.DTYPE).itemsize
+        for column in self.schema["columns"]:
+            if column == 'Game_Index':
+                values = np.repeat(np.arange(first_game, first_game + len(games), dtype=self.DTYPE), lengths)
+            else:
+                values = np.fromiter((row[column] for row in all_rows), dtype=self.DTYPE, count=len(all_rows))
+            with open(self._column_path(column), 'ab') as f:
+                f.truncate(committed_bytes) # Drop any half-written game left by a crash
+                f.write(values.tobytes())
+
+        self.schema["rows"] += len(all_rows)
+        self.schema["games"] += len(games)
+        if meta is not None:
+            self.schema["meta"] = meta
+        tmp_path = self.schema_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.schema, f)
+        os.replace(tmp_path, self.schema_path)
+        return list(range(first_game, first_game + len(games)))
+
+    def load(self, mmap=True):
+        """Returns {column: array} for all complete games, memory-mapped by default."""
+        import numpy as np
+        rows = self.schema["rows"]
+        columns = {}
+        for column in self.schema["columns"]:
+            path = self._column_path(column)
+            if rows == 0:
+                columns[column] = np.empty(0, dtype=self.DTYPE)
+            elif mmap:
+                columns[column] = np.memmap(path, dtype=self.DTYPE, mode='r', shape=(rows,))
+            else:
+                columns[column] = np.fromfile(path, dtype=self.DTYPE, count=rows)
+        return columns
+
+
+def _truncate_csv(filename, rows):
+    """Cuts a CSV back to its header and first `rows` rows; no-op if it has no more than that."""
+    if not os.path.exists(filename):
+        return
+    with open(filename, newline='') as f:
+        lines = list(csv.reader(f))
+    if len(lines) <= rows + 1:
+        return
+    tmp_filename = f"{filename}.tmp"
+    with open(tmp_filename, 'w', newline='') as f:
+        csv.writer(f).writerows(lines[:rows + 1])
+    os.replace(tmp_filename, filename)
@@ -1,52 +1,66 @@
+import time
 import logging
-import csv
 import datetime
 import config
+import metrics
+from game_data_writer import GameDataWriter, ColumnarGameStore
+from round_history import RoundHistory
 
 # Get the root logger configured in llm_player
 logger = logging.getLogger()
 
+def game_data_csv_filename(game_id=None):
+    """Returns a fresh timestamped game data CSV path, tagged with game_id when given."""
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    if game_id is not None:
+        timestamp = f"{timestamp}_{game_id}"
+    return config.GAME_DATA_CSV_FILE_TEMPLATE.format(timestamp=timestamp)
+
 class GameManager:
     """Manages the game state, rules, scoring, and history."""
-    def __init__(self):
+    def __init__(self, game_id=None, data_writer=None):
+        self.game_id = game_id # Optional tag to keep concurrent games' files apart
         self.human_score = 0
         self.llm_score = 0
         self.round = 1
-        # History stores tuples: (round, human_choice, llm_choice, human_score_change, llm_score_change)
-        self.history = []
+        # Indexes like a list of (round, human_choice, llm_choice, human_score_change, llm_score_change)
+        self.history = RoundHistory()
         self.csv_filename = None # Initialize
-        self._setup_csv_logger()
+        self.round_listeners = [] # Callables run with this manager after each play_round
+        self._round_started_at = time.monotonic() # For metrics.ROUND_DURATION
+        self.data_writer = data_writer # Callers may supply their own (e.g. tournament workers)
+        if self.data_writer is None:
+            self._setup_csv_logger()
+        self.csv_filename = self.data_writer.filename
         logger.info("GameManager initialized.") # Use root logger for general info
 
     def _setup_csv_logger(self):
-        """Sets up the CSV file for logging game data."""
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        self.csv_filename = config.GAME_DATA_CSV_FILE_TEMPLATE.format(timestamp=timestamp)
-        try:
-            with open(self.csv_filename, 'w', newline='') as csvfile:
-                fieldnames = ['Round', 'Human_Choice', 'LLM_Choice', 
-                              'Human_Base_Score', 'LLM_Base_Score',
-                              'Human_Bonus', 'LLM_Bonus',
-                              'Human_Round_Score', 'LLM_Round_Score',
-                              'Human_Total_Score', 'LLM_Total_Score']
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                writer.writeheader()
-            logger.info(f"CSV game data log initialized: {self.csv_filename}")
-        except IOError as e:
-            logger.error(f"Failed to create CSV log file {self.csv_filename}: {e}")
-            self.csv_filename = None # Disable CSV logging if creation failed
+        """Opens the long-lived writer for this game's CSV (and columnar store, if configured)."""
+        columnar_store = None
+        if config.GAME_DATA_COLUMNAR_DIRECTORY:
+            columnar_store = ColumnarGameStore(config.GAME_DATA_COLUMNAR_DIRECTORY)
+        self.data_writer = GameDataWriter(game_data_csv_filename(self.game_id), columnar_store=columnar_store)
+
+    def add_round_listener(self, listener):
+        """Registers listener(game_manager), called as soon as each round has been scored."""
+        self.round_listeners.append(listener)
 
     def get_game_state(self):
         """Returns the current state needed by the LLM player."""
         return {
+            "game_id": self.game_id,
             "round": self.round,
             "human_score": self.human_score,
             "llm_score": self.llm_score,
-            "history": self.history # Send full history for now, LLM prompt trims it
+            "history": self.history.view() # Read-only snapshot of the full history, LLM prompt trims it
         }
 
-    def play_round(self, human_choice, llm_choice):
-        """Calculates scores for the round, updates totals, and records history."""
+    def play_round(self, human_choice, llm_choice, llm_decision=None):
+        """Calculates scores for the round, updates totals, and records history.
+
+        `llm_decision` is the LLM player's last_decision; its parse path and fallback
+        flag are written to the CSV so degraded rounds can be filtered out.
+        """
         if self.is_game_over():
             logger.warning("Attempted to play round after game over.")
             return None
@@ -86,31 +100,30 @@ class GameManager:
         )
         self.history.append(round_data)
 
-        # Log to CSV
-        if self.csv_filename:
-            try:
-                with open(self.csv_filename, 'a', newline='') as csvfile:
-                    fieldnames = ['Round', 'Human_Choice', 'LLM_Choice', 
-                                  'Human_Base_Score', 'LLM_Base_Score',
-                                  'Human_Bonus', 'LLM_Bonus',
-                                  'Human_Round_Score', 'LLM_Round_Score',
-                                  'Human_Total_Score', 'LLM_Total_Score']
-                    writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                    writer.writerow({
-                        'Round': self.round,
-                        'Human_Choice': human_choice,
-                        'LLM_Choice': llm_choice,
-                        'Human_Base_Score': human_base,
-                        'LLM_Base_Score': llm_base,
-                        'Human_Bonus': human_bonus,
-                        'LLM_Bonus': llm_bonus,
-                        'Human_Round_Score': human_score_change,
-                        'LLM_Round_Score': llm_score_change,
-                        'Human_Total_Score': self.human_score,
-                        'LLM_Total_Score': self.llm_score
-                    })
-            except IOError as e:
-                logger.error(f"Failed to write to CSV log file {self.csv_filename}: {e}")
+        # Metrics: how long the round took, human and LLM together
+        model = llm_decision.get('model', '') if llm_decision else ''
+        now = time.monotonic()
+        metrics.ROUND_DURATION.observe(now - self._round_started_at, model=model, round=self.round)
+        metrics.ROUNDS.inc(model=model)
+        self._round_started_at = now
+
+        # Log to CSV (buffered; the writer flushes in batches and at game end)
+        self.data_writer.write_row({
+            'Round': self.round,
+            'Human_Choice': human_choice,
+            'LLM_Choice': llm_choice,
+            'Human_Base_Score': human_base,
+            'LLM_Base_Score': llm_base,
+            'Human_Bonus': human_bonus,
+            'LLM_Bonus': llm_bonus,
+            'Human_Round_Score': human_score_change,
+            'LLM_Round_Score': llm_score_change,
+            'Human_Total_Score': self.human_score,
+            'LLM_Total_Score': self.llm_score,
+            'LLM_Parse_Path': llm_decision['parse_path'] if llm_decision else '',
+            'LLM_Fallback': int(bool(llm_decision and llm_decision['fallback'])),
+            'LLM_Model': model
+        })
 
         # Log details
         logger.info(f"Round {self.round} completed: Human chose {human_choice}, LLM chose {llm_choice}. Score Change: Human +{human_score_change}, LLM +{llm_score_change}")
@@ -118,6 +131,12 @@ class GameManager:
 
         # Prepare for next round
         self.round += 1
+        if self.is_game_over():
+            self.close() # Flush the game's data as soon as it ends
+
+        # Notify listeners (e.g. LLM prefetch) now that the next round's state is known
+        for listener in self.round_listeners:
+            listener(self)
 
         return round_data # Return the results of this round
 
@@ -125,6 +144,31 @@ class GameManager:
         """Checks if the game has reached the maximum number of rounds."""
         return self.round > config.NUM_ROUNDS
 
+    def close(self):
+        """Flushes and closes the game data writer. Safe to call more than once."""
+        self.data_writer.close()
+
+    def snapshot(self):
+        """Scores, history and CSV position, for checkpoint.py. Round listeners aren't included."""
+        return {
+            "game_id": self.game_id,
+            "round": self.round,
+            "human_score": self.human_score,
+            "llm_score": self.llm_score,
+            "history": self.history.view(), # Frozen at this round even if the game goes on
+            "data_writer": self.data_writer.snapshot(),
+        }
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """Rebuilds a game from snapshot(), reopening its CSV where the snapshot left it."""
+        game_manager = cls(game_id=snapshot["game_id"], data_writer=GameDataWriter.from_snapshot(snapshot["data_writer"]))
+        game_manager.round = snapshot["round"]
+        game_manager.human_score = snapshot["human_score"]
+        game_manager.llm_score = snapshot["llm_score"]
+        game_manager.history = RoundHistory(snapshot["history"])
+        return game_manager
+
     def get_final_scores(self):
         """Returns the final scores."""
         return {"human": self.human_score, "llm": self.llm_score} 
\ No newline at end of file
@@ -0,0 +1,403 @@
+import os
+import csv
+import json
+import time
+import asyncio
+import logging
+import argparse
+import datetime
+from collections import deque
+from urllib.parse import urlsplit
+
+import config
+import metrics
+from game_manager import GameManager
+from game_data_writer import GAME_DATA_FIELDNAMES
+from llm_player import LLMPlayer, setup_logging
+
+# Get the root logger configured in llm_player
+logger = logging.getLogger()
+
+# One asyncio process hosting many human-vs-LLM games over plain HTTP/1.1 + JSON:
+#   POST   /sessions               -> new game
+#   GET    /sessions/<id>          -> its state
+#   POST   /sessions/<id>/choice   -> {"choice": N}; plays the round, returns the result
+#   DELETE /sessions/<id>          -> ends it
+#   GET    /stats                  -> sessions, queued LLM turns, round latency percentiles
+#   GET    /metrics                -> metrics.REGISTRY as Prometheus text
+#   GET    /                       -> game_client.html, a minimal browser client
+# Every player shares llm_concurrency's AsyncOpenAI client, in-flight cap and rate limits.
+
+SERVER_FIELDNAMES = ['Session_ID'] + GAME_DATA_FIELDNAMES
+CLIENT_HTML_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "game_client.html")
+MAX_BODY_BYTES = 4096
+LATENCY_SAMPLES = 4096 # Recent rounds kept for the latency percentiles
+HTTP_REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                409: "Conflict", 413: "Payload Too Large", 502: "Bad Gateway", 503: "Service Unavailable"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class SessionDataWriter:
+    """GameManager data writer that appends a session's rows to the server's shared CSV.
+
+    Sessions hold no rows and no file handle of their own.
+    """
+    __slots__ = ("session_id", "shared")
+
+    def __init__(self, session_id, shared):
+        self.session_id = session_id
+        self.shared = shared
+
+    @property
+    def filename(self):
+        return self.shared.filename
+
+    def write_row(self, row):
+        self.shared.write_row(self.session_id, row)
+
+    def close(self):
+        pass # The shared file is closed with the server
+
+
+class SharedGameCSV:
+    """The server's one CSV of every session's rounds, tagged with Session_ID."""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._file = None
+        self._writer = None
+        if filename:
+            os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+            self._file = open(filename, 'w', newline='')
+            self._writer = csv.DictWriter(self._file, fieldnames=SERVER_FIELDNAMES)
+            self._writer.writeheader()
+            logger.info(f"Game server CSV initialized: {filename}")
+
+    def write_row(self, session_id, row):
+        if self._writer is not None:
+            self._writer.writerow(dict(row, Session_ID=session_id)) # Buffered by the file object
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._writer = None
+
+
+class GameSession:
+    """One game: its GameManager, its LLMPlayer and the task computing the LLM's choice for the current round."""
+    __slots__ = ("session_id", "game_manager", "player", "llm_turn", "last_active", "busy")
+
+    def __init__(self, session_id, game_manager, player):
+        self.session_id = session_id
+        self.game_manager = game_manager
+        self.player = player
+        self.llm_turn = None
+        self.last_active = time.monotonic()
+        self.busy = False # A choice is being played; a second one is refused until it finishes
+
+    def state(self):
+        manager = self.game_manager
+        return {
+            "session_id": self.session_id,
+            "round": manager.round,
+            "num_rounds": config.NUM_ROUNDS,
+            "choices": list(config.CHOICES),
+            "human_score": manager.human_score,
+            "llm_score": manager.llm_score,
+            "llm_name": self.player.name,
+            "game_over": manager.is_game_over(),
+        }
+
+
+class GameServer:
+    """Hosts many concurrent sessions on one event loop.
+
+    The LLM's choice for a round is requested as soon as the previous round is
+    scored (moves are simultaneous, like LLMWorker.prefetch), so a choice usually
+    finds the answer ready and round latency is bounded by the model call.
+    New sessions are refused while too many sessions exist or too many LLM turns
+    are queued; idle sessions are evicted.
+    """
+
+    def __init__(self, host=None, port=None, model=None, memory_strategy=None, csv_filename=None,
+                 max_sessions=None, max_pending_turns=None, idle_timeout=None):
+        self.host = host or config.GAME_SERVER_HOST
+        self.port = config.GAME_SERVER_PORT if port is None else port
+        self.model = model
+        self.memory_strategy = memory_strategy
+        self.max_sessions = max_sessions or config.GAME_SERVER_MAX_SESSIONS
+        self.max_pending_turns = max_pending_turns or config.GAME_SERVER_MAX_PENDING_TURNS
+        self.idle_timeout = idle_timeout or config.GAME_SERVER_SESSION_IDLE_S
+        self.csv = SharedGameCSV(csv_filename)
+        self.sessions = {}
+        self.pending_turns = 0 # LLM turns started and not finished (queued for a slot or on the wire)
+        self.stats = {"created": 0, "finished": 0, "evicted": 0, "closed": 0, "refused": 0, "rounds": 0}
+        self.round_latency = deque(maxlen=LATENCY_SAMPLES) # Seconds from choice received to result sent
+        self.llm_wait = deque(maxlen=LATENCY_SAMPLES) # Part of it spent waiting for the LLM's choice
+        self._next_id = 0
+        self._connections = {} # Open client writer -> its handler task, so shutdown can close and await them
+        self._server = None
+        self._evictor = None
+        self._client_html = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1] # Resolves port 0
+        self._evictor = asyncio.create_task(self._evict_idle_sessions())
+        logger.info(f"Game server listening on http://{self.host}:{self.port}/")
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self):
+        if self._evictor is not None:
+            self._evictor.cancel()
+        if self._server is not None:
+            self._server.close()
+            handlers = list(self._connections.values())
+            for writer in list(self._connections):
+                writer.close() # Idle keep-alive handlers see EOF and finish
+            await asyncio.gather(*handlers, return_exceptions=True)
+            await self._server.wait_closed()
+        for session in list(self.sessions.values()):
+            self._end_session(session, "closed")
+        self.csv.close()
+        metrics.export()
+
+    # --- Sessions ---
+
+    def create_session(self):
+        if len(self.sessions) >= self.max_sessions or self.pending_turns >= self.max_pending_turns:
+            self.stats["refused"] += 1
+            raise HTTPError(503, "Server is at capacity, try again shortly", {"Retry-After": "5"})
+        self._next_id += 1
+        session_id = f"s{self._next_id:06d}"
+        game_manager = GameManager(game_id=session_id, data_writer=SessionDataWriter(session_id, self.csv))
+        player = LLMPlayer(seed=self._next_id, memory_strategy=self.memory_strategy, model=self.model)
+        session = self.sessions[session_id] = GameSession(session_id, game_manager, player)
+        self._start_llm_turn(session)
+        self.stats["created"] += 1
+        return session
+
+    def _start_llm_turn(self, session):
+        session.llm_turn = asyncio.create_task(self._llm_choice(session.player, session.game_manager.get_game_state()))
+
+    async def _llm_choice(self, player, game_state):
+        self.pending_turns += 1
+        try:
+            choice = await player.get_llm_choice_async(game_state) # Waits for an llm_concurrency slot
+            return choice, player.last_decision
+        finally:
+            self.pending_turns -= 1
+
+    def _get_session(self, session_id):
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise HTTPError(404, f"No session '{session_id}' (finished sessions expire after {self.idle_timeout}s idle)")
+        session.last_active = time.monotonic()
+        return session
+
+    async def play_choice(self, session, human_choice):
+        if session.busy:
+            raise HTTPError(409, "A choice for this session is already being played")
+        if session.game_manager.is_game_over():
+            raise HTTPError(409, "The game is over")
+        if human_choice not in config.CHOICES:
+            raise HTTPError(400, f"Choice must be one of {list(config.CHOICES)}")
+        received_at = time.monotonic()
+        session.busy = True
+        try:
+            try:
+                llm_choice, decision = await session.llm_turn
+            except Exception as e:
+                logger.error(f"Session {session.session_id}: LLM turn failed: {e}")
+                self._start_llm_turn(session) # Let the human retry the round
+                raise HTTPError(502, "The LLM opponent failed to answer, try again")
+            answered_at = time.monotonic()
+            round_num, human_choice, llm_choice, human_change, llm_change = session.game_manager.play_round(
+                human_choice, llm_choice, llm_decision=decision)
+            self.stats["rounds"] += 1
+            if session.game_manager.is_game_over():
+                session.llm_turn = None
+                self.stats["finished"] += 1
+                self.csv.flush()
+            else:
+                self._start_llm_turn(session)
+            self.llm_wait.append(answered_at - received_at)
+            self.round_latency.append(time.monotonic() - received_at)
+        finally:
+            session.busy = False
+            session.last_active = time.monotonic()
+        return {
+            "result": {"round": round_num, "human_choice": human_choice, "llm_choice": llm_choice,
+                       "human_score_change": human_change, "llm_score_change": llm_change,
+                       "llm_fallback": bool(decision and decision.get("fallback"))},
+            "state": session.state(),
+        }
+
+    def _end_session(self, session, reason):
+        """Drops a session; an LLM turn still in flight is cancelled."""
+        self.sessions.pop(session.session_id, None)
+        if session.llm_turn is not None and not session.llm_turn.done():
+            session.llm_turn.cancel()
+        session.llm_turn = None
+        session.game_manager.close()
+        if reason in self.stats:
+            self.stats[reason] += 1
+        logger.info(f"Session {session.session_id} ended ({reason}) after {session.game_manager.round - 1} rounds")
+
+    async def _evict_idle_sessions(self):
+        while True:
+            await asyncio.sleep(config.GAME_SERVER_EVICT_INTERVAL_S)
+            self.evict_idle_sessions()
+
+    def evict_idle_sessions(self):
+        cutoff = time.monotonic() - self.idle_timeout
+        idle = [session for session in self.sessions.values() if session.last_active < cutoff and not session.busy]
+        for session in idle:
+            self._end_session(session, "evicted")
+        if idle:
+            self.csv.flush()
+        return len(idle)
+
+    def get_stats(self):
+        def percentiles(samples):
+            ordered = sorted(samples)
+            if not ordered:
+                return {"samples": 0}
+            pick = lambda q: ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+            return {"samples": len(ordered), "p50_ms": pick(0.50) * 1000, "p99_ms": pick(0.99) * 1000,
+                    "max_ms": ordered[-1] * 1000}
+        return dict(self.stats, sessions=len(self.sessions), pending_turns=self.pending_turns,
+                    round_latency=percentiles(self.round_latency), llm_wait=percentiles(self.llm_wait))
+
+    # --- HTTP ---
+
+    async def _handle_connection(self, reader, writer):
+        self._connections[writer] = asyncio.current_task()
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), config.GAME_SERVER_KEEPALIVE_S)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line:
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                length = int(headers.get("content-length") or 0)
+                if length > MAX_BODY_BYTES:
+                    self._write_response(writer, 413, {"error": {"message": "Request body too large"}}, False)
+                    await writer.drain()
+                    break
+                body = await reader.readexactly(length) if length else b""
+                try:
+                    status, payload, extra_headers = await self._route(method, urlsplit(target).path, body)
+                except HTTPError as e:
+                    status, payload, extra_headers = e.status, {"error": {"message": str(e)}}, e.headers
+                self._write_response(writer, status, payload, keep_alive, extra_headers)
+                await writer.drain() # Backpressure from slow clients
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError) as e:
+            logger.debug(f"Connection dropped: {e}")
+        finally:
+            self._connections.pop(writer, None)
+            writer.close()
+
+    async def _route(self, method, path, body):
+        parts = [part for part in path.split("/") if part]
+        if not parts and method == "GET":
+            return 200, self._client_page(), {"Content-Type": "text/html; charset=utf-8"}
+        if parts == ["stats"] and method == "GET":
+            return 200, self.get_stats(), None
+        if parts == ["metrics"] and method == "GET":
+            return 200, metrics.REGISTRY.to_prometheus().encode(), {"Content-Type": "text/plain; version=0.0.4"}
+        if parts == ["sessions"] and method == "POST":
+            return 201, self.create_session().state(), None
+        if len(parts) == 2 and parts[0] == "sessions":
+            session = self._get_session(parts[1])
+            if method == "GET":
+                return 200, session.state(), None
+            if method == "DELETE":
+                self._end_session(session, "closed")
+                return 200, session.state(), None
+        if len(parts) == 3 and parts[0] == "sessions" and parts[2] == "choice" and method == "POST":
+            session = self._get_session(parts[1])
+            try:
+                human_choice = int(json.loads(body or b"{}")["choice"])
+            except (ValueError, KeyError, TypeError):
+                raise HTTPError(400, 'Body must be JSON like {"choice": 3}')
+            return 200, await self.play_choice(session, human_choice), None
+        raise HTTPError(404 if method in ("GET", "POST", "DELETE") else 405, f"No route for {method} {path}")
+
+    def _client_page(self):
+        if self._client_html is None:
+            with open(CLIENT_HTML_FILE, "rb") as f:
+                self._client_html = f.read()
+        return self._client_html
+
+    @staticmethod
+    def _write_response(writer, status, payload, keep_alive, extra_headers=None):
+        headers = {"Content-Type": "application/json"}
+        headers.update(extra_headers or {})
+        data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        head = [f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}",
+                f"Content-Length: {len(data)}",
+                f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        head += [f"{name}: {value}" for name, value in headers.items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + data) # One write: no Nagle stall
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve many concurrent human-vs-LLM games over HTTP.")
+    parser.add_argument("--host", default=None, help=f"Default: {config.GAME_SERVER_HOST}")
+    parser.add_argument("--port", type=int, default=None, help=f"Default: {config.GAME_SERVER_PORT}")
+    parser.add_argument("--model", default=None, help=f"Default: {config.LLM_MODEL}")
+    parser.add_argument("--memory-strategy", default=None, help=f"Default: {config.LLM_MEMORY_STRATEGY}")
+    parser.add_argument("--output", default=None, help="CSV of every session's rounds (default: logs/game_server_<timestamp>.csv)")
+    parser.add_argument("--no-csv", action="store_true", help="Don't write round data")
+    parser.add_argument("--log-level", default="WARNING", help="Console/interaction log level (per-round INFO logs slow the loop)")
+    args = parser.parse_args()
+
+    config.load_environment()
+    setup_logging()
+    logging.getLogger().setLevel(args.log_level)
+    logging.getLogger("InteractionLogger").setLevel(args.log_level)
+    csv_filename = None
+    if not args.no_csv:
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        csv_filename = args.output or config.GAME_SERVER_CSV_FILE_TEMPLATE.format(timestamp=timestamp)
+    server = GameServer(args.host, args.port, model=args.model, memory_strategy=args.memory_strategy,
+                        csv_filename=csv_filename)
+    print(f"Serving on http://{server.host}:{server.port}/ (Ctrl+C to stop)")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import csv
+import random
+import config
+
+# Scripted stand-ins for the human player, used by the headless tournament runner.
+# Each policy sees the same game state GameManager hands the LLM; history entries are
+# (round, human_choice, llm_choice, human_score_change, llm_score_change) RoundRecords.
+
+
+class HumanPolicy:
+    """Base class for scripted human policies."""
+    name = "policy"
+
+    def choose(self, game_state) -> int:
+        raise NotImplementedError
+
+    def snapshot(self):
+        """Internal state a resumed game needs (see checkpoint.py); most policies are stateless."""
+        return {}
+
+    def restore_snapshot(self, snapshot):
+        pass
+
+
+class FixedPolicy(HumanPolicy):
+    """Always plays the same number."""
+    name = "fixed"
+
+    def __init__(self, choice=config.MAX_CHOICE):
+        choice = int(choice)
+        if choice not in config.CHOICES:
+            raise ValueError(f"Fixed choice {choice} is not one of {config.CHOICES}")
+        self.choice = choice
+        self.name = f"fixed:{choice}"
+
+    def choose(self, game_state):
+        return self.choice
+
+
+class RandomPolicy(HumanPolicy):
+    """Picks uniformly from config.CHOICES."""
+    name = "random"
+
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+
+    def choose(self, game_state):
+        return self.rng.choice(config.CHOICES)
+
+    def snapshot(self):
+        return {"rng_state": self.rng.getstate()}
+
+    def restore_snapshot(self, snapshot):
+        self.rng.setstate(snapshot["rng_state"])
+
+
+class TitForTatPolicy(HumanPolicy):
+    """Repeats the LLM's previous choice; opens with the highest number."""
+    name = "tit_for_tat"
+
+    def __init__(self, opening=config.MAX_CHOICE):
+        self.opening = int(opening)
+
+    def choose(self, game_state):
+        history = game_state['history']
+        if not history:
+            return self.opening
+        return history[-1][2]
+
+
+class UndercutPolicy(HumanPolicy):
+    """Plays one below the LLM's previous choice to chase the bonus; wraps to the highest number."""
+    name = "undercut"
+
+    def choose(self, game_state):
+        history = game_state['history']
+        if not history:
+            return config.MAX_CHOICE
+        target = history[-1][2] - 1
+        return target if target in config.CHOICES else config.MAX_CHOICE
+
+
+class ReplayPolicy(HumanPolicy):
+    """Replays the Human_Choice column of a recorded game_data CSV, cycling if the game runs longer."""
+    name = "replay"
+
+    def __init__(self, csv_path):
+        with open(csv_path, newline='') as csvfile:
+            self.choices = [int(row['Human_Choice']) for row in csv.DictReader(csvfile)]
+        if not self.choices:
+            raise ValueError(f"No recorded human choices in {csv_path}")
+        self.name = f"replay:{csv_path}"
+
+    def choose(self, game_state):
+        return self.choices[(game_state['round'] - 1) % len(self.choices)]
+
+
+POLICIES = {
+    "fixed": FixedPolicy,
+    "random": RandomPolicy,
+    "tit_for_tat": TitForTatPolicy,
+    "undercut": UndercutPolicy,
+    "replay": ReplayPolicy,
+}
+
+
+def make_policy(spec, seed=None):
+    """Builds a policy from a spec like "fixed:3", "random", "tit_for_tat" or "replay:logs/game_data_x.csv"."""
+    name, _, arg = spec.partition(":")
+    if name not in POLICIES:
+        raise ValueError(f"Unknown human policy '{name}'. Available: {', '.join(POLICIES)}")
+    if name == "random":
+        return RandomPolicy(seed)
+    if arg:
+        return POLICIES[name](arg)
+    return POLICIES[name]()
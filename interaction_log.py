@@ -0,0 +1,132 @@
+import os
+import json
+import time
+import queue
+import atexit
+import logging
+import logging.handlers
+from collections import OrderedDict
+
+import config
+from completion_cache import CompletionCache
+
+# One JSON object per LLM API call (see LLMPlayer._log_call). Records are handed to
+# a QueueHandler on the calling thread and written by a QueueListener thread, so
+# no log I/O (or JSON encoding, or prompt hashing) happens on the request path.
+records_logger = logging.getLogger("InteractionRecords")
+records_logger.setLevel(logging.INFO)
+records_logger.propagate = False # Machine-readable records stay out of the console
+
+_listener = None
+_listener_pid = None
+
+
+def _content_chars(content):
+    """Characters of a message's content: a string, or a list of parts (e.g. with cache_control markers)."""
+    if isinstance(content, list):
+        return sum(len(part.get("text") or "") for part in content if isinstance(part, dict))
+    return len(content or "")
+
+
+class JsonlFormatter(logging.Formatter):
+    """Formats a record's `interaction` dict as one JSON line, hashing the request off the hot path."""
+
+    def format(self, record):
+        fields = dict(record.interaction)
+        request_kwargs = fields.pop("request", None)
+        if request_kwargs is not None:
+            messages = request_kwargs.get("messages", [])
+            fields["prompt_hash"] = CompletionCache.make_key(request_kwargs) # Same key as the completion cache
+            fields["prompt_messages"] = len(messages)
+            fields["prompt_chars"] = sum(_content_chars(message.get("content")) for message in messages)
+        return json.dumps(fields, ensure_ascii=False, default=str)
+
+
+def _only(logger_name):
+    return lambda record: record.name == logger_name
+
+
+def _rotating_handler(path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    handler = logging.handlers.RotatingFileHandler(path, maxBytes=config.INTERACTION_JSONL_MAX_BYTES,
+                                                   backupCount=config.INTERACTION_JSONL_BACKUPS, encoding="utf-8")
+    handler.setFormatter(JsonlFormatter())
+    return handler
+
+
+class PerGameJsonlHandler(logging.Handler):
+    """Routes each record to its game's file (INTERACTION_JSONL_PER_GAME_TEMPLATE), keeping a few files open."""
+
+    def __init__(self, template=None, max_open=32):
+        super().__init__()
+        self.template = template or config.INTERACTION_JSONL_PER_GAME_TEMPLATE
+        self.max_open = max_open
+        self._handlers = OrderedDict()
+
+    def emit(self, record):
+        game_id = record.interaction.get("game_id") or "interactive"
+        handler = self._handlers.get(game_id)
+        if handler is None:
+            handler = self._handlers[game_id] = _rotating_handler(self.template.format(game_id=game_id))
+            if len(self._handlers) > self.max_open:
+                self._handlers.popitem(last=False)[1].close() # Least recently used game
+        self._handlers.move_to_end(game_id)
+        handler.handle(record)
+
+    def close(self):
+        for handler in self._handlers.values():
+            handler.close()
+        self._handlers.clear()
+        super().close()
+
+
+def make_jsonl_handler(path=None):
+    """Handler for the JSONL records: one rotating file, or one file per game when INTERACTION_JSONL_PER_GAME is set."""
+    if config.INTERACTION_JSONL_PER_GAME:
+        return PerGameJsonlHandler()
+    return _rotating_handler(path or config.INTERACTION_JSONL_FILE)
+
+
+def worker_jsonl_path(pid=None):
+    """Per-process JSONL path, so pool workers never rotate the same file."""
+    root, ext = os.path.splitext(config.INTERACTION_JSONL_FILE)
+    return f"{root}_{pid or os.getpid()}{ext}"
+
+
+def start_listener(routes):
+    """Moves the given handlers behind one queue and a background writer thread.
+
+    `routes` maps each logger to its file handler. Each handler only receives its
+    own logger's records. Handlers left behind by a previous start (including
+    ones inherited over fork, whose writer thread doesn't exist here) are replaced.
+    """
+    global _listener, _listener_pid
+    if _listener is None:
+        atexit.register(stop_listener)
+    stop_listener()
+    log_queue = queue.SimpleQueue()
+    for logger, handler in routes.items():
+        logger.handlers = [h for h in logger.handlers if not isinstance(h, logging.handlers.QueueHandler)]
+        logger.addHandler(logging.handlers.QueueHandler(log_queue))
+        handler.addFilter(_only(logger.name))
+    _listener = logging.handlers.QueueListener(log_queue, *routes.values(), respect_handler_level=True)
+    _listener_pid = os.getpid()
+    _listener.start()
+
+
+def stop_listener():
+    """Writes out everything still queued and closes the files. Registered to run at exit."""
+    global _listener
+    if _listener is None or _listener_pid != os.getpid():
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+
+
+def log_api_call(fields):
+    """Queues one API-call record. `fields` may carry the raw `request` kwargs; the writer hashes them."""
+    if records_logger.handlers:
+        fields.setdefault("ts", time.time())
+        records_logger.info("api_call", extra={"interaction": fields})
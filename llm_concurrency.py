@@ -0,0 +1,88 @@
+import time
+import asyncio
+import logging
+import contextlib
+import config
+
+# Get the root logger configured in llm_player
+logger = logging.getLogger()
+
+# Shared, process-wide async resources. They are created lazily on first use and
+# belong to the event loop that first uses them, so drive all async games of a
+# process from one loop.
+_async_client = None
+_in_flight = None
+_rate_limiters = {}
+
+
+class TokenBucket:
+    """Asyncio token bucket: `rate` requests per second, bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Waits until a token is available and takes it."""
+        async with self._lock: # Waiters are served in FIFO order
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def get_async_client():
+    """Returns the AsyncOpenAI client shared by every player, with a pooled keep-alive HTTP transport."""
+    global _async_client
+    if _async_client is None:
+        try:
+            import httpx
+        except ImportError: # Some openai builds ship the httpx2 fork instead
+            import httpx2 as httpx
+        from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+        _async_client = AsyncOpenAI(
+            base_url=config.LLM_BASE_URL,
+            api_key=config.LLM_API_KEY,
+            default_headers={
+                "HTTP-Referer": "http://localhost",
+                "X-Title": "LLM vs Human Game"
+            },
+            http_client=DefaultAsyncHttpxClient(
+                limits=httpx.Limits(max_connections=config.LLM_MAX_CONNECTIONS,
+                                    max_keepalive_connections=config.LLM_MAX_CONNECTIONS)
+            ),
+            max_retries=0 # Retries are handled by llm_resilience within the round deadline
+        )
+        logger.info(f"Shared AsyncOpenAI client created (max {config.LLM_MAX_CONNECTIONS} connections).")
+    return _async_client
+
+
+def get_rate_limiter(model):
+    """Returns the token bucket for `model`, using config.LLM_RATE_LIMITS or the default limit."""
+    limiter = _rate_limiters.get(model)
+    if limiter is None:
+        rate, burst = config.LLM_RATE_LIMITS.get(model, config.LLM_DEFAULT_RATE_LIMIT)
+        limiter = _rate_limiters[model] = TokenBucket(rate, burst)
+    return limiter
+
+
+@contextlib.asynccontextmanager
+async def request_slot(model):
+    """Takes a rate-limit token for `model`, then holds one of LLM_MAX_IN_FLIGHT request slots.
+
+    The token comes first, so games waiting out one model's rate limit don't sit on
+    slots that calls to other models could use.
+    """
+    global _in_flight
+    if _in_flight is None:
+        _in_flight = asyncio.Semaphore(config.LLM_MAX_IN_FLIGHT)
+    await get_rate_limiter(model).acquire()
+    async with _in_flight:
+        yield
@@ -2,52 +2,210 @@ import os
 import logging
 import json
 import re # Added
+import time
 import random # Added
-from openai import OpenAI
 import config  # Import our configuration
+import llm_concurrency
+import llm_resilience
+import interaction_log
+import metrics
+from concurrent.futures import ThreadPoolExecutor
+from llm_resilience import LatencyTracker, RoundDeadlineExceeded
+from completion_cache import CacheMissError, get_completion_cache
 
 # --- Logging Setup ---
 
-# Root logger configuration (handles console output)
-logging.basicConfig(
-    level=getattr(logging, config.LOG_LEVEL, logging.INFO),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler()] # Only console output for root logger
-)
-
-# Interaction logger (logs prompts/responses to file)
+# Interaction logger (logs prompts/responses to file once setup_logging() has run)
 interaction_logger = logging.getLogger("InteractionLogger")
-interaction_logger.setLevel(logging.INFO) # Log info level and above
-interaction_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-interaction_handler = logging.FileHandler(config.LLM_INTERACTION_LOG_FILE, mode='w')
-interaction_handler.setFormatter(interaction_formatter)
-interaction_logger.addHandler(interaction_handler)
 interaction_logger.propagate = False # Don't send interaction logs to root/console
 
 # Use the interaction logger for general player logging
 logger = interaction_logger
 logger.setLevel(getattr(logging, config.LOG_LEVEL, logging.INFO)) # Use level from config
 
+_logging_pid = None # Process that set logging up; forked children must set up their own writer thread
+
+
+def setup_logging(interaction_log_mode='w', jsonl_path=None):
+    """Configures the console root logger and the interaction logs, once per process.
+
+    Entry points call this at startup; the default mode truncates the interaction
+    log like a fresh game. Worker processes pass 'a' to share it instead, and their
+    own `jsonl_path` for the JSONL records. Both files are written by a background
+    thread (see interaction_log), never by the thread making the API call.
+    """
+    global _logging_pid
+    if _logging_pid == os.getpid():
+        return
+    _logging_pid = os.getpid()
+
+    # Root logger configuration (handles console output)
+    logging.basicConfig(
+        level=getattr(logging, config.LOG_LEVEL, logging.INFO),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler()] # Only console output for root logger
+    )
+
+    config.ensure_log_directory()
+    interaction_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    interaction_handler = logging.FileHandler(config.LLM_INTERACTION_LOG_FILE, mode=interaction_log_mode)
+    interaction_handler.setFormatter(interaction_formatter)
+    routes = {interaction_logger: interaction_handler}
+    if config.INTERACTION_JSONL_ENABLED:
+        routes[interaction_log.records_logger] = interaction_log.make_jsonl_handler(jsonl_path)
+    interaction_log.start_listener(routes)
+
+def _usage_fields(usage):
+    """Token counts from a completion's usage block (None when the provider sent none).
+
+    cached_tokens is the part of the prompt the provider served from its prompt cache:
+    prompt_tokens_details.cached_tokens (OpenAI, OpenRouter) or cache_read_input_tokens (Anthropic).
+    """
+    if usage is None:
+        return None
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached_tokens = getattr(details, "cached_tokens", None)
+    if cached_tokens is None:
+        cached_tokens = getattr(usage, "cache_read_input_tokens", None)
+    return {"prompt_tokens": getattr(usage, "prompt_tokens", None),
+            "completion_tokens": getattr(usage, "completion_tokens", None),
+            "total_tokens": getattr(usage, "total_tokens", None),
+            "cached_tokens": cached_tokens}
+
+def _with_cache_markers(messages):
+    """Copy of messages with cache_control breakpoints on the system prompt and the newest message.
+
+    Next round's request starts with everything sent now, so the provider can serve
+    all of it from the cache entry this request writes.
+    """
+    marked = list(messages)
+    for index in sorted({0, len(marked) - 1}):
+        message = marked[index]
+        marked[index] = {"role": message["role"], "content": [
+            {"type": "text", "text": message["content"], "cache_control": {"type": "ephemeral"}}]}
+    return marked
+
+def _without_cache_markers(messages):
+    return [{"role": message["role"], "content": message["content"][0]["text"]} if isinstance(message["content"], list)
+            else message for message in messages]
+
+# Primary target of _parse_choice: "My choice is: [number]"
+CHOICE_PATTERN = re.compile(r"My choice is:\s*(\d+)", re.IGNORECASE)
+
+
+def _digits_to_choice(text, choices=None):
+    """`text` as a member of `choices` (default config.CHOICES), or None.
+
+    isdecimal() rather than isdigit(): "²" or "①" are digits int() can't read. Runs
+    longer than any choice are rejected before int(), which refuses over 4300 digits.
+    """
+    choices = config.CHOICES if choices is None else choices
+    if not text.isdecimal() or len(text) > len(str(max(choices))):
+        return None
+    choice = int(text)
+    return choice if choice in choices else None
+
+
+class IncrementalChoiceParser:
+    """Applies CHOICE_PATTERN to a streamed response, chunk by chunk.
+
+    feed() returns the choice as soon as the first "My choice is: N" has a complete,
+    valid N, i.e. N is followed by another character or no valid choice extends its
+    digits (so a "1" still waits in case it becomes "10").
+    """
+    # A match can't start further back than this from the end of what was already scanned
+    LOOKBEHIND = 64
+
+    def __init__(self, choices=None):
+        self.choices = set(config.CHOICES if choices is None else choices)
+        self._choice_strings = [str(choice) for choice in self.choices]
+        self.text = ""
+        self.chunks = 0 # Streamed content chunks, roughly one token each
+        self.choice = None
+        self.first_chunk_at = None # time.monotonic() of the first non-empty chunk
+        self._scan_from = 0
+
+    def feed(self, chunk):
+        if chunk and self.first_chunk_at is None:
+            self.first_chunk_at = time.monotonic()
+        self.text += chunk
+        self.chunks += 1
+        if self.choice is not None:
+            return self.choice
+        match = CHOICE_PATTERN.search(self.text, self._scan_from)
+        if match is None:
+            self._scan_from = max(0, len(self.text) - self.LOOKBEHIND)
+            return None
+        self._scan_from = match.start() # Only the first match counts, as in _parse_choice
+        digits = match.group(1)
+        extendable = any(s != digits and s.startswith(digits) for s in self._choice_strings)
+        if match.end() < len(self.text) or not extendable:
+            self.choice = _digits_to_choice(digits, self.choices) # Same checks as _parse_choice
+        return self.choice
+
+
+# How the LLM is asked to answer:
+# - analysis: one sentence of analysis, then "My choice is: N" (parsed via CHOICE_PATTERN)
+# - decision: the bare number only, with a tiny max_tokens (and logit_bias when token ids are configured)
+RESPONSE_MODES = ("analysis", "decision")
+
+# Where each parsed choice came from; anything but the mode's primary path counts as a fallback
+PRIMARY_PARSE_PATHS = {"analysis": "choice_line", "decision": "bare_number"}
+
+# Parse paths where the choice was made up rather than taken from the LLM (marked LLM_Fallback in the CSV)
+FALLBACK_PARSE_PATHS = ("empty", "random", "api_error", "deadline")
+
+# How much conversation is sent per round:
+# - full: system prompt + every earlier round (prompt grows each round)
+# - window: system prompt + the last `memory_window` rounds
+# - digest: window, plus a numeric summary of all earlier rounds appended to the system prompt
+MEMORY_STRATEGIES = ("full", "window", "digest")
+
 class LLMPlayer:
     """Handles interaction with the LLM via OpenRouter, maintaining conversation history."""
 
-    def __init__(self):
-        """Initializes the LLM player with conversation history."""
+    def __init__(self, seed=None, memory_strategy=None, memory_window=None, response_mode=None, model=None):
+        """Initializes the LLM player with conversation history.
+
+        `seed` fixes the RNG behind the random fallbacks, so replayed games are reproducible.
+        `memory_strategy` controls how much of the conversation is resent each round
+        (see MEMORY_STRATEGIES); both it and `memory_window` default to config.
+        `response_mode` (see RESPONSE_MODES) defaults to the model's entry in
+        config.LLM_RESPONSE_MODES_BY_MODEL, else config.LLM_RESPONSE_MODE.
+        `model` defaults to config.LLM_MODEL.
+        """
+        setup_logging(interaction_log_mode='a') # No-op when the entry point already set logging up
+        if not config.LLM_API_KEY:
+            config.load_environment() # Programs that skipped setup still pick up .env
         if not config.LLM_API_KEY:
             raise ValueError("LLM_API_KEY not found in config. Please check .env file.")
 
-        self.client = OpenAI(
-            base_url=config.OPENROUTER_BASE_URL,
-            api_key=config.LLM_API_KEY,
-            # Add required headers for OpenRouter if needed (sometimes helps)
-             default_headers={
-                 "HTTP-Referer": "http://localhost", # Placeholder, replace if you have a specific URL
-                 "X-Title": "LLM vs Human Game" # Placeholder title
-             }
-        )
-        self.model = config.LLM_MODEL
+        self._client = None # Sync OpenAI client, created on first sync call (see client)
+        self.async_client = None # Shared AsyncOpenAI client, fetched on first async call
+        self.cache = get_completion_cache() # None unless LLM_CACHE_MODE records or replays
+        self.rng = random.Random(seed) # Used by the random fallbacks
+        self.streaming = config.LLM_STREAMING # Stream and stop as soon as the choice line arrives
+        self.stream_stats = [] # Per streamed call: time_to_decision, early_stop, tokens_received, tokens_saved
+        self.model = model or config.LLM_MODEL
         self.temperature = config.LLM_TEMPERATURE
         self.name = f"LLM ({self.model.split('/')[-1]})" # Simple name
+        self.response_mode = response_mode or config.LLM_RESPONSE_MODES_BY_MODEL.get(self.model, config.LLM_RESPONSE_MODE)
+        if self.response_mode not in RESPONSE_MODES:
+            raise ValueError(f"Unknown response mode '{self.response_mode}'. Available: {', '.join(RESPONSE_MODES)}")
+        # Anthropic-style cache_control breakpoints, for models that only cache marked prefixes
+        self.cache_markers = self.model.startswith(tuple(config.LLM_CACHE_CONTROL_MODEL_PREFIXES))
+        self.prompt_cache_stats = {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0} # See get_prompt_cache_stats()
+        self.parse_stats = {} # parse path -> count, see get_parse_stats()
+        self.fallback_count = 0 # Rounds whose choice was substituted at random
+        self.last_decision = None # How the latest choice was obtained: parse path, fallback, attempts, source
+        self._turn_log = None # The current turn's API-call records for the JSONL interaction log
+
+        # Latency budget, retries and hedging (see llm_resilience)
+        self.round_deadline = config.LLM_ROUND_DEADLINE_S
+        self.hedging = config.LLM_HEDGE
+        self.hedge_model = config.LLM_HEDGE_MODEL or self.model # Same model = duplicate request
+        self.latency = LatencyTracker()
+        self._hedge_pool = None # Threads for sync hedged requests, created on first use
 
         # Store system prompt separately
         self.system_prompt = f"""You are {self.name} in a {config.NUM_ROUNDS}-round game.
@@ -62,17 +220,98 @@ Game Rules:
 Memory Instructions:
 - Take into account the history of all previous rounds (provided in the conversation) when making your choice to maximize your total score
 
-Output Format:
-- Analyze the game situation in 1 sentence. Use the analysis to inform your choice.
-- End with "My choice is: [number]" where [number] is between {config.MIN_CHOICE} and {config.MAX_CHOICE}"""
+{self._output_format_instructions()}"""
 
         # Stores user/assistant message dictionaries
         self.conversation_history = []
         self.first_round = True
+        self.round_starts = [] # Index in conversation_history where each turn's user message begins
+
+        self.memory_strategy = memory_strategy or config.LLM_MEMORY_STRATEGY
+        if self.memory_strategy not in MEMORY_STRATEGIES:
+            raise ValueError(f"Unknown memory strategy '{self.memory_strategy}'. Available: {', '.join(MEMORY_STRATEGIES)}")
+        self.memory_window = memory_window or config.LLM_MEMORY_WINDOW_ROUNDS
+        self.memory_window_stride = config.LLM_MEMORY_WINDOW_STRIDE
+        # Running totals over rounds that have left the window (digest strategy), folded in incrementally
+        self.digest = {"rounds": 0, "human_choices": {}, "llm_choices": {},
+                       "human_bonuses": 0, "llm_bonuses": 0, "human_points": 0, "llm_points": 0}
+        self.prompt_sizes = [] # (round, messages, characters) sent each turn
 
         logger.info(f"LLMPlayer initialized: {self.name}, Temp: {self.temperature}")
         logger.debug(f"System Prompt:\n{self.system_prompt}") # Log system prompt to main log if DEBUG
 
+    @property
+    def client(self):
+        """This player's sync OpenAI client. Players that only run async games never build one."""
+        if self._client is None:
+            from openai import OpenAI # Imported on first use so headless imports stay fast
+            self._client = OpenAI(
+                base_url=config.LLM_BASE_URL,
+                api_key=config.LLM_API_KEY,
+                # Add required headers for OpenRouter if needed (sometimes helps)
+                 default_headers={
+                     "HTTP-Referer": "http://localhost", # Placeholder, replace if you have a specific URL
+                     "X-Title": "LLM vs Human Game" # Placeholder title
+                 },
+                max_retries=0 # Retries are handled by llm_resilience within the round deadline
+            )
+        return self._client
+
+    def _output_format_instructions(self):
+        if self.response_mode == "decision":
+            return f"""Output Format:
+- Reply with your chosen number only: a single integer between {config.MIN_CHOICE} and {config.MAX_CHOICE}, with no other text"""
+        return f"""Output Format:
+- Analyze the game situation in 1 sentence. Use the analysis to inform your choice.
+- End with "My choice is: [number]" where [number] is between {config.MIN_CHOICE} and {config.MAX_CHOICE}"""
+
+    def turn_marker(self):
+        """Returns a marker of the conversation state before a turn, for rollback_to()."""
+        return (len(self.conversation_history), len(self.round_starts), self.first_round)
+
+    def rollback_to(self, marker):
+        """Drops everything a turn added to the conversation since turn_marker() was taken."""
+        history_length, turns, first_round = marker
+        del self.conversation_history[history_length:]
+        del self.round_starts[turns:]
+        self.first_round = first_round
+
+    def snapshot(self):
+        """Conversation, memory and fallback RNG state, for checkpoint.py.
+
+        Holds references to live state, so serialize it before the next turn.
+        """
+        return {
+            "model": self.model,
+            "response_mode": self.response_mode,
+            "memory_strategy": self.memory_strategy,
+            "memory_window": self.memory_window,
+            "conversation_history": self.conversation_history,
+            "round_starts": self.round_starts,
+            "first_round": self.first_round,
+            "rng_state": self.rng.getstate(),
+            "digest": self.digest,
+            "parse_stats": self.parse_stats,
+            "fallback_count": self.fallback_count,
+            "prompt_sizes": self.prompt_sizes,
+            "prompt_cache_stats": self.prompt_cache_stats,
+        }
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """Builds a player that continues the conversation captured by snapshot()."""
+        player = cls(memory_strategy=snapshot["memory_strategy"], memory_window=snapshot["memory_window"],
+                     response_mode=snapshot["response_mode"], model=snapshot["model"])
+        player.conversation_history = list(snapshot["conversation_history"])
+        player.round_starts = list(snapshot["round_starts"])
+        player.first_round = snapshot["first_round"]
+        player.rng.setstate(snapshot["rng_state"])
+        player.digest = snapshot["digest"]
+        player.parse_stats = dict(snapshot["parse_stats"])
+        player.fallback_count = snapshot["fallback_count"]
+        player.prompt_sizes = list(snapshot["prompt_sizes"])
+        player.prompt_cache_stats = dict(snapshot["prompt_cache_stats"])
+        return player
 
     def _format_round_prompt(self, game_state) -> str:
         """Formats the user prompt string for the current round."""
@@ -124,17 +363,29 @@ Output Format:
         """Parses the LLM's response to extract the numerical choice."""
         if not response_content:
             logger.warning(f"{self.name} response was empty. Defaulting to random choice.")
-            return random.choice(config.CHOICES)
+            self._count_parse_path("empty")
+            return self.rng.choice(config.CHOICES)
 
         logger.debug(f"Attempting to parse choice from: '{response_content}'")
 
+        # Digit runs longer than any choice can't be one (and int() refuses runs over 4300 digits)
+        max_digits = len(str(max(config.CHOICES)))
+
+        # Decision mode: the whole response should be the number
+        choice = _digits_to_choice(response_content.strip())
+        if choice is not None:
+            logger.info(f"{self.name} parsed choice: {choice} (bare number)")
+            self._count_parse_path("bare_number")
+            return choice
+
         # Primary Target: "My choice is: [number]"
-        match = re.search(r"My choice is:\s*(\d+)", response_content, re.IGNORECASE)
+        match = CHOICE_PATTERN.search(response_content)
         if match:
             try:
                 choice = int(match.group(1))
                 if choice in config.CHOICES:
                     logger.info(f"{self.name} parsed choice: {choice} (from 'My choice is: ...')")
+                    self._count_parse_path("choice_line")
                     return choice
                 else:
                     logger.warning(f"{self.name} extracted choice {choice} is outside allowed range {config.CHOICES}. Proceeding to fallbacks.")
@@ -144,20 +395,49 @@ Output Format:
         # Fallback 1: Look for any number within the valid range in the last line
         last_line = response_content.strip().split('\n')[-1]
         numbers_in_last_line = re.findall(r'\d+', last_line)
-        valid_numbers = [int(n) for n in numbers_in_last_line if int(n) in config.CHOICES]
+        valid_numbers = [int(n) for n in numbers_in_last_line if len(n) <= max_digits and int(n) in config.CHOICES]
         if valid_numbers:
             choice = valid_numbers[-1] # Take the last valid number in the last line
             logger.info(f"{self.name} parsed choice: {choice} (fallback: valid number in last line)")
+            self._count_parse_path("last_line")
             return choice
 
         # Fallback 2: Random choice
         logger.warning(f"{self.name} could not parse choice reliably from response: '{response_content}'. Defaulting to random choice.")
-        return random.choice(config.CHOICES)
-
-
-    def get_llm_choice(self, game_state):
-        """Gets the LLM's choice for the current round using conversation history."""
-
+        self._count_parse_path("random")
+        return self.rng.choice(config.CHOICES)
+
+    def _count_parse_path(self, path):
+        self.parse_stats[path] = self.parse_stats.get(path, 0) + 1
+        current_round = None
+        if self.last_decision is not None:
+            self.last_decision["parse_path"] = path
+            self.last_decision["fallback"] = path in FALLBACK_PARSE_PATHS
+            current_round = self.last_decision["round"]
+        metrics.PARSE_PATHS.inc(model=self.model, round=current_round, path=path)
+        if path in FALLBACK_PARSE_PATHS:
+            self.fallback_count += 1
+            metrics.FALLBACKS.inc(model=self.model, round=current_round)
+
+    def get_parse_stats(self):
+        """Returns the response mode, parse path counts and the share of rounds that needed a fallback."""
+        total = sum(self.parse_stats.values())
+        primary = self.parse_stats.get(PRIMARY_PARSE_PATHS[self.response_mode], 0)
+        return {
+            "response_mode": self.response_mode,
+            "counts": dict(self.parse_stats),
+            "fallback_rate": (total - primary) / total if total else 0.0,
+        }
+
+
+    def get_prompt_cache_stats(self):
+        """Prompt tokens reported by the provider so far and the share served from its prompt cache."""
+        stats = dict(self.prompt_cache_stats)
+        stats["cached_share"] = stats["cached_tokens"] / stats["prompt_tokens"] if stats["prompt_tokens"] else 0.0
+        return stats
+
+    def _prepare_turn(self, game_state):
+        """Formats this round's prompt, adds it to the history and returns the messages to send."""
         current_round = game_state['round']
         logger.info(f"--- LLM Turn: Round {current_round} ---") # Log separator to interaction log
 
@@ -167,42 +447,370 @@ Output Format:
 
         # 2. Add user prompt to history & Log to memory
         user_message = {"role": "user", "content": user_prompt_content}
+        self.round_starts.append(len(self.conversation_history))
         self.conversation_history.append(user_message)
 
-        # 3. Construct the message list: System Prompt + Full Conversation History
-        messages_to_send = [{"role": "system", "content": self.system_prompt}] + self.conversation_history
-        logger.debug(f"Sending {len(messages_to_send)} messages to API (1 system + {len(self.conversation_history)} history).")
-        # Log memory being sent (optional, can be verbose)
-        # logger.debug("--- Sending to API ---")
-        # for i, msg in enumerate(messages_to_send):
-        #     logger.debug(f"  Message {i} ({msg['role']}): {msg['content']}") # Use main logger if uncommented
-        # logger.debug("--- End API Send ---")
-
+        # 3. Construct the message list: System Prompt + the conversation the memory strategy keeps
+        messages_to_send = self._build_messages(game_state)
+        prompt_chars = sum(len(message['content']) for message in messages_to_send)
+        self.prompt_sizes.append((current_round, len(messages_to_send), prompt_chars))
+        logger.info(f"Prompt size for Round {current_round}: {len(messages_to_send)} messages, {prompt_chars} chars "
+                    f"(memory: {self.memory_strategy})")
+        return messages_to_send
+
+    def _build_messages(self, game_state):
+        """Returns system prompt + conversation according to the memory strategy.
+
+        Messages are only ever appended between rounds, so each request repeats the
+        previous one byte for byte and adds to it, which is what provider prompt
+        caches match on. The window strategies keep that between window jumps.
+        """
+        if self.memory_strategy == "full":
+            return [{"role": "system", "content": self.system_prompt}] + self.conversation_history
+
+        # Keep at least the last `memory_window` complete turns plus the current prompt. With a stride
+        # above 1 older turns are dropped `memory_window_stride` at a time, so the prefix only changes on a jump.
+        excess_turns = max(0, len(self.round_starts) - self.memory_window - 1)
+        first_kept_turn = excess_turns - excess_turns % self.memory_window_stride
+        window = self.conversation_history[self.round_starts[first_kept_turn]:]
+        system_content = self.system_prompt
+        if self.memory_strategy == "digest":
+            # The oldest kept prompt describes the round before its own, so digest everything before that
+            kept_turns = len(self.round_starts) - first_kept_turn
+            self._update_digest(game_state['history'], game_state['round'] - kept_turns - 1)
+            if self.digest["rounds"]:
+                system_content += "\n\n" + self._format_digest()
+        return [{"role": "system", "content": system_content}] + window
+
+    def _update_digest(self, history, through_round):
+        """Folds rounds up to `through_round` that aren't in the digest yet into its running totals."""
+        digest = self.digest
+        new_rounds = history[digest["rounds"]:max(digest["rounds"], through_round)]
+        if not new_rounds:
+            return
+        for player in ("human", "llm"):
+            choices = digest[f"{player}_choices"]
+            for choice, count in new_rounds.choice_counts(player).items():
+                choices[choice] = choices.get(choice, 0) + count
+            digest[f"{player}_bonuses"] += new_rounds.bonus_count(player)
+            digest[f"{player}_points"] += new_rounds.total(player)
+        digest["rounds"] += len(new_rounds)
+
+    def _format_digest(self):
+        digest = self.digest
+        counts = lambda choices: ", ".join(f"{choice}x{choices.get(choice, 0)}" for choice in config.CHOICES)
+        return (f"Summary of rounds 1-{digest['rounds']} (older than the messages below):\n"
+                f"- Opponent choices: {counts(digest['human_choices'])}\n"
+                f"- Your choices: {counts(digest['llm_choices'])}\n"
+                f"- Bonuses - You: {digest['llm_bonuses']}, Opponent: {digest['human_bonuses']}\n"
+                f"- Points from these rounds - You: {digest['llm_points']}, Opponent: {digest['human_points']}")
+
+    def _completion_kwargs(self, messages_to_send):
+        """Arguments for chat.completions.create, shared by the sync and async paths."""
+        if self.cache_markers:
+            messages_to_send = _with_cache_markers(messages_to_send)
+        if self.response_mode == "decision":
+            request_kwargs = {
+                "model": self.model,
+                "messages": messages_to_send,
+                "temperature": self.temperature,
+                "max_tokens": config.LLM_DECISION_MAX_TOKENS
+            }
+            # Restrict sampling to the digit tokens of CHOICES when we know this model's token ids
+            token_ids = config.LLM_DECISION_TOKEN_IDS.get(self.model)
+            if token_ids:
+                request_kwargs["logit_bias"] = {str(token_ids[choice]): 100 for choice in config.CHOICES}
+            return request_kwargs
+        return {
+            "model": self.model,
+            "messages": messages_to_send,
+            "temperature": self.temperature,
+            "max_tokens": 150 # Increased token limit for analysis + choice
+        }
+
+    def _cached_response(self, request_kwargs):
+        """Returns (cache_key, recorded response or None). Raises CacheMissError in replay mode."""
+        if self.cache is None:
+            return None, None
+        cache_key = self.cache.make_key(request_kwargs)
+        response_content = self.cache.get(cache_key)
+        if response_content is not None:
+            logger.info(f"{self.name} completion served from cache ({cache_key[:12]})")
+            self._log_call(self._turn_log, request_kwargs, "cache", time.monotonic(), response_content)
+        return cache_key, response_content
+
+    def _record_response(self, cache_key, response_content):
+        if self.cache is None:
+            return
+        if self.last_decision.get("source") == "hedge" and self.hedge_model != self.model:
+            # Another model's answer: stored under this key, replays would pass it off as self.model's
+            logger.info(f"{self.name} response from hedge model {self.hedge_model} not recorded")
+            return
+        self.cache.put(cache_key, response_content)
+
+    def _handle_response(self, current_round, response_content):
+        """Records the LLM's reply in the history and parses its choice."""
+        response_content = response_content.strip()
+        logger.info(f"{self.name} Raw Response (Round {current_round}): {response_content}")
+
+        # 5. Add LLM response to history & Log to memory
+        assistant_message = {"role": "assistant", "content": response_content}
+        self.conversation_history.append(assistant_message)
+
+        # 6. Parse the choice from the response
+        self._turn_log["used_response"] = response_content
+        choice = self._parse_choice(response_content)
+        self.last_decision["choice"] = choice
+        return choice
+
+    def _request_response(self, request_kwargs, timeout=None):
+        """Calls the API and returns the response text, streaming if LLM_STREAMING is set."""
+        if not self.streaming:
+            completion = self.client.chat.completions.create(**request_kwargs, timeout=timeout)
+            return completion.choices[0].message.content, _usage_fields(completion.usage)
+
+        started_at = time.monotonic()
+        parser = IncrementalChoiceParser()
+        stream = self.client.chat.completions.create(**request_kwargs, stream=True, timeout=timeout)
         try:
-            # 4. Call the API
-            completion = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages_to_send,
-                temperature=self.temperature,
-                max_tokens=150 # Increased token limit for analysis + choice
-            )
-            response_content = completion.choices[0].message.content.strip()
-            logger.info(f"{self.name} Raw Response (Round {current_round}): {response_content}")
-
-            # 5. Add LLM response to history & Log to memory
-            assistant_message = {"role": "assistant", "content": response_content}
-            self.conversation_history.append(assistant_message)
-
-            # 6. Parse the choice from the response
-            llm_choice = self._parse_choice(response_content)
-            return llm_choice
+            for chunk in stream:
+                if chunk.choices and parser.feed(chunk.choices[0].delta.content or "") is not None:
+                    break
+        finally:
+            stream.close() # Stops generation server-side once the choice is known
+        self._log_stream_stats(request_kwargs, parser, started_at)
+        return parser.text, None # Usage only arrives at the end of a stream we cut short
+
+    async def _request_response_async(self, request_kwargs):
+        if not self.streaming:
+            completion = await self.async_client.chat.completions.create(**request_kwargs)
+            return completion.choices[0].message.content, _usage_fields(completion.usage)
+
+        started_at = time.monotonic()
+        parser = IncrementalChoiceParser()
+        stream = await self.async_client.chat.completions.create(**request_kwargs, stream=True)
+        try:
+            async for chunk in stream:
+                if chunk.choices and parser.feed(chunk.choices[0].delta.content or "") is not None:
+                    break
+        finally:
+            await stream.close()
+        self._log_stream_stats(request_kwargs, parser, started_at)
+        return parser.text, None
+
+    def _timed_request(self, request_kwargs, deadline, source="primary"):
+        """One API call bounded by the round deadline; successful latencies feed the hedge timer."""
+        turn_log = self._turn_log # Captured: a hedge loser may finish after the next turn began
+        started_at = time.monotonic()
+        try:
+            response_content, usage = self._request_response(request_kwargs, timeout=max(0.001, deadline - started_at))
+        except BaseException as e:
+            self._log_call(turn_log, request_kwargs, source, started_at, error=e)
+            raise
+        self.latency.record(time.monotonic() - started_at)
+        self._log_call(turn_log, request_kwargs, source, started_at, response_content, usage)
+        return response_content
+
+    async def _timed_request_async(self, request_kwargs, deadline, source="primary"):
+        # Deadline is enforced by cancellation in run_with_retries_async
+        turn_log = self._turn_log
+        async with llm_concurrency.request_slot(request_kwargs['model']):
+            started_at = time.monotonic()
+            try:
+                response_content, usage = await self._request_response_async(request_kwargs)
+            except BaseException as e: # Includes cancellation by the deadline or a winning hedge
+                self._log_call(turn_log, request_kwargs, source, started_at, error=e)
+                raise
+        self.latency.record(time.monotonic() - started_at)
+        self._log_call(turn_log, request_kwargs, source, started_at, response_content, usage)
+        return response_content
+
+    def _log_call(self, turn_log, request_kwargs, source, started_at, response_content=None, usage=None, error=None):
+        """Adds one API call (or cache hit) to the turn's JSONL records, sent once the parse path is known.
+
+        Also records the call's latency, token usage or error in metrics.
+        """
+        latency = time.monotonic() - started_at
+        labels = {"model": request_kwargs["model"], "round": turn_log["round"]}
+        metrics.API_LATENCY.observe(latency, source=source, outcome="ok" if error is None else "error", **labels)
+        if error is not None:
+            metrics.API_ERRORS.inc(error=type(error).__name__, **labels)
+        for kind in ("prompt_tokens", "completion_tokens", "cached_tokens"):
+            if usage and usage.get(kind) is not None:
+                metrics.TOKENS.observe(usage[kind], kind=kind.split("_")[0], **labels)
+        if usage and usage.get("prompt_tokens") is not None:
+            self.prompt_cache_stats["calls"] += 1
+            self.prompt_cache_stats["prompt_tokens"] += usage["prompt_tokens"]
+            self.prompt_cache_stats["cached_tokens"] += usage.get("cached_tokens") or 0
+        call = {
+            "ts": time.time(),
+            "event": "api_call",
+            "game_id": turn_log["game_id"],
+            "round": turn_log["round"],
+            "player": self.name,
+            "model": request_kwargs["model"],
+            "source": source,
+            "response_mode": self.response_mode,
+            "streamed": self.streaming and source != "cache",
+            "latency_s": round(latency, 4),
+            "usage": usage,
+            "error": None if error is None else f"{type(error).__name__}: {error}",
+            "response": response_content,
+            "request": request_kwargs, # Hashed by the log writer thread
+        }
+        if turn_log["emitted"]:
+            interaction_log.log_api_call(call) # Finished after its turn was decided
+        else:
+            turn_log["calls"].append(call)
+
+    def _emit_turn_log(self):
+        """Sends the turn's call records, marking the call whose response was used and the turn's parse path."""
+        turn_log = self._turn_log
+        turn_log["emitted"] = True
+        used_response = turn_log.get("used_response")
+        for call in turn_log["calls"]:
+            call["used"] = used_response is not None and call["error"] is None and (call["response"] or "").strip() == used_response
+            if call["used"]:
+                used_response = None # Only the first matching call (hedged twins can answer alike)
+            call["parse_path"] = self.last_decision["parse_path"]
+            call["attempts"] = self.last_decision["attempts"]
+            interaction_log.log_api_call(call)
+
+    def _hedge_kwargs(self, request_kwargs):
+        hedge_kwargs = dict(request_kwargs, model=self.hedge_model)
+        if self.hedge_model != self.model:
+            hedge_kwargs.pop("logit_bias", None) # Token ids are model-specific
+            if self.cache_markers and not self.hedge_model.startswith(tuple(config.LLM_CACHE_CONTROL_MODEL_PREFIXES)):
+                hedge_kwargs["messages"] = _without_cache_markers(request_kwargs["messages"])
+        return hedge_kwargs
+
+    def _is_valid_response(self, response_content):
+        """True if the response contains a usable choice without falling back."""
+        text = (response_content or "").strip()
+        if text.isdecimal():
+            return _digits_to_choice(text) is not None
+        match = CHOICE_PATTERN.search(text)
+        return match is not None and _digits_to_choice(match.group(1)) is not None
+
+    def _attempt(self, request_kwargs, deadline):
+        """One attempt: a single call, or a hedged pair when hedging is enabled."""
+        if not self.hedging:
+            return self._timed_request(request_kwargs, deadline)
+        if self._hedge_pool is None:
+            self._hedge_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="LLMHedge")
+        response_content, source = llm_resilience.run_hedged(
+            self._hedge_pool,
+            lambda d: self._timed_request(request_kwargs, d),
+            lambda d: self._timed_request(self._hedge_kwargs(request_kwargs), d, source="hedge"),
+            self.latency.hedge_delay(), deadline, self._is_valid_response)
+        self.last_decision["source"] = source
+        return response_content
+
+    async def _attempt_async(self, request_kwargs, deadline):
+        if not self.hedging:
+            return await self._timed_request_async(request_kwargs, deadline)
+        response_content, source = await llm_resilience.run_hedged_async(
+            lambda d: self._timed_request_async(request_kwargs, d),
+            lambda d: self._timed_request_async(self._hedge_kwargs(request_kwargs), d, source="hedge"),
+            self.latency.hedge_delay(), deadline, self._is_valid_response)
+        self.last_decision["source"] = source
+        return response_content
+
+    def _log_stream_stats(self, request_kwargs, parser, started_at):
+        """Logs time-to-decision and (approximate) completion tokens saved by stopping early."""
+        elapsed = time.monotonic() - started_at
+        time_to_first_token = parser.first_chunk_at - started_at if parser.first_chunk_at is not None else None
+        if time_to_first_token is not None:
+            metrics.TIME_TO_FIRST_TOKEN.observe(time_to_first_token, model=request_kwargs['model'],
+                                                round=self.last_decision["round"] if self.last_decision else None)
+        chunks = parser.chunks
+        if parser.choice is not None:
+            tokens_saved = max(0, request_kwargs['max_tokens'] - chunks)
+            logger.info(f"{self.name} stream: decision {parser.choice} after {elapsed:.2f}s, "
+                        f"~{chunks} tokens received, ~{tokens_saved} tokens saved")
+        else:
+            tokens_saved = 0
+            logger.info(f"{self.name} stream: no early decision, full response after {elapsed:.2f}s")
+        self.stream_stats.append({"time_to_decision": elapsed, "time_to_first_token": time_to_first_token,
+                                  "early_stop": parser.choice is not None,
+                                  "tokens_received": chunks, "tokens_saved": tokens_saved})
+
+    def _choice_after_error(self, e, parse_path="api_error"):
+        logger.error(f"Error during LLM API call for {self.name}: {e}", exc_info=True)
+        self._count_parse_path(parse_path)
+        # Default strategy in case of API error
+        default_choice = self.rng.choice(config.CHOICES) # Random choice on error
+        self.last_decision["choice"] = default_choice
+        logger.warning(f"API error for {self.name}. Defaulting LLM choice to {default_choice}")
+        # Add a placeholder assistant message on error? Maybe not, let history reflect the failure.
+        return default_choice
+
+    def _begin_decision(self, game_state):
+        self.last_decision = {"round": game_state['round'], "model": self.model, "parse_path": None,
+                              "fallback": False, "attempts": 0, "source": "primary"}
+        self._turn_log = {"game_id": game_state.get('game_id'), "round": game_state['round'], "calls": [], "emitted": False}
+        self._decision_started_at = time.monotonic()
+        return self._decision_started_at + self.round_deadline
+
+    def _end_decision(self):
+        """Sends the turn's interaction records and records how long the whole turn took."""
+        self._emit_turn_log()
+        metrics.DECISION_LATENCY.observe(time.monotonic() - self._decision_started_at,
+                                         model=self.model, round=self.last_decision["round"])
 
+    def get_llm_choice(self, game_state):
+        """Gets the LLM's choice for the current round using conversation history.
+
+        The API call gets LLM_ROUND_DEADLINE_S in total, with capped exponential
+        backoff retries for retryable errors and optional hedging. If that budget
+        runs out the choice falls back to random, and last_decision says so.
+        """
+        deadline = self._begin_decision(game_state)
+        messages_to_send = self._prepare_turn(game_state)
+        request_kwargs = self._completion_kwargs(messages_to_send)
+        try:
+            cache_key, response_content = self._cached_response(request_kwargs)
+            if response_content is None:
+                # 4. Call the API
+                response_content, self.last_decision["attempts"] = llm_resilience.run_with_retries(
+                    lambda d: self._attempt(request_kwargs, d), deadline, self.name)
+                self._record_response(cache_key, response_content)
+            return self._handle_response(game_state['round'], response_content)
+        except CacheMissError:
+            raise # Replay-only runs must not silently diverge from the recording
+        except RoundDeadlineExceeded as e:
+            return self._choice_after_error(e, "deadline")
+        except Exception as e:
+            return self._choice_after_error(e)
+        finally:
+            self._end_decision()
+
+    async def get_llm_choice_async(self, game_state):
+        """Async version of get_llm_choice on the shared AsyncOpenAI client.
+
+        Calls wait for an in-flight slot and a per-model rate-limit token (see
+        llm_concurrency), so many concurrent games can share one process without
+        tripping provider 429s.
+        """
+        deadline = self._begin_decision(game_state)
+        messages_to_send = self._prepare_turn(game_state)
+        request_kwargs = self._completion_kwargs(messages_to_send)
+        if self.async_client is None:
+            self.async_client = llm_concurrency.get_async_client()
+        try:
+            cache_key, response_content = self._cached_response(request_kwargs)
+            if response_content is None:
+                response_content, self.last_decision["attempts"] = await llm_resilience.run_with_retries_async(
+                    lambda d: self._attempt_async(request_kwargs, d), deadline, self.name)
+                self._record_response(cache_key, response_content)
+            return self._handle_response(game_state['round'], response_content)
+        except CacheMissError:
+            raise
+        except RoundDeadlineExceeded as e:
+            return self._choice_after_error(e, "deadline")
         except Exception as e:
-            logger.error(f"Error during LLM API call for {self.name}: {e}", exc_info=True)
-            # Default strategy in case of API error
-            default_choice = random.choice(config.CHOICES) # Random choice on error
-            logger.warning(f"API error for {self.name}. Defaulting LLM choice to {default_choice}")
-            # Add a placeholder assistant message on error? Maybe not, let history reflect the failure.
-            return default_choice
+            return self._choice_after_error(e)
+        finally:
+            self._end_decision()
 
 # Keep this clean, no old test code 
\ No newline at end of file
@@ -0,0 +1,192 @@
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from concurrent.futures import wait, FIRST_COMPLETED
+
+import config
+
+# Get the root logger configured in llm_player
+logger = logging.getLogger()
+
+_retryable_errors = None
+
+
+def retryable_errors():
+    """Errors worth another attempt: timeouts, dropped connections, 429s and provider 5xx.
+
+    openai is only imported once an error is actually being classified.
+    """
+    global _retryable_errors
+    if _retryable_errors is None:
+        import openai
+        _retryable_errors = (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+    return _retryable_errors
+
+
+class RoundDeadlineExceeded(Exception):
+    """Raised when no valid answer arrived within the round's latency budget."""
+
+
+class LatencyTracker:
+    """Rolling window of successful API latencies, used to time hedged requests."""
+
+    def __init__(self, size=200):
+        self.samples = deque(maxlen=size)
+
+    def record(self, seconds):
+        self.samples.append(seconds)
+
+    def percentile(self, pct):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+    def hedge_delay(self):
+        """p95 latency once there are enough samples, else the configured default."""
+        if len(self.samples) < config.LLM_HEDGE_MIN_SAMPLES:
+            return config.LLM_HEDGE_DEFAULT_DELAY_S
+        return self.percentile(95)
+
+
+def backoff_delay(attempt, error=None):
+    """Capped exponential backoff with jitter; honours a provider Retry-After header when there is one."""
+    delay = min(config.LLM_RETRY_BACKOFF_CAP_S, config.LLM_RETRY_BACKOFF_BASE_S * 2 ** attempt)
+    delay *= random.uniform(0.5, 1.0)
+    response = getattr(error, "response", None)
+    if response is not None:
+        try:
+            delay = max(delay, float(response.headers.get("retry-after", 0)))
+        except (TypeError, ValueError):
+            pass
+    return delay
+
+
+def run_with_retries(attempt_fn, deadline, label):
+    """Calls attempt_fn(deadline) until it succeeds, retrying retryable errors until the deadline.
+
+    Returns (result, attempts). Non-retryable errors propagate immediately.
+    """
+    for attempt in range(config.LLM_MAX_RETRIES + 1):
+        if time.monotonic() >= deadline:
+            break
+        try:
+            return attempt_fn(deadline), attempt + 1
+        except retryable_errors() as e:
+            delay = backoff_delay(attempt, e)
+            if attempt == config.LLM_MAX_RETRIES:
+                raise
+            if time.monotonic() + delay >= deadline:
+                raise RoundDeadlineExceeded(f"{label}: round deadline reached while retrying") from e
+            logger.warning(f"{label}: retryable error ({type(e).__name__}), retry {attempt + 1} in {delay:.2f}s")
+            time.sleep(delay)
+    raise RoundDeadlineExceeded(f"{label}: no answer within the round deadline")
+
+
+async def run_with_retries_async(attempt_fn, deadline, label):
+    """Async run_with_retries; each attempt is cancelled when the deadline passes."""
+    for attempt in range(config.LLM_MAX_RETRIES + 1):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            return await asyncio.wait_for(attempt_fn(deadline), remaining), attempt + 1
+        except asyncio.TimeoutError:
+            break
+        except retryable_errors() as e:
+            delay = backoff_delay(attempt, e)
+            if attempt == config.LLM_MAX_RETRIES:
+                raise
+            if time.monotonic() + delay >= deadline:
+                raise RoundDeadlineExceeded(f"{label}: round deadline reached while retrying") from e
+            logger.warning(f"{label}: retryable error ({type(e).__name__}), retry {attempt + 1} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+    raise RoundDeadlineExceeded(f"{label}: no answer within the round deadline")
+
+
+def run_hedged(executor, primary_fn, hedge_fn, hedge_delay, deadline, is_valid):
+    """Runs primary_fn(deadline) and, if it hasn't answered within hedge_delay (or failed), hedge_fn(deadline).
+
+    Returns (response, source) for the first valid response, source being
+    "primary" or "hedge". The loser is abandoned: it is cancelled if it hasn't
+    started, otherwise its result is ignored. An invalid response still wins if
+    nothing else is left to wait for.
+    """
+    pending = {executor.submit(primary_fn, deadline): "primary"}
+    hedge_at = time.monotonic() + hedge_delay
+    hedged = False
+    last_error = None
+    fallback_response = None
+
+    while pending or not hedged:
+        now = time.monotonic()
+        if not hedged and (now >= hedge_at or not pending):
+            pending[executor.submit(hedge_fn, deadline)] = "hedge"
+            hedged = True
+            logger.info(f"Hedging LLM request after {hedge_delay:.2f}s")
+            continue
+        wake_at = deadline if hedged else min(hedge_at, deadline)
+        if now >= deadline:
+            break
+        done, _ = wait(pending, timeout=wake_at - now, return_when=FIRST_COMPLETED)
+        for future in done:
+            source = pending.pop(future)
+            try:
+                response = future.result()
+            except Exception as e:
+                last_error = e
+                continue
+            if is_valid(response):
+                for other in pending:
+                    other.cancel()
+                return response, source
+            fallback_response = (response, source)
+
+    for other in pending:
+        other.cancel()
+    if fallback_response is not None:
+        return fallback_response
+    if last_error is not None:
+        raise last_error
+    raise RoundDeadlineExceeded("Hedged LLM request: no answer within the round deadline")
+
+
+async def run_hedged_async(primary_fn, hedge_fn, hedge_delay, deadline, is_valid):
+    """Async run_hedged; losing requests are cancelled outright."""
+    pending = {asyncio.ensure_future(primary_fn(deadline)): "primary"}
+    hedge_at = time.monotonic() + hedge_delay
+    hedged = False
+    last_error = None
+    fallback_response = None
+    try:
+        while pending or not hedged:
+            now = time.monotonic()
+            if not hedged and (now >= hedge_at or not pending):
+                pending[asyncio.ensure_future(hedge_fn(deadline))] = "hedge"
+                hedged = True
+                logger.info(f"Hedging LLM request after {hedge_delay:.2f}s")
+                continue
+            wake_at = deadline if hedged else min(hedge_at, deadline)
+            if now >= deadline:
+                break
+            done, _ = await asyncio.wait(pending, timeout=wake_at - now, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                source = pending.pop(task)
+                try:
+                    response = task.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+                if is_valid(response):
+                    return response, source
+                fallback_response = (response, source)
+    finally:
+        for task in pending:
+            task.cancel()
+    if fallback_response is not None:
+        return fallback_response
+    if last_error is not None:
+        raise last_error
+    raise RoundDeadlineExceeded("Hedged LLM request: no answer within the round deadline")
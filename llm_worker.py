@@ -0,0 +1,143 @@
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+
+# Get the root logger configured in llm_player
+logger = logging.getLogger()
+
+
+class LLMRequest:
+    """Handle for one LLM request running on the LLMWorker thread."""
+
+    def __init__(self, round_num):
+        self.round = round_num
+        self.future = Future()
+        self.started_at = time.monotonic()
+        self.cancelled = False
+        self.decision = None # The player's last_decision for this request, set with the result
+        # cancelled, consumed and _rollback change under this lock, so a cancel can't slip
+        # between the worker's check and the main thread taking the result
+        self._lock = threading.Lock()
+        self._consumed = False
+        self._rollback = None # Undoes the finished turn in the player, until the result is taken
+
+    def elapsed(self):
+        """Seconds since the request was submitted."""
+        return time.monotonic() - self.started_at
+
+    def done(self):
+        return self.future.done()
+
+    def result(self):
+        """Returns the LLM choice and keeps its turn in the player. Only call once done() is True."""
+        with self._lock:
+            self._consumed = True
+            self._rollback = None
+        return self.future.result()
+
+    def cancel(self):
+        """Abandons the request. A call already on the wire finishes in the background and is discarded."""
+        with self._lock:
+            if self._consumed:
+                return # The round was played with this result
+            self.cancelled = True
+            self.future.cancel() # Only succeeds if the worker hasn't picked it up yet
+            rollback, self._rollback = self._rollback, None
+        if rollback is not None:
+            # Finished but not taken: the worker has moved on, so forget the turn here
+            rollback()
+            logger.info(f"Discarded finished LLM request for round {self.round}.")
+
+
+class LLMWorker:
+    """Runs LLMPlayer.get_llm_choice on a background thread so the render loop never blocks on the API."""
+
+    def __init__(self, llm_player):
+        self.llm_player = llm_player
+        self._tasks = queue.Queue()
+        # Speculative request for the upcoming round, held until the human commits
+        self._prefetched = None
+        self.prefetch_stats = {"issued": 0, "hits": 0, "late_hits": 0, "misses": 0, "wasted": 0}
+        # Daemon thread: quitting the game must not wait for a slow API round-trip
+        self._thread = threading.Thread(target=self._run, name="LLMWorker", daemon=True)
+        self._thread.start()
+
+    def prefetch(self, game_state):
+        """Starts the LLM's request for the upcoming round before the human has chosen.
+
+        Moves are simultaneous, so the LLM's choice never depends on the human's
+        pending click; the result stays hidden until request() hands it over.
+        """
+        self.discard_prefetch()
+        self._prefetched = self.submit(game_state)
+        self.prefetch_stats["issued"] += 1
+
+    def request(self, game_state):
+        """Returns the LLMRequest for this round, reusing a matching prefetch when there is one."""
+        prefetched, self._prefetched = self._prefetched, None
+        if prefetched is not None and prefetched.round == game_state['round'] and not prefetched.cancelled:
+            if prefetched.done():
+                self.prefetch_stats["hits"] += 1
+            else:
+                self.prefetch_stats["late_hits"] += 1 # Still in flight, but with a head start
+            return prefetched
+
+        if prefetched is not None:
+            prefetched.cancel()
+            self.prefetch_stats["wasted"] += 1
+        self.prefetch_stats["misses"] += 1
+        return self.submit(game_state)
+
+    def discard_prefetch(self):
+        """Cancels the held prefetch (e.g. on game over or quit) and counts it as wasted."""
+        if self._prefetched is not None:
+            self._prefetched.cancel()
+            self.prefetch_stats["wasted"] += 1
+            self._prefetched = None
+
+    def get_prefetch_stats(self):
+        """Returns the prefetch counters plus hit_rate (share of rounds answered without waiting)."""
+        stats = dict(self.prefetch_stats)
+        served = stats["hits"] + stats["late_hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / served if served else 0.0
+        return stats
+
+    def submit(self, game_state):
+        """Queues a request for the LLM's choice and returns an LLMRequest to poll."""
+        # game_state['history'] is a read-only snapshot, so later appends on the main thread can't race the worker
+        request = LLMRequest(game_state['round'])
+        self._tasks.put((request, game_state))
+        logger.debug(f"LLM request queued for round {request.round}.")
+        return request
+
+    def shutdown(self):
+        """Stops the worker after the current request; does not wait for it."""
+        self._tasks.put(None)
+
+    def _run(self):
+        while True:
+            item = self._tasks.get()
+            if item is None:
+                break
+            request, game_state = item
+            if not request.future.set_running_or_notify_cancel():
+                continue # Cancelled before it started
+
+            marker = self.llm_player.turn_marker()
+            try:
+                llm_choice = self.llm_player.get_llm_choice(game_state)
+                request.decision = self.llm_player.last_decision
+            except BaseException as e:
+                request.future.set_exception(e)
+                continue
+
+            with request._lock:
+                if request.cancelled:
+                    # Forget the abandoned turn so the next request sees a clean conversation
+                    self.llm_player.rollback_to(marker)
+                    logger.info(f"Discarded cancelled LLM request for round {request.round} after {request.elapsed():.1f}s.")
+                else:
+                    request._rollback = lambda: self.llm_player.rollback_to(marker) # Used if cancelled before taken
+            request.future.set_result(llm_choice)
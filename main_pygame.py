@@ -1,10 +1,14 @@
 import time
+from collections import OrderedDict
 import pygame # Import pygame
 import sys # For sys.exit
 
 import config
+import metrics
 from game_manager import GameManager
-from llm_player import LLMPlayer
+from llm_player import LLMPlayer, setup_logging
+from ensemble_player import EnsemblePlayer
+from llm_worker import LLMWorker
 
 # Get the root logger configured in llm_player
 import logging # Keep import for logger usage
@@ -23,23 +27,70 @@ logger = logging.getLogger()
 # )
 
 # --- Pygame Setup ---
-pygame.init()
-pygame.font.init() # Initialize font module
-
-screen = pygame.display.set_mode((config.SCREEN_WIDTH, config.SCREEN_HEIGHT))
-pygame.display.set_caption("Human vs LLM Game")
-clock = pygame.time.Clock()
-
-# Fonts
-font_large = pygame.font.Font(config.FONT_NAME, config.FONT_SIZE_LARGE)
-font_medium = pygame.font.Font(config.FONT_NAME, config.FONT_SIZE_MEDIUM)
-font_small = pygame.font.Font(config.FONT_NAME, config.FONT_SIZE_SMALL)
+# Created by init_pygame(), so importing this module never opens a window
+screen = None
+clock = None
+font_large = font_medium = font_small = None
+
+def init_pygame():
+    """Initializes pygame and creates the window, clock and fonts."""
+    global screen, clock, font_large, font_medium, font_small
+    pygame.init()
+    pygame.font.init() # Initialize font module
+
+    screen = pygame.display.set_mode((config.SCREEN_WIDTH, config.SCREEN_HEIGHT))
+    pygame.display.set_caption("Human vs LLM Game")
+    clock = pygame.time.Clock()
+
+    # Fonts
+    font_large = pygame.font.Font(config.FONT_NAME, config.FONT_SIZE_LARGE)
+    font_medium = pygame.font.Font(config.FONT_NAME, config.FONT_SIZE_MEDIUM)
+    font_small = pygame.font.Font(config.FONT_NAME, config.FONT_SIZE_SMALL)
+
+# Posted by the LLM worker thread when a request finishes, so the idle loop wakes up at once
+LLM_RESPONSE_EVENT = pygame.USEREVENT + 1
+
+def notify_llm_response(_future):
+    """Wakes the event loop from the worker thread once an LLM request finishes."""
+    if pygame.display.get_init(): # The window may already be closed when a cancelled call returns
+        pygame.event.post(pygame.event.Event(LLM_RESPONSE_EVENT))
 
 # --- Helper Functions for Drawing ---
 
+class TextCache:
+    """Bounded LRU cache of rendered text surfaces, keyed by (font, text, color, antialias)."""
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries or config.UI_TEXT_CACHE_SIZE
+        self._surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, color, antialias=True):
+        key = (font, text, tuple(color), antialias)
+        text_surface = self._surfaces.get(key)
+        if text_surface is not None:
+            self._surfaces.move_to_end(key)
+            self.hits += 1
+            return text_surface
+        self.misses += 1
+        text_surface = self._surfaces[key] = font.render(text, antialias, color)
+        if len(self._surfaces) > self.max_entries:
+            self._surfaces.popitem(last=False) # Least recently used
+        return text_surface
+
+    def clear(self):
+        self._surfaces.clear()
+
+    def get_stats(self):
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._surfaces),
+                "hit_rate": self.hits / lookups if lookups else 0.0}
+
+text_cache = TextCache()
+
 def draw_text(surface, text, font, color, x, y, align="topleft"):
     """Draws text on a surface with specified alignment."""
-    text_surface = font.render(text, True, color)
+    text_surface = text_cache.render(font, text, color)
     text_rect = text_surface.get_rect()
 
     # Set the position based on alignment using Rect attributes
@@ -60,33 +111,105 @@ def draw_text(surface, text, font, color, x, y, align="topleft"):
     surface.blit(text_surface, text_rect)
     return text_rect
 
+class Widget:
+    """Retained screen region: redrawn by the Renderer only when its state changes.
+
+    draw_fn(surface, *state) must paint the whole rect (background included);
+    drawing is clipped to the rect so neighbouring widgets are never touched.
+    """
+    def __init__(self, rect, draw_fn):
+        self.rect = pygame.Rect(rect)
+        self.draw_fn = draw_fn
+        self.state = None
+        self.dirty = True
+
+    def update(self, *state):
+        if state != self.state:
+            self.state = state
+            self.dirty = True
+
+    def draw(self, surface):
+        surface.set_clip(self.rect)
+        self.draw_fn(surface, *self.state)
+        surface.set_clip(None)
+        return self.rect
+
 class Button:
     """Simple Button class for Pygame."""
-    def __init__(self, x, y, width, height, text='', color=config.BUTTON_COLOR, hover_color=config.BUTTON_HOVER_COLOR, text_color=config.BUTTON_TEXT_COLOR, font=font_medium):
+    def __init__(self, x, y, width, height, text='', color=config.BUTTON_COLOR, hover_color=config.BUTTON_HOVER_COLOR, text_color=config.BUTTON_TEXT_COLOR, font=None):
         self.rect = pygame.Rect(x, y, width, height)
         self.color = color
         self.hover_color = hover_color
         self.text = text
         self.text_color = text_color
-        self.font = font
+        self.font = font or font_medium
         self.is_hovered = False
+        self.dirty = True # Needs drawing; set when the hover state flips
+        # Whole button pre-rendered once per state; drawing is a single blit
+        self.surfaces = {hovered: self._render(hovered) for hovered in (False, True)}
+
+    def _render(self, hovered):
+        button_surface = pygame.Surface(self.rect.size)
+        # Paint the corners behind the rounded rect too, so a redraw fully replaces the old frame
+        button_surface.fill(config.LIGHT_GRAY)
+        local_rect = button_surface.get_rect()
+        pygame.draw.rect(button_surface, self.hover_color if hovered else self.color, local_rect, border_radius=5)
+        if self.text:
+            draw_text(button_surface, self.text, self.font, self.text_color, local_rect.centerx, local_rect.centery, align="center")
+        return button_surface
+
+    def set_hovered(self, hovered):
+        if hovered != self.is_hovered:
+            self.is_hovered = hovered
+            self.dirty = True
 
     def draw(self, surface):
-        current_color = self.hover_color if self.is_hovered else self.color
-        pygame.draw.rect(surface, current_color, self.rect, border_radius=5)
-        if self.text:
-            draw_text(surface, self.text, self.font, self.text_color, self.rect.centerx, self.rect.centery, align="center")
+        surface.blit(self.surfaces[self.is_hovered], self.rect)
+        return self.rect
 
     def handle_event(self, event):
         if event.type == pygame.MOUSEMOTION:
-            self.is_hovered = self.rect.collidepoint(event.pos)
+            self.set_hovered(self.rect.collidepoint(event.pos))
         if event.type == pygame.MOUSEBUTTONDOWN:
             if self.is_hovered and event.button == 1: # Left click
                 return True # Clicked
         return False
 
+class Renderer:
+    """Retained-mode renderer: redraws only dirty widgets and pushes only their rects to the display."""
+    def __init__(self, surface, widgets):
+        self.surface = surface
+        self.widgets = widgets
+        self.full_redraw = True # First frame, and after the window is exposed again
+
+    def render(self):
+        """Draws what changed; returns the updated rects (empty when the frame was skipped)."""
+        if self.full_redraw:
+            self.surface.fill(config.LIGHT_GRAY) # Background
+            for widget in self.widgets:
+                widget.dirty = True
+        rects = []
+        for widget in self.widgets:
+            if widget.dirty:
+                rects.append(widget.draw(self.surface))
+                widget.dirty = False
+        if self.full_redraw:
+            pygame.display.flip()
+            self.full_redraw = False
+        elif rects:
+            pygame.display.update(rects)
+        return rects
+
 # --- UI Drawing Functions ---
 
+def header_area_rect():
+    return pygame.Rect(0, 0, config.SCREEN_WIDTH, 2 * config.PADDING + font_large.get_linesize())
+
+def draw_header(surface, human_score, llm_score, llm_name, round_num):
+    pygame.draw.rect(surface, config.LIGHT_GRAY, header_area_rect())
+    draw_scores(surface, human_score, llm_score, llm_name)
+    draw_round_info(surface, round_num)
+
 def draw_scores(surface, human_score, llm_score, llm_name):
     draw_text(surface, f"You: {human_score}", font_large, config.BLUE, config.PADDING, config.PADDING, align="topleft")
     score_text = f"{llm_name}: {llm_score}"
@@ -97,18 +220,20 @@ def draw_round_info(surface, round_num):
     draw_text(surface, f"Round: {round_num}/{config.NUM_ROUNDS}", font_medium, config.BLACK,
               config.SCREEN_WIDTH // 2, config.PADDING + config.FONT_SIZE_LARGE // 2, align="center")
 
+def status_area_rect():
+    return pygame.Rect(0, config.SCREEN_HEIGHT - config.STATUS_AREA_HEIGHT, config.SCREEN_WIDTH, config.STATUS_AREA_HEIGHT)
+
 def draw_status(surface, status_text):
-    status_rect = pygame.Rect(0, config.SCREEN_HEIGHT - config.STATUS_AREA_HEIGHT, config.SCREEN_WIDTH, config.STATUS_AREA_HEIGHT)
+    status_rect = status_area_rect()
     pygame.draw.rect(surface, config.LIGHT_GRAY, status_rect)
     draw_text(surface, status_text, font_medium, config.BLACK, status_rect.centerx, status_rect.centery, align="center")
 
-def draw_buttons(surface, buttons):
-    for button in buttons.values():
-        button.draw(surface)
+def history_area_rect():
+    return pygame.Rect(config.PADDING, config.SCREEN_HEIGHT - config.STATUS_AREA_HEIGHT - config.HISTORY_AREA_HEIGHT - config.PADDING,
+                       config.SCREEN_WIDTH - 2 * config.PADDING, config.HISTORY_AREA_HEIGHT)
 
 def draw_history(surface, history):
-    history_rect = pygame.Rect(config.PADDING, config.SCREEN_HEIGHT - config.STATUS_AREA_HEIGHT - config.HISTORY_AREA_HEIGHT - config.PADDING,
-                              config.SCREEN_WIDTH - 2 * config.PADDING, config.HISTORY_AREA_HEIGHT)
+    history_rect = history_area_rect()
     pygame.draw.rect(surface, config.WHITE, history_rect) # White background for history
     pygame.draw.rect(surface, config.GRAY, history_rect, 2) # Border
 
@@ -125,9 +250,11 @@ def draw_history(surface, history):
 # --- Main Game Function (Pygame) ---
 
 def run_pygame_game():
+    init_pygame()
+    text_cache.clear() # Cached surfaces belong to the previous window's fonts
     logger.info("Starting new game (Pygame Mode)...")
     game_manager = GameManager()
-    llm_player = LLMPlayer()
+    llm_player = EnsemblePlayer() if config.ENSEMBLE_MODELS else LLMPlayer()
 
     # Create choice buttons
     buttons = {}
@@ -142,19 +269,49 @@ def run_pygame_game():
     status = "Your Turn! Choose a number."
     human_choice = None
     llm_choice = None
-    waiting_for_llm = False
+    pending_request = None # LLMRequest in flight on the worker thread
     last_round_result_display = None # To show results briefly
     round_start_time = time.time()
 
+    # LLM calls run on a worker thread so the window stays responsive during the API round-trip
+    llm_worker = LLMWorker(llm_player)
+
+    # Retained widgets: each is redrawn only when the state passed to update() changes
+    header = Widget(header_area_rect(), draw_header)
+    history_panel = Widget(history_area_rect(), lambda surface, last_round: draw_history(surface, [last_round] if last_round else []))
+    status_bar = Widget(status_area_rect(), draw_status)
+    renderer = Renderer(screen, [header, *buttons.values(), history_panel, status_bar])
+
+    # Start the LLM's next move as soon as a round is scored, while the human is still thinking
+    def prefetch_next_round(manager):
+        if not manager.is_game_over():
+            llm_worker.prefetch(manager.get_game_state())
+    game_manager.add_round_listener(prefetch_next_round)
+    llm_worker.prefetch(game_manager.get_game_state()) # Round 1
+
+    frame_model = getattr(llm_player, 'model', 'ensemble') # Label for the frame-time metric
     running = True
     while running:
-        mouse_pos = pygame.mouse.get_pos()
         clicked_button = None
+        waiting_for_llm = pending_request is not None
 
         # --- Event Handling ---
-        for event in pygame.event.get():
+        # Sleep until input arrives (or the LLM answers); wake periodically only to tick the waiting timer
+        timeout = config.UI_BUSY_WAIT_MS if waiting_for_llm else config.UI_IDLE_WAIT_MS
+        events = [pygame.event.wait(timeout)] + pygame.event.get()
+        frame_started_at = time.perf_counter() # Frame time counts the work after waking, not the sleep
+        for event in events:
             if event.type == pygame.QUIT:
                 running = False
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                renderer.full_redraw = True
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE and waiting_for_llm:
+                pending_request.cancel()
+                logger.info(f"Human cancelled the LLM request for round {pending_request.round}.")
+                pending_request = None
+                waiting_for_llm = False
+                human_choice = None
+                status = "Request cancelled. Choose a number."
             if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
                 if not waiting_for_llm and not game_manager.is_game_over():
                     for choice, button in buttons.items():
@@ -171,17 +328,22 @@ def run_pygame_game():
         if clicked_button is not None and not waiting_for_llm:
             human_choice = clicked_button
             logger.info(f"Human chose: {human_choice}")
-            status = f"You chose {human_choice}. Waiting for {llm_player.name}..."
-            waiting_for_llm = True
-            # TODO: Trigger LLM choice in a non-blocking way if possible, or just accept the pause
-            game_state = game_manager.get_game_state()
-            llm_choice = llm_player.get_llm_choice(game_state)
+            for button in buttons.values():
+                button.set_hovered(False) # No hover events arrive while waiting
+            pending_request = llm_worker.request(game_manager.get_game_state())
+            pending_request.future.add_done_callback(notify_llm_response)
+
+        if pending_request is not None and not pending_request.done():
+            status = f"You chose {human_choice}. Waiting for {llm_player.name}... {pending_request.elapsed():.1f}s (Esc to cancel)"
+        elif pending_request is not None:
+            llm_choice = pending_request.result()
+            llm_decision = pending_request.decision
+            pending_request = None
             logger.info(f"LLM choice received: {llm_choice}")
 
             # Play the round
-            round_result = game_manager.play_round(human_choice, llm_choice)
+            round_result = game_manager.play_round(human_choice, llm_choice, llm_decision=llm_decision)
             last_round_result_display = round_result # Store result for display
-            waiting_for_llm = False
             human_choice = None
             llm_choice = None
             round_start_time = time.time()
@@ -194,21 +356,25 @@ def run_pygame_game():
             else:
                  status = "Your Turn! Choose a number."
 
-        # --- Drawing --- (Order matters: background -> elements)
-        screen.fill(config.LIGHT_GRAY) # Background
-
-        draw_scores(screen, game_manager.human_score, game_manager.llm_score, llm_player.name)
-        draw_round_info(screen, game_manager.round if not game_manager.is_game_over() else config.NUM_ROUNDS)
-        draw_buttons(screen, buttons)
-        draw_history(screen, game_manager.history) # Draw history box + last round
-        draw_status(screen, status)
-
-        # --- Update Display ---
-        pygame.display.flip()
-
-        # --- Frame Limiting ---
-        clock.tick(60) # Limit to 60 FPS
-
+        # --- Drawing --- (only widgets whose state changed)
+        header.update(game_manager.human_score, game_manager.llm_score, llm_player.name,
+                      game_manager.round if not game_manager.is_game_over() else config.NUM_ROUNDS)
+        history_panel.update(game_manager.history[-1] if game_manager.history else None)
+        status_bar.update(status)
+        drawn = renderer.render()
+        metrics.FRAME_TIME.observe(time.perf_counter() - frame_started_at, model=frame_model,
+                                   round=min(game_manager.round, config.NUM_ROUNDS))
+        if drawn:
+            clock.tick(config.UI_MAX_FPS) # Caps redraws during bursts of input; idle frames cost nothing
+
+    if pending_request is not None:
+        pending_request.cancel() # Don't wait for an in-flight API call on quit
+    llm_worker.discard_prefetch()
+    llm_worker.shutdown()
+    game_manager.close() # Flush buffered rows if the window was closed mid-game
+    logger.info(f"LLM prefetch stats: {llm_worker.get_prefetch_stats()}")
+    logger.info(f"Text cache stats: {text_cache.get_stats()}")
+    metrics.export(metrics.metrics_json_filename(game_manager.game_id))
     pygame.quit()
     logger.info("Pygame game finished.")
     if game_manager.csv_filename:
@@ -220,5 +386,7 @@ def run_pygame_game():
 # ...
 
 if __name__ == "__main__":
+    config.load_environment()
+    setup_logging()
     # run_terminal_game() # Run terminal version
     run_pygame_game() # Run Pygame version 
\ No newline at end of file
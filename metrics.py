@@ -0,0 +1,246 @@
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+import config
+
+# Get the root logger configured in llm_player
+logger = logging.getLogger()
+
+# In-process metrics: counters and histograms keyed by label values (model, round, ...).
+# Everything is recorded into the process-wide REGISTRY and exported at game end as
+# Prometheus text (write_prometheus) or a JSON snapshot with estimated quantiles
+# (write_json). Worker processes hand their snapshot to the parent (drain/merge).
+
+# Latency buckets in seconds: ~10 ms to 60 s, for API calls and whole rounds
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Frame work in seconds: 1 ms to 100 ms (16.7 ms is one frame at 60 FPS)
+FRAME_BUCKETS = (0.001, 0.002, 0.004, 0.008, 0.0167, 0.033, 0.05, 0.1)
+TOKEN_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000)
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _format_labels(labels):
+    """Prometheus label set, e.g. {model="openai/gpt-4.1",round="3"}."""
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for value in labels.values())
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + "}"
+
+
+class Counter:
+    """Monotonic count per label combination."""
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.series = {} # label values tuple -> count
+        self._lock = threading.Lock() # Players record from hedge, ensemble and prefetch threads
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self.series[key] = self.series.get(key, 0) + amount
+
+    def _state(self, value):
+        return value
+
+    def _merge_state(self, key, value):
+        self.series[key] = self.series.get(key, 0) + value
+
+    def _prometheus_lines(self, labels, value):
+        return [f"{self.name}{_format_labels(labels)} {_format_value(value)}"]
+
+
+class Histogram(Counter):
+    """Cumulative-bucket histogram per label combination, as in Prometheus."""
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value) # Upper bounds are inclusive ("le")
+        with self._lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+            series["counts"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def quantile(self, q, **labels):
+        """Estimated q-quantile of one series, interpolated within its bucket (None if empty)."""
+        series = self.series.get(self._key(labels))
+        return self._quantile(series, q) if series else None
+
+    def _quantile(self, series, q):
+        rank = q * series["count"]
+        seen = 0
+        for index, count in enumerate(series["counts"]):
+            if count and seen + count >= rank:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                if index == len(self.buckets):
+                    return lower # Above the last bucket: its bound is all we know
+                return lower + (self.buckets[index] - lower) * (rank - seen) / count
+            seen += count
+        return None
+
+    def _state(self, series):
+        return {"count": series["count"], "sum": series["sum"], "counts": list(series["counts"]),
+                "p50": self._quantile(series, 0.5), "p95": self._quantile(series, 0.95),
+                "p99": self._quantile(series, 0.99)}
+
+    def _merge_state(self, key, state):
+        series = self.series.setdefault(key, {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0})
+        series["counts"] = [a + b for a, b in zip(series["counts"], state["counts"])]
+        series["sum"] += state["sum"]
+        series["count"] += state["count"]
+
+    def _prometheus_lines(self, labels, series):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ("+Inf",), series["counts"]):
+            cumulative += count
+            lines.append(f"{self.name}_bucket{_format_labels(dict(labels, le=bound))} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(series['sum'])}")
+        lines.append(f"{self.name}_count{_format_labels(labels)} {series['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    """A set of named metrics with Prometheus text and JSON export."""
+
+    def __init__(self):
+        self.metrics = {}
+
+    def _register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric '{metric.name}' is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def snapshot(self):
+        """JSON-ready copy of every series; histograms include estimated p50/p95/p99."""
+        snapshot = {}
+        for metric in self.metrics.values():
+            with metric._lock:
+                series = [dict(labels=dict(zip(metric.labelnames, key)), value=metric._state(value))
+                          for key, value in sorted(metric.series.items())]
+            entry = {"type": metric.kind, "help": metric.help, "series": series}
+            if metric.kind == "histogram":
+                entry["buckets"] = list(metric.buckets)
+            snapshot[metric.name] = entry
+        return snapshot
+
+    def reset(self):
+        for metric in self.metrics.values():
+            with metric._lock:
+                metric.series.clear()
+
+    def drain(self):
+        """snapshot() and reset() in one go, for handing a worker's metrics to the parent."""
+        snapshot = self.snapshot()
+        self.reset()
+        return snapshot
+
+    def merge(self, snapshot):
+        """Adds a snapshot (e.g. from a worker process) into this registry's metrics of the same name."""
+        for name, entry in snapshot.items():
+            metric = self.metrics.get(name)
+            if metric is None:
+                continue
+            with metric._lock:
+                for series in entry["series"]:
+                    metric._merge_state(metric._key(series["labels"]), series["value"])
+
+    def to_prometheus(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            with metric._lock:
+                for key, value in sorted(metric.series.items()):
+                    lines.extend(metric._prometheus_lines(dict(zip(metric.labelnames, key)), value))
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Writes to_prometheus() atomically, e.g. for node_exporter's textfile collector."""
+        _write_atomic(path, self.to_prometheus())
+        logger.info(f"Metrics (Prometheus text) written to: {path}")
+
+    def write_json(self, path):
+        _write_atomic(path, json.dumps({"ts": time.time(), "metrics": self.snapshot()}, indent=1))
+        logger.info(f"Metrics snapshot written to: {path}")
+
+
+def _write_atomic(path, text):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+REGISTRY = MetricsRegistry()
+
+# --- LLM calls (LLMPlayer) ---
+API_LATENCY = REGISTRY.histogram(
+    "llm_api_latency_seconds", "Latency of one API call (or cache hit), retries and hedges counted separately",
+    ("model", "round", "source", "outcome"))
+TIME_TO_FIRST_TOKEN = REGISTRY.histogram(
+    "llm_time_to_first_token_seconds", "Time from request to the first streamed content chunk", ("model", "round"))
+DECISION_LATENCY = REGISTRY.histogram(
+    "llm_decision_seconds", "Time for the player's whole turn: retries, hedging and parsing", ("model", "round"))
+TOKENS = REGISTRY.histogram(
+    "llm_tokens", "Tokens per API call from completion.usage", ("model", "round", "kind"), buckets=TOKEN_BUCKETS)
+PARSE_PATHS = REGISTRY.counter(
+    "llm_parse_path_total", "Turns by how the choice was obtained (see LLMPlayer._parse_choice)", ("model", "round", "path"))
+FALLBACKS = REGISTRY.counter(
+    "llm_fallback_total", "Turns whose choice was substituted at random", ("model", "round"))
+API_ERRORS = REGISTRY.counter(
+    "llm_api_errors_total", "Failed API calls by exception type (cancelled hedges included)", ("model", "round", "error"))
+
+# --- Games (GameManager) and UI ---
+ROUND_DURATION = REGISTRY.histogram(
+    "game_round_seconds", "Wall time of a round, from the previous round (or game start) to scoring", ("model", "round"))
+ROUNDS = REGISTRY.counter("game_rounds_total", "Rounds scored", ("model",))
+FRAME_TIME = REGISTRY.histogram(
+    "ui_frame_seconds", "Pygame loop work per wake-up: event handling, game logic and drawing",
+    ("model", "round"), buckets=FRAME_BUCKETS)
+
+
+def metrics_json_filename(tag=None):
+    """Returns a fresh timestamped path for a JSON snapshot, tagged (e.g. with the game id) when given."""
+    timestamp = time.strftime("%Y%m%d_%H%M%S")
+    if tag is not None:
+        timestamp = f"{timestamp}_{tag}"
+    return config.METRICS_JSON_FILE_TEMPLATE.format(timestamp=timestamp)
+
+
+def export(json_path=None, prometheus_path=None):
+    """Writes REGISTRY as Prometheus text and a JSON snapshot (no-op unless config.METRICS_EXPORT)."""
+    if not config.METRICS_EXPORT:
+        return
+    if prometheus_path or config.METRICS_PROMETHEUS_FILE:
+        REGISTRY.write_prometheus(prometheus_path or config.METRICS_PROMETHEUS_FILE)
+    REGISTRY.write_json(json_path or metrics_json_filename())
@@ -0,0 +1,167 @@
+from array import array
+from collections import Counter, namedtuple
+
+# One round, tuple-compatible with the old history entries:
+# (round, human_choice, llm_choice, human_score_change, llm_score_change)
+RoundRecord = namedtuple("RoundRecord", ["round", "human_choice", "llm_choice", "human_score_change", "llm_score_change"])
+
+
+class _RoundSequence:
+    """Read access shared by RoundHistory and its views: tuple-compatible indexing plus range aggregates.
+
+    Subclasses provide _history (the RoundHistory owning the arrays) and the
+    _start/_stop row range. Round numbers aren't stored: row i is round i + 1.
+    """
+    __slots__ = ()
+
+    def __len__(self):
+        return self._stop - self._start
+
+    def __bool__(self):
+        return self._stop > self._start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return RoundHistoryView(self._history, self._start + start, self._start + max(start, stop))
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("round history index out of range")
+        row = self._start + index
+        history = self._history
+        return RoundRecord(row + 1, history.human_choices[row], history.llm_choices[row],
+                           history.human_changes[row], history.llm_changes[row])
+
+    def __iter__(self):
+        history, start, stop = self._history, self._start, self._stop
+        columns = (history.human_choices[start:stop], history.llm_choices[start:stop],
+                   history.human_changes[start:stop], history.llm_changes[start:stop])
+        for round_num, values in enumerate(zip(*columns), start + 1):
+            yield RoundRecord(round_num, *values)
+
+    def __eq__(self, other):
+        try:
+            return len(self) == len(other) and all(a == tuple(b) for a, b in zip(self, other))
+        except TypeError:
+            return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}(rounds {self._start + 1}-{self._stop})"
+
+    def last(self, k):
+        """The last k rounds as a view (fewer if there aren't k yet)."""
+        return self[max(0, len(self) - k):]
+
+    def _player_columns(self, player):
+        history = self._history
+        if player == "human":
+            return history.human_choices, history.human_changes
+        if player == "llm":
+            return history.llm_choices, history.llm_changes
+        raise ValueError(f"Unknown player '{player}' (expected 'human' or 'llm')")
+
+    def choice_counts(self, player):
+        """{choice: rounds played} for 'human' or 'llm' over this range."""
+        choices, _ = self._player_columns(player)
+        return dict(Counter(choices[self._start:self._stop]))
+
+    def bonus_count(self, player):
+        """Rounds in this range where the player won the bonus (scored more than their own choice)."""
+        choices, changes = self._player_columns(player)
+        return sum(change > choice for choice, change in
+                   zip(choices[self._start:self._stop], changes[self._start:self._stop]))
+
+    def total(self, player):
+        """Points the player scored over this range."""
+        _, changes = self._player_columns(player)
+        return sum(changes[self._start:self._stop])
+
+    def to_numpy(self):
+        """{field: array} for this range. Columns are copies: a live view would keep the history from appending."""
+        import numpy as np # Optional dependency, only needed for vectorized consumers
+        history, start, stop = self._history, self._start, self._stop
+        columns = {"round": np.arange(start + 1, stop + 1)}
+        for field, values in (("human_choice", history.human_choices), ("llm_choice", history.llm_choices),
+                              ("human_score_change", history.human_changes), ("llm_score_change", history.llm_changes)):
+            columns[field] = np.frombuffer(values[start:stop], dtype=np.int16) # The slice is a memcpy into a new array
+        return columns
+
+
+class RoundHistoryView(_RoundSequence):
+    """Read-only view of a range of rounds. Taking one is O(1) and later appends don't change it."""
+    __slots__ = ("_history", "_start", "_stop")
+
+    def __init__(self, history, start, stop):
+        self._history = history
+        self._start = start
+        self._stop = stop
+
+
+class RoundHistory(_RoundSequence):
+    """Append-only game history in typed arrays (2 bytes per field per round instead of a tuple of ints).
+
+    Indexes like the old list of 5-tuples and keeps running per-player choice
+    counts, bonus counts and totals, so consumers don't rescan past rounds.
+    """
+    __slots__ = ("human_choices", "llm_choices", "human_changes", "llm_changes",
+                 "_choice_counts", "_bonus_counts", "_totals")
+    TYPECODE = 'h' # Choices and per-round scores are small ints
+
+    def __init__(self, rounds=()):
+        self.human_choices = array(self.TYPECODE)
+        self.llm_choices = array(self.TYPECODE)
+        self.human_changes = array(self.TYPECODE)
+        self.llm_changes = array(self.TYPECODE)
+        self._choice_counts = {"human": Counter(), "llm": Counter()}
+        self._bonus_counts = {"human": 0, "llm": 0}
+        self._totals = {"human": 0, "llm": 0}
+        for round_data in rounds:
+            self.append(round_data)
+
+    @property
+    def _history(self):
+        return self
+
+    @property
+    def _start(self):
+        return 0
+
+    @property
+    def _stop(self):
+        return len(self.human_choices)
+
+    def append(self, round_data):
+        """Appends one (round, human_choice, llm_choice, human_score_change, llm_score_change) entry."""
+        round_num, human_choice, llm_choice, human_change, llm_change = round_data
+        if round_num != len(self.human_choices) + 1:
+            raise ValueError(f"Expected round {len(self.human_choices) + 1}, got {round_num}")
+        self.human_choices.append(human_choice)
+        self.llm_choices.append(llm_choice)
+        self.human_changes.append(human_change)
+        self.llm_changes.append(llm_change)
+        for player, choice, change in (("human", human_choice, human_change), ("llm", llm_choice, llm_change)):
+            self._choice_counts[player][choice] += 1
+            self._bonus_counts[player] += change > choice
+            self._totals[player] += change
+
+    def view(self):
+        """Read-only snapshot of the rounds so far, safe to hand to other threads."""
+        return RoundHistoryView(self, 0, len(self))
+
+    # Whole-history aggregates are maintained on append: O(1)
+    def choice_counts(self, player):
+        self._player_columns(player)
+        return dict(self._choice_counts[player])
+
+    def bonus_count(self, player):
+        self._player_columns(player)
+        return self._bonus_counts[player]
+
+    def total(self, player):
+        self._player_columns(player)
+        return self._totals[player]
@@ -0,0 +1,245 @@
+import random
+import logging
+import functools
+import numpy as np
+import config
+from batch_engine import BatchGameEngine
+
+# Analytical baselines for the game in config (CHOICES, BONUS_POINTS), on the
+# payoff matrices of batch_engine (indexed [human_index, llm_index]):
+# - nash_equilibrium(): a mixed-strategy Nash equilibrium, by Lemke-Howson
+# - EmpiricalBestResponse: the best reply to the opponent's observed choice
+#   frequencies, updated in O(|CHOICES|) per round
+# - SolverPlayer: a zero-latency, zero-cost opponent playing either of them,
+#   usable wherever an LLMPlayer is (get_llm_choice / get_llm_choice_async)
+
+# Get the root logger configured in llm_player
+logger = logging.getLogger()
+
+SOLVER_POLICIES = ("nash", "best_response")
+PIVOT_TOLERANCE = 1e-9
+
+
+def _pivot(tableau, basis, entering, lexico_columns):
+    """Brings column `entering` into the basis by the lexicographic min-ratio rule; returns the leaving label.
+
+    The lexicographic tie-break (over the rhs, then the initial basis columns) keeps
+    degenerate games, which integer payoffs often are, from cycling.
+    """
+    column = tableau[:, entering]
+    candidates = np.flatnonzero(column > PIVOT_TOLERANCE)
+    if not len(candidates):
+        raise ArithmeticError("Lemke-Howson: unbounded pivot column")
+    for key in lexico_columns:
+        if len(candidates) == 1:
+            break
+        ratios = tableau[candidates, key] / column[candidates]
+        candidates = candidates[ratios <= ratios.min() + PIVOT_TOLERANCE]
+    row = candidates[0]
+    tableau[row] /= tableau[row, entering]
+    others = np.arange(len(tableau)) != row
+    tableau[others] -= np.outer(tableau[others, entering], tableau[row])
+    leaving, basis[row] = basis[row], entering
+    return leaving
+
+
+def lemke_howson(row_payoff, col_payoff, initial_label=0, max_pivots=None):
+    """One Nash equilibrium (x, y) of the bimatrix game (row_payoff, col_payoff).
+
+    Labels 0..m-1 are the row player's strategies and m..m+n-1 the column
+    player's. Starting from the artificial equilibrium, `initial_label` is
+    dropped and the duplicate label pivots back and forth between the two
+    best-response polytopes until every label is present again.
+    """
+    A = np.asarray(row_payoff, dtype=np.float64)
+    B = np.asarray(col_payoff, dtype=np.float64)
+    m, n = A.shape
+    # Both polytopes need strictly positive payoffs; shifting doesn't change the equilibria
+    A = A - A.min() + 1
+    B = B - B.min() + 1
+    rhs = m + n # Column index of the right-hand side in both tableaux
+
+    # Row player's polytope {x >= 0 : B^T x <= 1}: columns are labels (x_i = i, slack_j = m + j), then rhs
+    row_tableau = np.hstack([B.T, np.eye(n), np.ones((n, 1))])
+    row_basis = list(range(m, m + n))
+    # Column player's polytope {y >= 0 : A y <= 1}: slack_i = i, y_j = m + j
+    col_tableau = np.hstack([np.eye(m), A, np.ones((m, 1))])
+    col_basis = list(range(m))
+    row_lexico = [rhs] + row_basis
+    col_lexico = [rhs] + col_basis
+
+    if initial_label < m:
+        tableaux = [(row_tableau, row_basis, row_lexico), (col_tableau, col_basis, col_lexico)]
+    else:
+        tableaux = [(col_tableau, col_basis, col_lexico), (row_tableau, row_basis, row_lexico)]
+    max_pivots = max_pivots or 100 * (m + n) ** 2
+    entering = initial_label
+    for pivots in range(max_pivots):
+        tableau, basis, lexico = tableaux[pivots % 2]
+        entering = _pivot(tableau, basis, entering, lexico)
+        if entering == initial_label:
+            break # Completely labelled again: an equilibrium
+    else:
+        raise ArithmeticError(f"Lemke-Howson: no equilibrium after {max_pivots} pivots")
+
+    x = np.zeros(m)
+    y = np.zeros(n)
+    for row, label in enumerate(row_basis):
+        if label < m:
+            x[label] = row_tableau[row, rhs]
+    for row, label in enumerate(col_basis):
+        if label >= m:
+            y[label - m] = col_tableau[row, rhs]
+    return x / x.sum(), y / y.sum()
+
+
+def is_equilibrium(row_payoff, col_payoff, x, y, tolerance=1e-6):
+    """True if neither player gains by deviating from the mixed strategies (x, y)."""
+    row_values = np.asarray(row_payoff, dtype=np.float64) @ y
+    col_values = x @ np.asarray(col_payoff, dtype=np.float64)
+    return bool(x @ row_values >= row_values.max() - tolerance and col_values @ y >= col_values.max() - tolerance)
+
+
+@functools.lru_cache(maxsize=16)
+def _cached_equilibrium(choices, bonus_points):
+    engine = BatchGameEngine(choices, bonus_points)
+    for label in range(2 * len(choices)):
+        x, y = lemke_howson(engine.human_payoff, engine.llm_payoff, initial_label=label)
+        if is_equilibrium(engine.human_payoff, engine.llm_payoff, x, y):
+            return x, y
+    raise ArithmeticError(f"No verified equilibrium found for choices {list(choices)}")
+
+
+def nash_equilibrium(choices=None, bonus_points=None):
+    """(human_strategy, llm_strategy): a mixed Nash equilibrium over CHOICES, computed once per rule set."""
+    choices = tuple(config.CHOICES if choices is None else choices)
+    bonus_points = config.BONUS_POINTS if bonus_points is None else bonus_points
+    x, y = _cached_equilibrium(choices, bonus_points)
+    return x.copy(), y.copy()
+
+
+class EmpiricalBestResponse:
+    """Best reply to the frequencies of the opponent's past choices (fictitious play).
+
+    Keeps the opponent's choice counts and, alongside them, the total payoff each
+    own choice would have earned against those rounds, so folding in a round costs
+    one row addition and the best response one argmax, whatever the history length.
+    `payoff` is indexed [opponent_index, own_index].
+    """
+
+    def __init__(self, payoff):
+        self.payoff = np.asarray(payoff, dtype=np.int64)
+        self.counts = np.zeros(self.payoff.shape[0], dtype=np.int64)
+        self.values = np.zeros(self.payoff.shape[1], dtype=np.int64) # counts @ payoff, kept up to date
+        self.rounds = 0
+
+    def update(self, opponent_indices):
+        """Folds in the opponent's choices (matrix indices) of one or more new rounds."""
+        opponent_indices = np.atleast_1d(opponent_indices)
+        if len(opponent_indices) == 1:
+            self.counts[opponent_indices[0]] += 1
+            self.values += self.payoff[opponent_indices[0]]
+        elif len(opponent_indices):
+            new_counts = np.bincount(opponent_indices, minlength=len(self.counts))
+            self.counts += new_counts
+            self.values += new_counts @ self.payoff
+        self.rounds += len(opponent_indices)
+
+    def frequencies(self):
+        return self.counts / self.rounds if self.rounds else np.full(len(self.counts), 1 / len(self.counts))
+
+    def best_response(self):
+        """Index of the own choice with the highest expected payoff (lowest index on ties)."""
+        return int(np.argmax(self.values))
+
+
+def best_response_choices(human_choices, choices=None, bonus_points=None, seed=None):
+    """LLM choices of a best-response SolverPlayer against whole games of recorded human choices.
+
+    `human_choices` is (n_games, n_rounds). Round 1 of each game is sampled from
+    the Nash strategy; round t > 1 answers the frequencies of the human's rounds
+    before t. The loop runs over rounds and is vectorized across games.
+    """
+    engine = BatchGameEngine(choices, bonus_points)
+    human_idx = engine.to_indices(np.atleast_2d(human_choices))
+    n_games, n_rounds = human_idx.shape
+    _, llm_strategy = nash_equilibrium(engine.choices.tolist(), bonus_points)
+    llm_idx = np.empty_like(human_idx)
+    llm_idx[:, 0] = np.random.default_rng(seed).choice(len(engine.choices), size=n_games, p=llm_strategy)
+    values = np.zeros((n_games, len(engine.choices)), dtype=np.int64) # Per game: EmpiricalBestResponse.values
+    for t in range(1, n_rounds):
+        values += engine.llm_payoff[human_idx[:, t - 1]]
+        llm_idx[:, t] = np.argmax(values, axis=1)
+    return engine.choices[llm_idx]
+
+
+class SolverPlayer:
+    """Non-LLM opponent with the LLMPlayer interface: Nash mixing or empirical best response.
+
+    "nash" samples every round from the equilibrium strategy. "best_response"
+    plays fictitious play against the human's choices so far, opening with a
+    Nash sample.
+    """
+
+    def __init__(self, policy=None, seed=None, choices=None, bonus_points=None):
+        self.policy = policy or config.SOLVER_POLICY
+        if self.policy not in SOLVER_POLICIES:
+            raise ValueError(f"Unknown solver policy '{self.policy}'. Available: {', '.join(SOLVER_POLICIES)}")
+        self.bonus_points = config.BONUS_POINTS if bonus_points is None else bonus_points
+        self.engine = BatchGameEngine(choices, self.bonus_points)
+        _, self.nash_strategy = nash_equilibrium(self.engine.choices.tolist(), self.bonus_points)
+        self._nash_cumulative = np.cumsum(self.nash_strategy)
+        self.best_response = EmpiricalBestResponse(self.engine.llm_payoff)
+        self.rng = random.Random(seed)
+        self.model = f"solver/{self.policy}" # Fills the LLM_Model column and metrics labels
+        self.name = f"Solver ({self.policy})"
+        self.last_decision = None
+        logger.info(f"SolverPlayer initialized: {self.name} over {len(self.engine.choices)} choices")
+
+    def _nash_sample(self):
+        index = int(np.searchsorted(self._nash_cumulative, self.rng.random() * self._nash_cumulative[-1], side="right"))
+        return int(self.engine.choices[min(index, len(self.engine.choices) - 1)])
+
+    def _observe(self, history):
+        """Folds rounds of `history` (a RoundHistory view or list of round tuples) not seen yet."""
+        new_rounds = history[self.best_response.rounds:]
+        if not new_rounds:
+            return
+        if hasattr(new_rounds, "to_numpy"):
+            human_choices = new_rounds.to_numpy()["human_choice"]
+        else:
+            human_choices = [round_data[1] for round_data in new_rounds]
+        self.best_response.update(self.engine.to_indices(human_choices))
+
+    def get_llm_choice(self, game_state):
+        """Returns this round's choice; like LLMPlayer, last_decision records how it was made."""
+        if self.policy == "best_response":
+            self._observe(game_state['history'])
+        if self.policy == "nash" or not self.best_response.rounds:
+            choice, path = self._nash_sample(), "nash"
+        else:
+            choice, path = int(self.engine.choices[self.best_response.best_response()]), "best_response"
+        self.last_decision = {"round": game_state['round'], "model": self.model, "parse_path": path,
+                              "fallback": False, "attempts": 0, "source": "solver", "choice": choice}
+        return choice
+
+    async def get_llm_choice_async(self, game_state):
+        return self.get_llm_choice(game_state)
+
+    # Nothing to undo for a cancelled turn: state only follows the scored history
+    def turn_marker(self):
+        return None
+
+    def rollback_to(self, marker):
+        pass
+
+    def snapshot(self):
+        """Policy and RNG state for checkpoint.py; frequencies are rebuilt from the game history."""
+        return {"policy": self.policy, "choices": self.engine.choices.tolist(), "bonus_points": self.bonus_points,
+                "rng_state": self.rng.getstate()}
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        player = cls(policy=snapshot["policy"], choices=snapshot["choices"], bonus_points=snapshot["bonus_points"])
+        player.rng.setstate(snapshot["rng_state"])
+        return player
@@ -0,0 +1,385 @@
+import re
+import json
+import math
+import time
+import uuid
+import random
+import hashlib
+import logging
+import argparse
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import config
+
+# Stub server for offline load tests: speaks enough of the OpenAI chat completions
+# API for LLMPlayer (plain and streamed) and answers with scripted strategies.
+# Point the game at it with LLM_BASE_URL=http://127.0.0.1:8765/v1 (any LLM_API_KEY works).
+
+logger = logging.getLogger("stub_server")
+
+ROUND_PATTERN = re.compile(r"Round (\d+)/")
+HUMAN_CHOICE_PATTERN = re.compile(r"Opponent \(Human\) chose (\d+)")
+
+# Replies that miss the "My choice is: N" contract, each exercising a _parse_choice fallback
+MALFORMED_REPLIES = (
+    "",                                              # empty
+    "Hard to say which number is best here.",        # no number at all -> random
+    "My choice is: {out_of_range}",                  # out of range -> random
+    "I'll go with the safe option.\n{choice}",       # bare number on the last line
+    "My choice is: {choice_word}",                   # spelled out -> random
+)
+NUMBER_WORDS = {1: "one", 2: "two", 3: "three", 4: "four", 5: "five"}
+
+
+class StubPolicy:
+    """Picks the stub's number from the request messages."""
+
+    def choose(self, messages, rng):
+        raise NotImplementedError
+
+
+class FixedStubPolicy(StubPolicy):
+    def __init__(self, choice):
+        self.choice = choice
+
+    def choose(self, messages, rng):
+        return self.choice
+
+
+class RandomStubPolicy(StubPolicy):
+    def choose(self, messages, rng):
+        return rng.choice(config.CHOICES)
+
+
+class ScriptedStubPolicy(StubPolicy):
+    """Plays a fixed sequence by round number (read from the prompt), cycling when it runs out."""
+
+    def __init__(self, script):
+        self.script = script
+
+    def choose(self, messages, rng):
+        round_num = _last_match(ROUND_PATTERN, messages) or 1
+        return self.script[(round_num - 1) % len(self.script)]
+
+
+class UndercutStubPolicy(StubPolicy):
+    """Plays one below the human's last choice, the choice that wins the bonus if the human repeats."""
+
+    def choose(self, messages, rng):
+        human_choice = _last_match(HUMAN_CHOICE_PATTERN, messages)
+        if human_choice is None:
+            return rng.choice(config.CHOICES)
+        return max(config.MIN_CHOICE, human_choice - 1)
+
+
+def _last_match(pattern, messages):
+    """Integer from the last user message matching pattern, or None."""
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            matches = pattern.findall(_message_text(message))
+            return int(matches[-1]) if matches else None
+    return None
+
+
+def _message_text(message):
+    """A message's text, whether content is a string or a list of parts (e.g. with cache_control markers)."""
+    content = message.get("content") or ""
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content
+
+
+class PrefixCache:
+    """Simulated provider prompt cache over message-aligned prefixes, least recently used out first.
+
+    match() reports how many of a request's prompt tokens repeat a prefix seen in an
+    earlier request, like the cached_tokens a real provider returns.
+    """
+
+    def __init__(self, max_entries=100_000, min_tokens=0):
+        self.max_entries = max_entries
+        self.min_tokens = min_tokens # e.g. 1024 to mimic OpenAI, which only caches longer prompts
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def match(self, messages):
+        """Returns the cached token count of this prompt and remembers all of its prefixes."""
+        digest = hashlib.sha256()
+        prefixes = [] # (hash of messages[:i + 1], characters in them)
+        chars = 0
+        for message in messages:
+            text = _message_text(message)
+            digest.update(f"{message.get('role')}\0{text}\0".encode("utf-8"))
+            chars += len(text)
+            prefixes.append((digest.hexdigest(), chars))
+        cached_chars = 0
+        with self._lock:
+            for key, prefix_chars in prefixes:
+                if key in self._entries:
+                    cached_chars = prefix_chars
+                self._entries[key] = True
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        cached_tokens = cached_chars // 4 # Same estimate as _usage
+        return cached_tokens if cached_tokens >= self.min_tokens else 0
+
+
+def make_stub_policy(spec):
+    """Builds a stub policy from 'fixed:N', 'random', 'scripted:3,3,4,2' or 'undercut'."""
+    name, _, arg = spec.partition(":")
+    if name == "fixed":
+        return FixedStubPolicy(int(arg or config.MAX_CHOICE))
+    if name == "random":
+        return RandomStubPolicy()
+    if name == "scripted":
+        return ScriptedStubPolicy([int(choice) for choice in arg.split(",")])
+    if name == "undercut":
+        return UndercutStubPolicy()
+    raise ValueError(f"Unknown stub policy '{spec}'. Available: fixed:N, random, scripted:a,b,..., undercut")
+
+
+def make_latency(spec):
+    """Builds a latency sampler rng -> seconds from 'fixed:S', 'uniform:A:B', 'lognormal:MEDIAN:SIGMA' or 'exp:MEAN'."""
+    name, *args = spec.split(":")
+    args = [float(arg) for arg in args]
+    if name == "fixed":
+        return lambda rng: args[0]
+    if name == "uniform":
+        return lambda rng: rng.uniform(args[0], args[1])
+    if name == "lognormal":
+        return lambda rng: rng.lognormvariate(math.log(args[0]), args[1]) # Median args[0], long right tail
+    if name == "exp":
+        return lambda rng: rng.expovariate(1 / args[0])
+    raise ValueError(f"Unknown latency distribution '{spec}'. Available: fixed:S, uniform:A:B, lognormal:MEDIAN:SIGMA, exp:MEAN")
+
+
+class StubLLMServer(ThreadingHTTPServer):
+    """Threaded OpenAI-compatible stand-in server. Every knob is a constructor argument."""
+
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 8765), policy="random", latency="fixed:0",
+                 error_rate=0.0, rate_limit_rate=0.0, retry_after=1.0, malformed_rate=0.0,
+                 stream_chunk_delay=0.01, seed=None, prefix_cache_min_tokens=0, prefill_s_per_1k_tokens=0.0):
+        super().__init__(address, StubRequestHandler)
+        self.policy = make_stub_policy(policy) if isinstance(policy, str) else policy
+        self.latency = make_latency(latency) if isinstance(latency, str) else latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.malformed_rate = malformed_rate
+        self.stream_chunk_delay = stream_chunk_delay
+        self.prefix_cache = PrefixCache(min_tokens=prefix_cache_min_tokens)
+        self.prefill_s_per_1k_tokens = prefill_s_per_1k_tokens # Extra latency per 1000 uncached prompt tokens
+        self.rng = random.Random(seed)
+        self._rng_lock = threading.Lock() # Handler threads share one seeded rng
+        self.stats = {"requests": 0, "completions": 0, "streams": 0, "errors": 0, "rate_limited": 0, "malformed": 0,
+                      "prompt_tokens": 0, "cached_tokens": 0, "prefix_hits": 0}
+        self._stats_lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def count(self, key, amount=1):
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def plan_response(self, body):
+        """Decides the outcome of one request: (delay, status, content)."""
+        messages = body.get("messages", [])
+        with self._rng_lock:
+            delay = max(0.0, self.latency(self.rng))
+            roll = self.rng.random()
+            if roll < self.error_rate:
+                return delay, 500, None
+            if roll < self.error_rate + self.rate_limit_rate:
+                return delay, 429, None
+            choice = self.policy.choose(messages, self.rng)
+            if self.rng.random() < self.malformed_rate:
+                template = self.rng.choice(MALFORMED_REPLIES)
+                self.count("malformed")
+                return delay, 200, template.format(choice=choice, out_of_range=config.MAX_CHOICE + 4,
+                                                   choice_word=NUMBER_WORDS.get(choice, choice))
+
+        if _wants_bare_number(body):
+            return delay, 200, str(choice)
+        return delay, 200, f"Stub analysis of the game so far.\nMy choice is: {choice}"
+
+    def start_in_thread(self):
+        """Serves on a daemon thread (for benchmarks and scripts); returns self. Stop with shutdown()."""
+        threading.Thread(target=self.serve_forever, name="StubLLMServer", daemon=True).start()
+        return self
+
+
+def _wants_bare_number(body):
+    """Decision-mode requests ask for the number only (see LLMPlayer._output_format_instructions)."""
+    system = next((_message_text(m) for m in body.get("messages", []) if m.get("role") == "system"), "")
+    return "Reply with your chosen number only" in system or (body.get("max_tokens") or 150) <= 5
+
+
+class StubRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Keep-alive, like the real API behind a pooled client
+    disable_nagle_algorithm = True # Headers and body go out in separate writes; don't stall them on delayed ACKs
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def do_GET(self):
+        if self.path.rstrip("/") in ("/stats", "/v1/stats"):
+            with self.server._stats_lock:
+                self._send_json(200, self.server.stats)
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def do_POST(self):
+        if self.path.rstrip("/") not in ("/chat/completions", "/v1/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": {"message": "Request body is not valid JSON"}})
+            return
+
+        self.server.count("requests")
+        delay, status, content = self.server.plan_response(body)
+        cached_tokens = 0
+        if status == 200:
+            prompt_tokens = _prompt_tokens(body)
+            cached_tokens = self.server.prefix_cache.match(body.get("messages", []))
+            self.server.count("prompt_tokens", prompt_tokens)
+            self.server.count("cached_tokens", cached_tokens)
+            if cached_tokens:
+                self.server.count("prefix_hits")
+            # Prefill time only for the part of the prompt that isn't cached
+            delay += (prompt_tokens - cached_tokens) / 1000 * self.server.prefill_s_per_1k_tokens
+        time.sleep(delay)
+        if status == 500:
+            self.server.count("errors")
+            self._send_json(500, {"error": {"message": "Injected stub server error", "type": "server_error"}})
+        elif status == 429:
+            self.server.count("rate_limited")
+            self._send_json(429, {"error": {"message": "Injected rate limit", "type": "rate_limit_error"}},
+                            headers={"Retry-After": str(self.server.retry_after)})
+        elif body.get("stream"):
+            self.server.count("streams")
+            self._stream_completion(body, content)
+        else:
+            self.server.count("completions")
+            self._send_json(200, _completion(body, content, cached_tokens))
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream_completion(self, body, content):
+        """Sends the reply as server-sent events, a few words per chunk, in chunked transfer encoding."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        completion_id = f"chatcmpl-stub-{uuid.uuid4().hex[:12]}"
+        pieces = re.findall(r"\S+\s*|\s+", content) or [""]
+        try:
+            for i, piece in enumerate(pieces):
+                delta = {"role": "assistant", "content": piece} if i == 0 else {"content": piece}
+                self._send_event(_chunk(body, completion_id, delta, None))
+                time.sleep(self.server.stream_chunk_delay)
+            self._send_event(_chunk(body, completion_id, {}, "stop"))
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"") # Terminating zero-length chunk
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True # Client stopped reading early (streaming early stop)
+
+    def _send_event(self, payload):
+        self._write_chunk(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+def _prompt_tokens(body):
+    # Rough 4-characters-per-token estimate; enough for throughput numbers
+    return sum(len(_message_text(m)) for m in body.get("messages", [])) // 4
+
+
+def _usage(body, content, cached_tokens=0):
+    prompt_tokens, completion_tokens = _prompt_tokens(body), max(1, len(content) // 4)
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": cached_tokens}}
+
+
+def _completion(body, content, cached_tokens=0):
+    return {
+        "id": f"chatcmpl-stub-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": _usage(body, content, cached_tokens),
+    }
+
+
+def _chunk(body, completion_id, delta, finish_reason):
+    return {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stub LLM server for offline load tests.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--policy", default="random", help="fixed:N, random, scripted:a,b,... or undercut")
+    parser.add_argument("--latency", default="lognormal:0.4:0.5",
+                        help="fixed:S, uniform:A:B, lognormal:MEDIAN:SIGMA or exp:MEAN (seconds)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with a 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of requests answered with a 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Share of replies breaking the output format")
+    parser.add_argument("--stream-chunk-delay", type=float, default=0.01, help="Seconds between streamed chunks")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--prefix-cache-min-tokens", type=int, default=0,
+                        help="Shortest prompt (in tokens) the simulated prompt cache reports; 1024 mimics OpenAI")
+    parser.add_argument("--prefill-ms-per-1k", type=float, default=0.0,
+                        help="Extra latency per 1000 uncached prompt tokens, so prompt caching shows up in timings")
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    server = StubLLMServer((args.host, args.port), policy=args.policy, latency=args.latency,
+                           error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+                           retry_after=args.retry_after, malformed_rate=args.malformed_rate,
+                           stream_chunk_delay=args.stream_chunk_delay, seed=args.seed,
+                           prefix_cache_min_tokens=args.prefix_cache_min_tokens,
+                           prefill_s_per_1k_tokens=args.prefill_ms_per_1k / 1000)
+    logger.info(f"Stub LLM server listening on {server.base_url} (policy: {args.policy}, latency: {args.latency})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logger.info(f"Stub LLM server stopped. Stats: {server.stats}")
+
+
+if __name__ == "__main__":
+    main()
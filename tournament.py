@@ -0,0 +1,284 @@
+import os
+import csv
+import json
+import logging
+import asyncio
+import argparse
+import datetime
+import multiprocessing.util
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import config
+from game_manager import GameManager, game_data_csv_filename
+from game_data_writer import GAME_DATA_FIELDNAMES, GameDataWriter, ColumnarGameStore
+import interaction_log
+from llm_player import LLMPlayer, setup_logging
+from ensemble_player import EnsemblePlayer
+from human_policies import make_policy
+import checkpoint
+import metrics
+
+# Get the root logger configured in llm_player
+logger = logging.getLogger()
+
+TOURNAMENT_CSV_FILE_TEMPLATE = os.path.join(config.LOG_DIRECTORY, "tournament_{timestamp}.csv")
+TOURNAMENT_FIELDNAMES = ['Game_ID', 'Policy', 'Opponent', 'Seed'] + GAME_DATA_FIELDNAMES
+RUN_FILE = "run.json" # Tournament arguments, in the checkpoint directory
+COMPLETED_FILE = "completed.txt" # Game_IDs already in the merged CSV, one per line
+
+
+def make_opponent(name, seed=None):
+    """Builds the non-human player for a game."""
+    if name == "llm":
+        return LLMPlayer(seed=seed)
+    if name == "ensemble":
+        return EnsemblePlayer(seed=seed) # Models and policy from config.ENSEMBLE_*
+    if name == "solver" or name.startswith("solver:"):
+        from solver import SolverPlayer # Imported here: solver pulls in numpy
+        return SolverPlayer(policy=name.partition(":")[2] or None, seed=seed) # Default policy: config.SOLVER_POLICY
+    raise ValueError(f"Unknown opponent '{name}'")
+
+
+def _start_game(job):
+    """Builds the policy, opponent and GameManager for one job, from its checkpoint if there is one."""
+    policy = make_policy(job['policy'], seed=job['seed'])
+    if job.get('checkpoint') and os.path.exists(job['checkpoint']):
+        game_manager, opponent = checkpoint.resume_game(job['checkpoint'], policy)
+        return policy, opponent, game_manager
+    opponent = make_opponent(job['opponent'], seed=job['seed'])
+    # Rows are kept in memory for the merged dataset; per-game CSVs are optional
+    csv_filename = game_data_csv_filename(job['game_id']) if job['game_csv'] else None
+    game_manager = GameManager(game_id=job['game_id'], data_writer=GameDataWriter(csv_filename, keep_rows=True))
+    return policy, opponent, game_manager
+
+
+def _game_rows(job, game_manager):
+    game_columns = {'Game_ID': job['game_id'], 'Policy': job['policy'], 'Opponent': job['opponent'], 'Seed': job['seed']}
+    return [dict(game_columns, **row) for row in game_manager.data_writer.game_rows]
+
+
+def play_game(job):
+    """Plays one full headless game and returns its rows for the merged dataset."""
+    policy, opponent, game_manager = _start_game(job)
+
+    while not game_manager.is_game_over():
+        game_state = game_manager.get_game_state()
+        human_choice = policy.choose(game_state)
+        llm_choice = opponent.get_llm_choice(game_state)
+        game_manager.play_round(human_choice, llm_choice, # Same scoring as interactive games
+                                llm_decision=getattr(opponent, 'last_decision', None))
+        if job.get('checkpoint'):
+            checkpoint.save_checkpoint(job['checkpoint'], game_manager, opponent, policy)
+
+    game_manager.close() # Already closed at game end unless the game was resumed finished
+    return _game_rows(job, game_manager)
+
+
+async def play_game_async(job):
+    """Async version of play_game, for running many games on one event loop."""
+    policy, opponent, game_manager = _start_game(job)
+
+    while not game_manager.is_game_over():
+        game_state = game_manager.get_game_state()
+        human_choice = policy.choose(game_state)
+        llm_choice = await opponent.get_llm_choice_async(game_state)
+        game_manager.play_round(human_choice, llm_choice, llm_decision=getattr(opponent, 'last_decision', None))
+        if job.get('checkpoint'):
+            if hasattr(opponent, 'drain_async'):
+                await opponent.drain_async() # A checkpoint can't hold a member's half-finished turn
+            checkpoint.save_checkpoint(job['checkpoint'], game_manager, opponent, policy)
+
+    if hasattr(opponent, 'drain_async'):
+        await opponent.drain_async() # Let ensemble members still answering finish before the loop closes
+    game_manager.close()
+    return _game_rows(job, game_manager)
+
+
+def _play_game_in_worker(job):
+    """play_game for pool workers: also hands back (and clears) the metrics the game recorded."""
+    rows = play_game(job)
+    return rows, metrics.REGISTRY.drain()
+
+
+def _init_worker(log_level):
+    """Sets up a worker process: environment and shared (appended) logs, no per-round console flood."""
+    config.load_environment()
+    setup_logging(interaction_log_mode='a', jsonl_path=interaction_log.worker_jsonl_path())
+    # Pool workers leave via os._exit, skipping atexit, so drain the log queue as a process finalizer
+    multiprocessing.util.Finalize(None, interaction_log.stop_listener, exitpriority=10)
+    logging.getLogger().setLevel(log_level)
+
+
+def _run_process_pool(jobs, workers, log_level, record_game):
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(log_level,)) as pool:
+        # Keep at most 2 jobs per worker queued so memory stays flat for huge runs
+        pending = set()
+        remaining = iter(jobs)
+        max_pending = workers * 2
+        while True:
+            for job in remaining:
+                pending.add(pool.submit(_play_game_in_worker, job))
+                if len(pending) >= max_pending:
+                    break
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                rows, worker_metrics = future.result()
+                metrics.REGISTRY.merge(worker_metrics)
+                record_game(rows)
+
+
+async def _run_event_loop(jobs, concurrency, log_level, record_game):
+    logging.getLogger().setLevel(log_level)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded_game(job):
+        async with semaphore:
+            return await play_game_async(job)
+
+    for game in asyncio.as_completed([bounded_game(job) for job in jobs]):
+        record_game(await game)
+
+
+def _read_completed(checkpoint_dir):
+    path = os.path.join(checkpoint_dir, COMPLETED_FILE)
+    if not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+def _keep_completed_games(output_path, completed_ids):
+    """Drops rows of games that weren't marked completed (a crash mid-write) from the merged CSV."""
+    if not os.path.exists(output_path):
+        return
+    with open(output_path, newline='') as csvfile:
+        rows = [row for row in csv.DictReader(csvfile) if row['Game_ID'] in completed_ids]
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, 'w', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=TOURNAMENT_FIELDNAMES)
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp_path, output_path)
+
+
+def run_tournament(policies, games_per_policy, workers, output_path, opponent="llm", seed=0, log_level="WARNING",
+                   game_csv=True, columnar_dir=None, use_async=False, checkpoint_dir=None, resume=False):
+    """Runs every policy against the opponent and merges every round into one CSV at output_path.
+
+    By default games fan out over a pool of `workers` processes. With use_async they
+    run as up to `workers` concurrent coroutines in this process instead, sharing
+    one pooled, rate-limited API client. With columnar_dir, each finished game is
+    also appended to a ColumnarGameStore there.
+
+    With checkpoint_dir, every game in progress is checkpointed there after each
+    round (see checkpoint.py) and finished games are listed in completed.txt.
+    resume=True continues such a run: finished games are skipped and games in
+    progress continue from their last checkpoint, appending to output_path.
+    """
+    jobs = []
+    for policy in policies:
+        for _ in range(games_per_policy):
+            jobs.append({
+                'game_id': f"g{len(jobs):06d}",
+                'policy': policy,
+                'opponent': opponent,
+                'seed': seed + len(jobs),
+                'game_csv': game_csv,
+            })
+
+    completed_ids = set()
+    if checkpoint_dir:
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        for job in jobs:
+            job['checkpoint'] = os.path.join(checkpoint_dir, f"{job['game_id']}.ckpt")
+        if resume:
+            completed_ids = _read_completed(checkpoint_dir)
+            _keep_completed_games(output_path, completed_ids)
+            jobs = [job for job in jobs if job['game_id'] not in completed_ids]
+            logger.info(f"Resuming: {len(completed_ids)} games already done, {len(jobs)} to go")
+    # A resumed run appends to the rows of the games it already finished
+    append = resume and os.path.exists(output_path)
+
+    mode = "async games" if use_async else "worker processes"
+    logger.info(f"Running {len(jobs)} games with {workers} {mode} -> {output_path}")
+    completed = 0
+    columnar_store = ColumnarGameStore(columnar_dir) if columnar_dir else None
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, 'a' if append else 'w', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=TOURNAMENT_FIELDNAMES)
+        if not append:
+            writer.writeheader()
+
+        def record_game(rows):
+            nonlocal completed
+            writer.writerows(rows)
+            if columnar_store is not None:
+                columnar_store.append_game(rows)
+            if checkpoint_dir and rows:
+                # Rows first, then the completed mark, then the checkpoint: a crash in between only redoes this bookkeeping
+                csvfile.flush()
+                game_id = rows[0]['Game_ID']
+                with open(os.path.join(checkpoint_dir, COMPLETED_FILE), 'a') as f:
+                    f.write(f"{game_id}\n")
+                os.remove(os.path.join(checkpoint_dir, f"{game_id}.ckpt"))
+            completed += 1
+            logger.info(f"Completed {completed}/{len(jobs)} games")
+
+        if use_async:
+            asyncio.run(_run_event_loop(jobs, workers, log_level, record_game))
+        else:
+            _run_process_pool(jobs, workers, log_level, record_game)
+
+    metrics.export(f"{os.path.splitext(output_path)[0]}_metrics.json")
+    return completed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run headless games of scripted human policies against the LLM.")
+    parser.add_argument("--policies", nargs="+", default=["fixed:5", "random", "tit_for_tat", "undercut"],
+                        help="Human policy specs, e.g. fixed:3 random tit_for_tat undercut replay:logs/game_data_x.csv")
+    parser.add_argument("--games-per-policy", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Maximum concurrent games")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="Run games as coroutines in one process on the shared async client")
+    parser.add_argument("--opponent", default="llm", choices=["llm", "ensemble", "solver", "solver:nash", "solver:best_response"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Merged CSV path (default: logs/tournament_<timestamp>.csv)")
+    parser.add_argument("--log-level", default="WARNING", help="Log level inside worker processes")
+    parser.add_argument("--no-game-csv", dest="game_csv", action="store_false",
+                        help="Skip the per-game game_data_*.csv files; only write the merged dataset")
+    parser.add_argument("--columnar-dir", default=None, help="Also append every game to a binary columnar store here")
+    parser.add_argument("--checkpoint-dir", nargs="?", const=config.CHECKPOINT_DIRECTORY, default=None,
+                        help=f"Checkpoint every game after each round, so the run can be resumed (default dir: {config.CHECKPOINT_DIRECTORY})")
+    parser.add_argument("--resume", metavar="CHECKPOINT_DIR", default=None,
+                        help="Continue an interrupted --checkpoint-dir run with its original arguments")
+    args = parser.parse_args()
+
+    config.load_environment()
+    setup_logging()
+    run_fields = ("policies", "games_per_policy", "opponent", "seed", "output", "game_csv", "columnar_dir")
+    checkpoint_dir = args.resume or args.checkpoint_dir
+    if args.resume:
+        with open(os.path.join(args.resume, RUN_FILE)) as f:
+            vars(args).update(json.load(f)) # Same games, seeds and output; workers, --async and log level may change
+    elif checkpoint_dir:
+        if os.path.exists(os.path.join(checkpoint_dir, RUN_FILE)):
+            parser.error(f"{checkpoint_dir} already holds a run; resume it with --resume {checkpoint_dir} or pick another directory")
+        args.output = args.output or TOURNAMENT_CSV_FILE_TEMPLATE.format(
+            timestamp=datetime.datetime.now().strftime("%Y%m%d_%H%M%S"))
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        with open(os.path.join(checkpoint_dir, RUN_FILE), 'w') as f:
+            json.dump({field: getattr(args, field) for field in run_fields}, f, indent=2)
+    output_path = args.output or TOURNAMENT_CSV_FILE_TEMPLATE.format(
+        timestamp=datetime.datetime.now().strftime("%Y%m%d_%H%M%S"))
+    completed = run_tournament(args.policies, args.games_per_policy, args.workers, output_path,
+                               opponent=args.opponent, seed=args.seed, log_level=args.log_level,
+                               game_csv=args.game_csv, columnar_dir=args.columnar_dir, use_async=args.use_async,
+                               checkpoint_dir=checkpoint_dir, resume=bool(args.resume))
+    print(f"{completed} games written to: {output_path}")
+
+
+if __name__ == "__main__":
+    main()